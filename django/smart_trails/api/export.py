@@ -0,0 +1,100 @@
+"""
+Streaming CSV / NDJSON export of the reading tables.
+
+Used by the export endpoint and the `export_readings` management command.
+Rows are read as tuples with values_list(...).iterator(), a server-side
+cursor on PostgreSQL, and encoded as they arrive, so an export of any size
+runs in constant memory and the first bytes leave right away.
+"""
+
+import csv
+import json
+
+from sensors.fields import text_formatters
+from sensors.models import reading_fields
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per database round trip, and encoded per yielded chunk
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _LineBuffer:
+    """File-like object csv.writer writes to, keeping the lines for the caller."""
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+
+def _csv_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_columns(model):
+    return ['station_id', 'timestamp'] + reading_fields(model)
+
+
+def export_rows(model, station_ids=None, start=None, end=None):
+    """Iterate the rows of a reading table as tuples, ordered by station and time."""
+    readings = model.objects.all()
+    if station_ids:
+        readings = readings.filter(station_id__in=station_ids)
+    if start is not None:
+        readings = readings.filter(timestamp__gte=start)
+    if end is not None:
+        readings = readings.filter(timestamp__lt=end)
+
+    return (
+        readings.order_by('station_id', 'timestamp')
+        .values_list(*export_columns(model))
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def stream_export(model, export_format, **filters):
+    """
+    Yield a reading table as CSV (with a header line) or NDJSON text chunks.
+
+    Args:
+        model: One of the reading models in sensors.models
+        export_format: 'csv' or 'ndjson'
+        **filters: station_ids, start, end, see export_rows
+    """
+    columns = export_columns(model)
+    buffer = _LineBuffer()
+
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        formatters = [formatter or _csv_value for formatter in text_formatters(model, columns)]
+
+        def encode(row):
+            writer.writerow([formatter(value) for formatter, value in zip(formatters, row)])
+
+        # The header goes out before the query runs
+        writer.writerow(columns)
+        yield buffer.lines.pop()
+    else:
+        def encode(row):
+            buffer.write(json.dumps(dict(zip(columns, map(_json_value, row)))) + '\n')
+
+    for row in export_rows(model, **filters):
+        encode(row)
+        if len(buffer.lines) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer.lines)
+            buffer.lines = []
+
+    if buffer.lines:
+        yield ''.join(buffer.lines)
@@ -0,0 +1,172 @@
+"""
+Shared helpers for the sensor ingest endpoints.
+
+Turns Arduino payloads into reading rows and runs the alert pipeline, so
+the single-snapshot endpoint, the batch endpoint and the spool worker all
+store data the same way.
+"""
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from stations.models import Station
+from sensors.models import READING_MODELS, reading_fields
+from sensors.latest import update_station_latest
+from sensors.rollups import update_rollups
+from sensors.upsert import upsert_readings
+from notifications.alert_system import alert_analyzer
+from notifications.cooldown import alert_to_push
+from notifications.dispatcher import enqueue_alert
+
+from .stream import station_updates
+
+
+def get_or_create_station(data):
+    """Return the Station for a payload, creating it from the payload location if new."""
+    location = data.get('location', {})
+    station, _ = Station.objects.get_or_create(
+        station_id=data['station_id'],
+        defaults={
+            'name': data.get('name', data['station_id']),
+            'latitude': location.get('latitude', 0),
+            'longitude': location.get('longitude', 0),
+            'altitude': location.get('altitude', 0),
+            'trail_name': location.get('trail_name', ''),
+        }
+    )
+    return station
+
+
+def extract_readings(data):
+    """
+    Return {section: {field: value}} for every reading present in a snapshot.
+
+    Sections follow READING_MODELS. Power is only stored when at least one
+    value is set, the Arduino sends an all-null block without a fuel gauge.
+    """
+    sensors = data.get('sensors', {})
+    readings = {}
+
+    for section, model in READING_MODELS.items():
+        if section == 'power':
+            values = data.get('power') or {}
+            if not any(v is not None for v in values.values()):
+                continue
+        elif section in sensors:
+            values = sensors[section]
+        else:
+            continue
+
+        readings[section] = {field: values.get(field) for field in reading_fields(model)}
+
+    return readings
+
+
+def validate_snapshot(data):
+    """
+    Check a snapshot payload without touching the database.
+
+    Raises ValueError, ValidationError or decimal.InvalidOperation when a
+    section is malformed or a value does not fit its column.
+    """
+    sensors = data.get('sensors', {})
+    if not isinstance(sensors, dict):
+        raise ValueError('sensors must be an object')
+
+    for section in READING_MODELS:
+        values = data.get('power') if section == 'power' else sensors.get(section)
+        if values is not None and not isinstance(values, dict):
+            raise ValueError(f'{section} must be an object')
+
+    # Same conversion the upsert applies, so anything accepted here can be stored
+    for section, values in extract_readings(data).items():
+        opts = READING_MODELS[section]._meta
+        for name, value in values.items():
+            opts.get_field(name).get_db_prep_save(value, connection=connection)
+
+
+def store_batch(station, snapshots):
+    """
+    Store many snapshots for one station with one upsert per reading table.
+
+    Args:
+        station: Station the snapshots belong to
+        snapshots: List of (timestamp, payload) tuples
+
+    All tables, the station's StationLatest row and the touched hourly and
+    daily rollups are written in a single transaction, so a failing INSERT
+    rolls back the whole batch. A snapshot whose timestamp is already
+    stored overwrites the previous values. Every row written gets the
+    batch's change sequence number (see next_change_seq). Once committed,
+    a batch that advanced the station's latest snapshot is published to
+    live streams.
+
+    Returns the updated StationLatest row, or None when every snapshot was
+    older than the stored latest one (see update_station_latest).
+    """
+    rows = {section: [] for section in READING_MODELS}
+    extracted = [(timestamp, extract_readings(data)) for timestamp, data in snapshots]
+
+    with transaction.atomic():
+        change_seq = next_change_seq(station)
+        for timestamp, readings in extracted:
+            for section, values in readings.items():
+                model = READING_MODELS[section]
+                rows[section].append(model(station=station, timestamp=timestamp,
+                                           change_seq=change_seq, **values))
+
+        for section, instances in rows.items():
+            upsert_readings(READING_MODELS[section], instances)
+        latest = update_station_latest(station, extracted)
+        update_rollups(station, extracted)
+
+        if latest is not None:
+            # Have the live streams of this process read it once it is visible
+            transaction.on_commit(lambda: station_updates.publish(station.station_id))
+
+    return latest
+
+
+def next_change_seq(station):
+    """
+    Take the station's next change sequence number, inside the ingest
+    transaction.
+
+    The UPDATE keeps the station row locked until commit, so batches of one
+    station commit in sequence order: a delta sync client that has seen a
+    number has seen every row written up to it, overwrites included.
+    """
+    Station.objects.filter(pk=station.pk).update(change_seq=F('change_seq') + 1)
+    return Station.objects.filter(pk=station.pk).values_list('change_seq', flat=True).get()
+
+
+def store_snapshot(station, timestamp, data):
+    """Store one snapshot, one INSERT ... ON CONFLICT statement per reading present."""
+    store_batch(station, [(timestamp, data)])
+
+
+def process_alerts(station, sensors, timestamp):
+    """
+    Run AlertAnalyzer on a snapshot and queue the top danger/warning alert
+    that is due, or an all clear, per the station's alert cooldowns.
+
+    Delivery to devices happens in the dispatch_notifications worker.
+    Returns (actionable_alerts, notification_queued).
+    """
+    station_name = station.trail_name or station.name
+    alerts = alert_analyzer.analyze(
+        data=sensors,
+        station_name=station_name,
+        station_id=station.station_id,
+        timestamp=timestamp,
+    )
+
+    actionable_alerts = [a for a in alerts if a.severity in ('danger', 'warning')]
+
+    # Repeated conditions stop here, before the outbox and any device lookup
+    alert = alert_to_push(station, actionable_alerts, timestamp, station_name)
+    if alert is None:
+        return actionable_alerts, False
+
+    enqueue_alert(station, alert)
+    return actionable_alerts, True
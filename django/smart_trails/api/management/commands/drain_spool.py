@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.spool import drain_once, ingest_spool
+
+
+class Command(BaseCommand):
+    help = 'Store spooled sensor snapshots and run the alert pipeline (INGEST_MODE = "spool")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.INGEST_SPOOL_BATCH_SIZE,
+                            help='Spool entries processed per batch')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to sleep when the spool is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain until empty, then exit')
+        parser.add_argument('--status', action='store_true',
+                            help='Print backlog depth and exit')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            depth = ingest_spool.depth()
+            self.stdout.write(f"pending={depth['pending']} failed={depth['failed']}")
+            return
+
+        self.stdout.write(f'Draining ingest spool {ingest_spool.path}')
+
+        while True:
+            # Drop connections past CONN_MAX_AGE or broken by a database restart
+            close_old_connections()
+            processed = drain_once(ingest_spool, options['batch_size'])
+
+            if processed:
+                depth = ingest_spool.depth()
+                self.stdout.write(
+                    f"Processed {processed} snapshots, "
+                    f"backlog pending={depth['pending']} failed={depth['failed']}"
+                )
+                continue
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.models import READING_MODELS
+from api import parquet_export
+
+
+class Command(BaseCommand):
+    help = 'Export reading tables to Parquet files partitioned by station and month (needs pyarrow)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Root directory of the dataset')
+        parser.add_argument('--sensor', action='append', choices=list(READING_MODELS),
+                            help='Reading table to export (repeatable, default: all)')
+        parser.add_argument('--station', action='append', dest='station_ids',
+                            help='Only export this station (repeatable)')
+        parser.add_argument('--compression', choices=parquet_export.COMPRESSIONS, default='zstd')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only rewrite months that got new rows since the last export')
+
+    def handle(self, *args, **options):
+        if parquet_export.pa is None:
+            raise CommandError('Parquet export requires pyarrow (pip install pyarrow)')
+
+        for sensor in options['sensor'] or READING_MODELS:
+            written = parquet_export.export_table(
+                READING_MODELS[sensor], options['output_dir'],
+                station_ids=options['station_ids'],
+                compression=options['compression'],
+                incremental=options['incremental'],
+            )
+            self.stdout.write(f'{sensor}: {len(written)} partitions written')
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from sensors.models import READING_MODELS
+from api.export import EXPORT_FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream a reading table as CSV or NDJSON, in constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sensor', choices=list(READING_MODELS),
+                            help='Reading table to export')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--station', action='append', dest='station_ids',
+                            help='Only export this station (repeatable)')
+        parser.add_argument('--start', help='Only rows at or after this ISO 8601 timestamp')
+        parser.add_argument('--end', help='Only rows before this ISO 8601 timestamp')
+        parser.add_argument('--output', '-o',
+                            help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('start', 'end'):
+            if options[name]:
+                try:
+                    bounds[name] = parse_datetime(options[name])
+                except ValueError:
+                    # Well formed but not a valid date, e.g. 2026-13-01
+                    bounds[name] = None
+                if bounds[name] is None:
+                    raise CommandError(f'--{name} must be an ISO 8601 timestamp')
+                if timezone.is_naive(bounds[name]):
+                    bounds[name] = timezone.make_aware(bounds[name])
+
+        chunks = stream_export(
+            READING_MODELS[options['sensor']], options['format'],
+            station_ids=options['station_ids'], **bounds
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,208 @@
+"""
+Partitioned Parquet export of the reading tables, for analytics.
+
+Each reading table is written as one Parquet file per station and month:
+
+    <root>/<table>/station_id=<id>/month=<YYYY-MM>/part-0.parquet
+
+a Hive-style layout pandas, DuckDB and Spark read as one dataset. Rows
+are streamed from the database in chunks and converted to Arrow record
+batches, so memory is bounded by the batch size.
+
+A manifest next to each table's partitions records the row count and
+highest id of every exported partition. The incremental mode only
+rewrites partitions whose fingerprint changed, i.e. months that received
+new rows since the last run.
+
+pyarrow is an optional dependency, only needed by this module.
+"""
+
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import models
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth
+
+from sensors.models import reading_fields
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+COMPRESSIONS = ('zstd', 'snappy', 'gzip', 'none')
+
+# Rows per Arrow record batch, also the database fetch size
+PARQUET_BATCH_ROWS = 50000
+
+MANIFEST_NAME = '_manifest.json'
+
+
+def _arrow_type(field):
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, models.IntegerField):
+        return pa.int32()
+    return pa.float64()
+
+
+def arrow_schema(model):
+    """Arrow schema of a reading table: station, UTC timestamp, then the values."""
+    opts = model._meta
+    return pa.schema(
+        [pa.field('station_id', pa.string(), nullable=False),
+         pa.field('timestamp', pa.timestamp('us', tz='UTC'), nullable=False)]
+        + [pa.field(name, _arrow_type(opts.get_field(name))) for name in reading_fields(model)]
+    )
+
+
+def partition_fingerprints(model, station_ids=None):
+    """
+    Return {(station_id, 'YYYY-MM'): {'rows': n, 'max_id': id}} of a table.
+
+    One GROUP BY over the whole table, months are UTC.
+    """
+    readings = model.objects.all()
+    if station_ids:
+        readings = readings.filter(station_id__in=station_ids)
+
+    rows = (
+        readings
+        .annotate(month=TruncMonth('timestamp', tzinfo=dt_timezone.utc))
+        .values('station_id', 'month')
+        .annotate(rows=Count('pk'), max_id=Max('pk'))
+        .order_by('station_id', 'month')
+    )
+    return {
+        (row['station_id'], row['month'].strftime('%Y-%m')): {'rows': row['rows'], 'max_id': row['max_id']}
+        for row in rows
+    }
+
+
+def _month_range(month):
+    start = datetime.strptime(month, '%Y-%m').replace(tzinfo=dt_timezone.utc)
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def _source_types(model, schema):
+    """Arrow types the database values convert to without loss, per column."""
+    opts = model._meta
+    types = []
+    for field in schema:
+        db_field = opts.get_field('station' if field.name == 'station_id' else field.name)
+        if isinstance(db_field, models.DecimalField):
+            types.append(pa.decimal128(db_field.max_digits, db_field.decimal_places))
+        else:
+            types.append(field.type)
+    return types
+
+
+def _to_batch(columns, schema, source_types):
+    # Decimals are converted to float64 in one vectorized cast
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=source).cast(field.type)
+         for values, source, field in zip(columns, source_types, schema)],
+        schema=schema,
+    )
+
+
+def _record_batches(model, schema, station_id, month):
+    """Stream one partition from the database as Arrow record batches."""
+    start, end = _month_range(month)
+    source_types = _source_types(model, schema)
+    rows = (
+        model.objects
+        .filter(station_id=station_id, timestamp__gte=start, timestamp__lt=end)
+        .order_by('timestamp')
+        .values_list(*schema.names)
+        .iterator(chunk_size=PARQUET_BATCH_ROWS)
+    )
+
+    columns = [[] for _ in schema.names]
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+        if len(columns[0]) >= PARQUET_BATCH_ROWS:
+            yield _to_batch(columns, schema, source_types)
+            columns = [[] for _ in schema.names]
+
+    if columns[0]:
+        yield _to_batch(columns, schema, source_types)
+
+
+def write_partition(model, root, station_id, month, compression='zstd'):
+    """
+    Write one station-month partition, replacing any previous file atomically.
+
+    Returns the path written.
+    """
+    schema = arrow_schema(model)
+    directory = os.path.join(root, model._meta.db_table,
+                             f'station_id={station_id}', f'month={month}')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'part-0.parquet')
+    tmp_path = path + '.tmp'
+
+    with pq.ParquetWriter(tmp_path, schema,
+                          compression=None if compression == 'none' else compression) as writer:
+        for batch in _record_batches(model, schema, station_id, month):
+            writer.write_batch(batch)
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def _manifest_path(model, root):
+    return os.path.join(root, model._meta.db_table, MANIFEST_NAME)
+
+
+def _load_manifest(model, root):
+    try:
+        with open(_manifest_path(model, root)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_manifest(model, root, manifest):
+    path = _manifest_path(model, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def export_table(model, root, station_ids=None, compression='zstd', incremental=False):
+    """
+    Export a reading table to partitioned Parquet under `root`.
+
+    With incremental=True only partitions whose row count or highest id
+    differ from the manifest are rewritten. Overwritten values of existing
+    rows keep their id and are not detected; run a full export to pick
+    them up. Returns the list of (station_id, month) written.
+    """
+    if pa is None:
+        raise ImportError('Parquet export requires pyarrow (pip install pyarrow)')
+
+    manifest = _load_manifest(model, root)
+    written = []
+
+    try:
+        for (station_id, month), fingerprint in partition_fingerprints(model, station_ids).items():
+            key = f'{station_id}/{month}'
+            if incremental and manifest.get(key) == fingerprint:
+                continue
+            write_partition(model, root, station_id, month, compression)
+            manifest[key] = fingerprint
+            written.append((station_id, month))
+    finally:
+        # Also saved when interrupted, so the next incremental run resumes
+        _save_manifest(model, root, manifest)
+
+    return written
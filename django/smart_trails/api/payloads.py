@@ -0,0 +1,218 @@
+"""
+JSON documents describing a station, shared by the REST views and the live stream.
+
+The station document can be projected to a subset of its fields
+(`?fields=atmospheric.temperature,precipitation`) and rendered with short
+keys (`?compact=1`) for bandwidth-constrained clients such as the watch.
+A projection also limits which StationLatest columns are loaded.
+"""
+
+from datetime import datetime
+
+
+# Document section -> [(key, StationLatest column, value when missing)]
+SENSOR_FIELDS = {
+    'atmospheric': [
+        ('temperature', 'temperature', 0.0),
+        ('temperature_is_dangerous', 'temperature_is_dangerous', False),
+        ('humidity', 'humidity', 0.0),
+        ('humidity_is_dangerous', 'humidity_is_dangerous', False),
+        ('pressure', 'pressure', 0.0),
+        ('pressure_is_dangerous', 'pressure_is_dangerous', False),
+    ],
+    'light': [
+        ('uv_index', 'uv_index', 0.0),
+        ('uv_index_is_dangerous', 'uv_index_is_dangerous', False),
+        ('lux', 'lux', 0),
+        ('lux_is_dangerous', 'lux_is_dangerous', False),
+    ],
+    'soil': [
+        ('temperature', 'soil_temperature', 0.0),
+        ('moisture_percent', 'moisture_percent', 0.0),
+        ('moisture_percent_is_dangerous', 'moisture_percent_is_dangerous', False),
+    ],
+    'air_quality': [
+        ('co2_ppm', 'co2_ppm', 0),
+        ('co2_ppm_is_dangerous', 'co2_ppm_is_dangerous', False),
+        ('tvoc_ppb', 'tvoc_ppb', 0),
+        ('aqi', 'aqi', 0),
+    ],
+    'precipitation': [
+        ('is_raining', 'is_raining', False),
+        ('is_raining_is_dangerous', 'is_raining_is_dangerous', False),
+        ('rain_detected_last_hour', 'rain_detected_last_hour', False),
+        ('rain_detected_last_hour_is_dangerous', 'rain_detected_last_hour_is_dangerous', False),
+    ],
+    'trail_activity': [
+        ('motion_count', 'motion_count', 0),
+        ('motion_count_is_dangerous', 'motion_count_is_dangerous', False),
+        ('period_minutes', 'period_minutes', 15),
+    ],
+}
+
+POWER_FIELDS = [
+    ('percentage', 'battery_percentage', None),
+    ('voltage_mv', 'battery_voltage_mv', None),
+    ('is_charging', 'battery_is_charging', None),
+]
+
+# Short keys of the compact document. Danger flags get a '!' suffix.
+COMPACT_KEYS = {
+    'station_id': 'id',
+    'timestamp': 'ts',
+    'location': 'loc',
+    'latitude': 'lat',
+    'longitude': 'lon',
+    'altitude': 'alt',
+    'trail_name': 'trail',
+    'power': 'pw',
+    'atmospheric': 'a',
+    'light': 'l',
+    'soil': 's',
+    'air_quality': 'aq',
+    'precipitation': 'p',
+    'trail_activity': 'ta',
+    'temperature': 't',
+    'humidity': 'h',
+    'pressure': 'p',
+    'uv_index': 'uv',
+    'lux': 'lx',
+    'moisture_percent': 'm',
+    'co2_ppm': 'co2',
+    'tvoc_ppb': 'voc',
+    'aqi': 'aqi',
+    'is_raining': 'r',
+    'rain_detected_last_hour': 'r1h',
+    'motion_count': 'mc',
+    'period_minutes': 'pm',
+    'percentage': 'pct',
+    'voltage_mv': 'mv',
+    'is_charging': 'chg',
+}
+
+# Columns every document needs, for the timestamp
+BASE_COLUMNS = ['timestamp', 'updated_at']
+
+
+def parse_fields(value):
+    """
+    Parse a `fields` projection into {part: None (whole) or set of keys}.
+
+    Parts are 'location', 'power' or a sensor section; 'section.key'
+    selects single keys. Raises ValueError naming unknown paths.
+    """
+    projection = {}
+    unknown = []
+    for path in filter(None, (p.strip() for p in value.split(','))):
+        part, _, key = path.partition('.')
+        if part == 'location' and not key:
+            projection['location'] = None
+            continue
+        fields = POWER_FIELDS if part == 'power' else SENSOR_FIELDS.get(part)
+        if fields is None or (key and key not in {k for k, _, _ in fields}):
+            unknown.append(path)
+            continue
+        if not key:
+            projection[part] = None
+        elif projection.get(part, set()) is not None:
+            projection.setdefault(part, set()).add(key)
+
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return projection
+
+
+def _selected(fields, keys):
+    return [field for field in fields if keys is None or field[0] in keys]
+
+
+def required_columns(projection):
+    """StationLatest columns a projection reads (None: the whole document)."""
+    if projection is None:
+        return None
+    columns = list(BASE_COLUMNS)
+    for part, keys in projection.items():
+        if part == 'location':
+            continue
+        fields = POWER_FIELDS if part == 'power' else SENSOR_FIELDS[part]
+        columns += [column for _, column, _ in _selected(fields, keys)]
+    return columns
+
+
+def _values(latest, fields):
+    values = {}
+    for key, column, default in fields:
+        value = getattr(latest, column)
+        values[key] = default if value is None else value
+    return values
+
+
+def station_payload(station, latest, projection=None):
+    """
+    Build the station data document the apps consume from a StationLatest row.
+
+    With a projection (see parse_fields) only the selected parts are
+    built; station_id and timestamp are always included. `station` is
+    only read for the location.
+    """
+    # Time of the newest snapshot, so the body only changes on ingest
+    timestamp = latest.timestamp or latest.updated_at
+    document = {
+        'station_id': latest.station_id,
+        'timestamp': timestamp.isoformat() if timestamp is not None else None,
+    }
+    if projection is None or 'location' in projection:
+        document['location'] = station_location(station)
+
+    sensors = {}
+    for section, fields in SENSOR_FIELDS.items():
+        if projection is None or section in projection:
+            keys = projection[section] if projection is not None else None
+            sensors[section] = _values(latest, _selected(fields, keys))
+    if sensors or projection is None:
+        document['sensors'] = sensors
+
+    if projection is None or 'power' in projection:
+        keys = projection['power'] if projection is not None else None
+        document['power'] = _values(latest, _selected(POWER_FIELDS, keys))
+
+    return document
+
+
+def compact_payload(document):
+    """
+    Shorten the keys of a station document and flatten its sensor sections
+    to the top level. The timestamp becomes epoch seconds.
+    """
+    compact = {}
+    for key, value in document.items():
+        if key == 'sensors':
+            for section, values in value.items():
+                compact[COMPACT_KEYS[section]] = _compact_keys(values)
+        elif key == 'timestamp':
+            compact['ts'] = int(datetime.fromisoformat(value).timestamp()) if value else None
+        elif isinstance(value, dict):
+            compact[COMPACT_KEYS[key]] = _compact_keys(value)
+        else:
+            compact[COMPACT_KEYS[key]] = value
+    return compact
+
+
+def _compact_keys(values):
+    compact = {}
+    for key, value in values.items():
+        if key.endswith('_is_dangerous'):
+            compact[COMPACT_KEYS[key[:-len('_is_dangerous')]] + '!'] = value
+        else:
+            compact[COMPACT_KEYS[key]] = value
+    return compact
+
+
+def station_location(station):
+    """Location block of the station documents."""
+    return {
+        'latitude': float(station.latitude),
+        'longitude': float(station.longitude),
+        'altitude': station.altitude,
+        'trail_name': station.trail_name or station.name
+    }
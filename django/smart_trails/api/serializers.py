@@ -8,7 +8,8 @@ from sensors.models import (
     SoilReading,
     AirQualityReading,
     PrecipitationReading,
-    TrailActivityReading
+    TrailActivityReading,
+    PowerReading,
 )
 
 
@@ -52,7 +53,7 @@ class SoilReadingSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = SoilReading
-        fields = ['station', 'timestamp', 'moisture_percent']
+        fields = ['station', 'timestamp', 'temperature', 'moisture_percent']
 
 
 class AirQualityReadingSerializer(serializers.ModelSerializer):
@@ -60,7 +61,7 @@ class AirQualityReadingSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = AirQualityReading
-        fields = ['station', 'timestamp', 'co2_ppm']
+        fields = ['station', 'timestamp', 'co2_ppm', 'tvoc_ppb', 'aqi']
 
 
 class PrecipitationReadingSerializer(serializers.ModelSerializer):
@@ -76,4 +77,24 @@ class TrailActivityReadingSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = TrailActivityReading
-        fields = ['station', 'timestamp', 'motion_count', 'period_minutes']
\ No newline at end of file
+        fields = ['station', 'timestamp', 'motion_count', 'period_minutes']
+
+
+class PowerReadingSerializer(serializers.ModelSerializer):
+    """Serializer for battery/charging readings"""
+    
+    class Meta:
+        model = PowerReading
+        fields = ['station', 'timestamp', 'percentage', 'voltage_mv', 'is_charging']
+
+
+# Payload section -> serializer, keys match sensors.models.READING_MODELS
+READING_SERIALIZERS = {
+    'atmospheric': AtmosphericReadingSerializer,
+    'light': LightReadingSerializer,
+    'soil': SoilReadingSerializer,
+    'air_quality': AirQualityReadingSerializer,
+    'precipitation': PrecipitationReadingSerializer,
+    'trail_activity': TrailActivityReadingSerializer,
+    'power': PowerReadingSerializer,
+}
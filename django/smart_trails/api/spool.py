@@ -0,0 +1,179 @@
+"""
+Durable on-disk spool for asynchronous ingest.
+
+With settings.INGEST_MODE = 'spool' the ingest endpoint only validates a
+payload, appends it here and answers 202. The `drain_spool` management
+command stores spooled snapshots in batches and runs the alert pipeline.
+
+The spool is a WAL-mode SQLite file next to the project database, so
+appends from several web workers are cheap and nothing is lost if the
+worker dies: entries are only deleted once their batch is committed, and
+re-processing a batch after a crash is harmless because readings are
+upserted on (station, timestamp).
+
+Several drain_spool workers can run at once: a worker claims its entries
+in one write transaction, and the others skip them until the claim is
+older than CLAIM_LEASE (a worker that died mid-batch), so a snapshot is
+not stored twice by concurrent batches.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from .ingest import get_or_create_station, process_alerts, store_batch
+
+
+# Entries failing this many times are kept for inspection but no longer retried
+MAX_ATTEMPTS = 5
+
+# Claims older than this are taken back from a worker assumed dead
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+class IngestSpool:
+    """FIFO of raw ingest payloads in a local SQLite file."""
+
+    def __init__(self, path=None, clock=time.time):
+        self._path = path
+        self._clock = clock
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        return str(self._path or settings.INGEST_SPOOL_PATH)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.path != self.path:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS spool ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' received_at TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' last_error TEXT,'
+                ' claimed_at REAL)'
+            )
+            # Spool files created before claims existed
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(spool)')]
+            if 'claimed_at' not in columns:
+                conn.execute('ALTER TABLE spool ADD COLUMN claimed_at REAL')
+            self._local.conn = conn
+            self._local.path = self.path
+        return conn
+
+    def _executemany(self, sql, params):
+        """Run one statement for many rows in a single transaction."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(sql, params)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def append(self, payload, received_at):
+        """Durably queue one payload. Returns the spool entry id."""
+        cursor = self._connection().execute(
+            'INSERT INTO spool (received_at, payload) VALUES (?, ?)',
+            (received_at.isoformat(), json.dumps(payload)),
+        )
+        return cursor.lastrowid
+
+    def claim(self, limit):
+        """
+        Take up to `limit` pending entries, oldest first, as (id, received_at, payload).
+
+        Entries claimed by another worker less than CLAIM_LEASE ago are skipped.
+        """
+        now = self._clock()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, received_at, payload FROM spool '
+                'WHERE attempts < ? AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?',
+                (MAX_ATTEMPTS, now - CLAIM_LEASE.total_seconds(), limit),
+            ).fetchall()
+            conn.executemany('UPDATE spool SET claimed_at = ? WHERE id = ?',
+                             [(now, entry_id) for entry_id, _, _ in rows])
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return [
+            (entry_id, datetime.fromisoformat(received_at), json.loads(payload))
+            for entry_id, received_at, payload in rows
+        ]
+
+    def ack(self, entry_ids):
+        """Remove processed entries."""
+        if entry_ids:
+            self._executemany(
+                'DELETE FROM spool WHERE id = ?', [(entry_id,) for entry_id in entry_ids]
+            )
+
+    def fail(self, entry_ids, error):
+        """Record a failed attempt and release the claim, entries are retried until MAX_ATTEMPTS."""
+        if entry_ids:
+            self._executemany(
+                'UPDATE spool SET attempts = attempts + 1, last_error = ?, claimed_at = NULL WHERE id = ?',
+                [(str(error), entry_id) for entry_id in entry_ids],
+            )
+
+    def depth(self):
+        """Return {'pending': n, 'failed': n} backlog counts."""
+        pending, failed = self._connection().execute(
+            'SELECT COALESCE(SUM(attempts < ?), 0), COALESCE(SUM(attempts >= ?), 0) FROM spool',
+            (MAX_ATTEMPTS, MAX_ATTEMPTS),
+        ).fetchone()
+        return {'pending': pending, 'failed': failed}
+
+
+def drain_once(spool, batch_size):
+    """
+    Store and analyze one batch of spooled snapshots.
+
+    Entries are grouped per station and written with one upsert per reading
+    table. The alert pipeline runs on the newest snapshot of each station,
+    unless a newer one was stored already.
+    Returns the number of entries processed.
+    """
+    entries = spool.claim(batch_size)
+
+    by_station = {}
+    for entry_id, received_at, payload in entries:
+        by_station.setdefault(payload['station_id'], []).append((entry_id, received_at, payload))
+
+    for station_entries in by_station.values():
+        entry_ids = [entry_id for entry_id, _, _ in station_entries]
+        try:
+            station = get_or_create_station(station_entries[-1][2])
+            advanced = store_batch(station, [(ts, payload) for _, ts, payload in station_entries])
+        except Exception as e:
+            spool.fail(entry_ids, e)
+            continue
+
+        spool.ack(entry_ids)
+        if advanced is None:
+            continue
+
+        _, timestamp, latest = max(station_entries, key=lambda entry: entry[1])
+        try:
+            process_alerts(station, latest.get('sensors', {}), timestamp)
+        except Exception as e:
+            print(f"Alert processing failed for {station.station_id}: {e}")
+
+    return len(entries)
+
+
+ingest_spool = IngestSpool()
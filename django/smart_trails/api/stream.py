@@ -0,0 +1,260 @@
+"""
+Server-Sent Events feed of station updates.
+
+GET /api/v1/stations/<station_id>/stream/ keeps the connection open and
+sends the station data document (same JSON as /data/) once on connect and
+again every time ingest commits a newer snapshot for the station, so the
+apps no longer need to poll.
+
+Django 3.2 cannot serve long-lived async responses, so the stream is a
+small native ASGI app mounted in front of Django in smart_trails/asgi.py;
+every other request goes to Django unchanged.
+
+Updates reach the streams through the database, so ingest handled by any
+ASGI worker or by the drain_spool worker is seen by every stream. Each
+process runs one StationUpdates poller on its event loop while it has
+streams open: every POLL_INTERVAL it reads Station.change_seq of the
+watched stations in one query (see api.ingest.next_change_seq) and loads
+the document of those that moved. A new document is encoded once and
+wakes every subscriber of the station with one asyncio.Event, so idle
+connections cost a parked coroutine each. Ingest in the same process calls
+publish() after commit to poll right away instead of at the next interval.
+"""
+
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, close_old_connections
+
+from sensors.models import StationLatest
+from stations.models import Station
+
+from .payloads import station_payload
+
+
+STREAM_PATH = re.compile(r'^/api/v1/stations/(?P<station_id>[^/]+)/stream/$')
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+# Client reconnect delay advertised to EventSource, in milliseconds
+RETRY_MS = 5000
+
+# Seconds between two reads of the watched stations' change sequence
+POLL_INTERVAL = 1
+
+
+class _Channel:
+    """Latest document of a station plus the event its subscribers wait on."""
+
+    def __init__(self):
+        self.message = None
+        self.change_seq = None
+        self.event = asyncio.Event()
+        self.subscribers = 0
+
+
+class StationUpdates:
+    """Relay of station documents from the database to the streams of this process."""
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._loop = None
+        self._channels = {}
+        self._poller = None
+        self._wake = None
+
+    def bind(self, loop):
+        self._loop = loop
+
+    def publish(self, station_id):
+        """
+        Have the poller read the database now, after a station changed.
+        Safe to call from any thread.
+
+        A no-op until a stream has been opened in this process; streams of
+        other processes see the change at their next poll.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._wake_poller)
+
+    def _wake_poller(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _poll(self):
+        while self._channels:
+            # A publish() during the read below triggers another one right away
+            self._wake = asyncio.Event()
+            seen = {station_id: channel.change_seq for station_id, channel in self._channels.items()}
+            try:
+                changes = await sync_to_async(_changed_documents)(seen)
+            except DatabaseError:
+                # Retried at the next poll
+                changes = {}
+            for station_id, (change_seq, document) in changes.items():
+                self._deliver(station_id, change_seq, document)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _deliver(self, station_id, change_seq, document):
+        channel = self._channels.get(station_id)
+        if channel is None:
+            return
+        channel.change_seq = change_seq
+        # A batch that did not advance the latest snapshot leaves the document as is
+        message = None if document is None else json.dumps(document)
+        if message is None or message == channel.message:
+            return
+        channel.message = message
+        # Wake everyone waiting on the current event, later waits use a new one
+        event, channel.event = channel.event, asyncio.Event()
+        event.set()
+
+    async def subscribe(self, station_id, heartbeat=HEARTBEAT_INTERVAL):
+        """
+        Yield each new document of a station as a JSON string, or None after
+        `heartbeat` idle seconds. A slow consumer only sees the newest one.
+        """
+        channel = self._channels.setdefault(station_id, _Channel())
+        channel.subscribers += 1
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll())
+        try:
+            while True:
+                event = channel.event
+                try:
+                    await asyncio.wait_for(event.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield channel.message
+        finally:
+            channel.subscribers -= 1
+            if not channel.subscribers:
+                del self._channels[station_id]
+
+    def subscriber_count(self, station_id=None):
+        if station_id is not None:
+            channel = self._channels.get(station_id)
+            return channel.subscribers if channel else 0
+        return sum(channel.subscribers for channel in self._channels.values())
+
+
+def _changed_documents(seen):
+    """
+    {station_id: (change_seq, document)} of the stations of `seen`, a dict
+    of station_id to the last change_seq read, whose change_seq moved.
+    """
+    # Outside of Django's request cycle, drop connections past CONN_MAX_AGE here
+    close_old_connections()
+    current = Station.objects.filter(station_id__in=list(seen)).values_list('station_id', 'change_seq')
+    return {
+        station_id: (change_seq, _current_document(station_id))
+        for station_id, change_seq in current
+        if change_seq != seen[station_id]
+    }
+
+
+def _current_document(station_id):
+    latest = StationLatest.objects.select_related('station').filter(station_id=station_id).first()
+    if latest is None:
+        return None
+    return station_payload(latest.station, latest)
+
+
+def _event(message):
+    return f'event: station\ndata: {message}\n\n'.encode()
+
+
+async def _send_json(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+async def stream_station(scope, receive, send, station_id):
+    """ASGI handler of one SSE connection."""
+    station_updates.bind(asyncio.get_running_loop())
+
+    # Subscribe first, so nothing published while loading the current
+    # document is missed
+    updates = station_updates.subscribe(station_id)
+    next_update = asyncio.ensure_future(updates.__anext__())
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+
+    try:
+        document = await sync_to_async(_current_document)(station_id)
+        if document is None:
+            await _send_json(send, 404, {
+                'status': 'error',
+                'message': f'Station {station_id} not found or has no data yet'
+            })
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Disable proxy buffering (nginx)
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        sent = json.dumps(document)
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {RETRY_MS}\n\n'.encode() + _event(sent),
+            'more_body': True,
+        })
+
+        while True:
+            done, _ = await asyncio.wait({next_update, disconnect},
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                return
+            message = next_update.result()
+            next_update = asyncio.ensure_future(updates.__anext__())
+            if message == sent:
+                # The poller's first read of a new channel, already sent on connect
+                continue
+            if message is not None:
+                sent = message
+            body = b': keep-alive\n\n' if message is None else _event(message)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        next_update.cancel()
+        disconnect.cancel()
+        await asyncio.gather(next_update, disconnect, return_exceptions=True)
+        await updates.aclose()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def route_streams(django_application):
+    """Wrap the Django ASGI app, serving station streams natively."""
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            match = STREAM_PATH.match(scope['path'])
+            if match:
+                return await stream_station(scope, receive, send, match['station_id'])
+        return await django_application(scope, receive, send)
+
+    return application
+
+
+station_updates = StationUpdates()
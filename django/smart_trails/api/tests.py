@@ -1,3 +1,908 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipIf
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api import parquet_export
+from api.spool import CLAIM_LEASE, IngestSpool, drain_once, ingest_spool
+from api.stream import StationUpdates, _changed_documents, route_streams, station_updates
+from notifications.alert_system import alert_analyzer
+from notifications.models import NotificationOutbox
+from notifications.pressure_history import MemoryPressureHistory
+from stations.models import Station
+from sensors.models import (
+    READING_MODELS, AtmosphericReading, HourlyRollup, PowerReading, PrecipitationReading, SoilReading, StationLatest,
+)
+from sensors.rollups import rebuild_rollups
+from sensors.tests import make_station
+
+
+def make_snapshot(age_seconds, temp=12.5, moisture=45.5, power=None):
+    """Build one batch snapshot matching the Arduino payload structure."""
+    snapshot = {
+        'age_seconds': age_seconds,
+        'sensors': {
+            'atmospheric': {'temperature': temp, 'humidity': 65.0, 'pressure': 875.3},
+            'soil': {'moisture_percent': moisture},
+        },
+    }
+    if power is not None:
+        snapshot['power'] = power
+    return snapshot
+
+
+def post_cold_rain_snapshot(client):
+    """Ingest a snapshot with several dangerous readings for test-station."""
+    client.post('/api/v1/sensors/data/', {
+        'station_id': 'test-station',
+        'timestamp': '2026-01-01T12:00:00Z',
+        'sensors': {
+            'atmospheric': {'temperature': 5.0, 'humidity': 95.0, 'pressure': 850.0},
+            'precipitation': {'is_raining': True, 'rain_detected_last_hour': True},
+        },
+        'power': {'percentage': 80, 'voltage_mv': 3900, 'is_charging': False},
+    }, format='json')
+
+
+class BatchIngestTests(TestCase):
+    url = '/api/v1/sensors/data/batch/'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def post_batch(self, snapshots, station_id='test-station'):
+        return self.client.post(self.url, {
+            'station_id': station_id,
+            'location': {'latitude': 45.5615, 'longitude': 8.0573, 'altitude': 1250},
+            'snapshots': snapshots,
+        }, format='json')
+
+    def test_batch_stores_every_snapshot_with_relative_timestamps(self):
+        response = self.post_batch([make_snapshot(1800), make_snapshot(900), make_snapshot(0)])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['stored'], 3)
+        self.assertEqual(AtmosphericReading.objects.count(), 3)
+        self.assertEqual(SoilReading.objects.count(), 3)
+
+        oldest, newest = AtmosphericReading.objects.order_by('timestamp')[::2]
+        self.assertEqual(newest.timestamp - oldest.timestamp, timedelta(seconds=1800))
+
+    def test_batch_uses_one_insert_per_table(self):
+        snapshots = [make_snapshot(age * 900) for age in range(50)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post_batch(snapshots)
+
+        self.assertEqual(response.data['stored'], 50)
+        inserts = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('INSERT') and '_readings' in q['sql']]
+        # One per reading table in the payload
+        self.assertEqual(len(inserts), 2)
+
+    def test_batch_reports_invalid_items_and_stores_the_rest(self):
+        response = self.post_batch([
+            make_snapshot(900),
+            {'sensors': {}},
+            make_snapshot(900),
+            make_snapshot(-5),
+            make_snapshot(0, power={'percentage': 80, 'voltage_mv': 3900, 'is_charging': False}),
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['stored', 'error', 'error', 'error', 'stored'])
+        self.assertEqual(AtmosphericReading.objects.count(), 2)
+        self.assertEqual(PowerReading.objects.count(), 1)
+
+    def test_batch_rejects_invalid_values_per_snapshot(self):
+        bad_value = make_snapshot(1800)
+        bad_value['sensors']['atmospheric']['temperature'] = 'abc'
+        bad_section = make_snapshot(900)
+        bad_section['sensors']['soil'] = 'wet'
+
+        response = self.post_batch([bad_value, bad_section, make_snapshot(10 ** 12), make_snapshot(0)])
+
+        self.assertEqual(response.status_code, 201)
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['rejected', 'rejected', 'error', 'stored'])
+        self.assertEqual(response.data['rejected'], 3)
+        self.assertEqual(AtmosphericReading.objects.count(), 1)
+
+    def test_batch_rejects_values_beyond_the_column_digits(self):
+        huge = make_snapshot(900, temp=1e9)
+        long = make_snapshot(600, temp=123456.7)
+
+        response = self.post_batch([huge, long, make_snapshot(0)])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['results']], ['rejected', 'rejected', 'stored'])
+        self.assertEqual(AtmosphericReading.objects.count(), 1)
+
+    def test_batch_rejects_snapshots_older_than_a_full_buffer(self):
+        response = self.post_batch([make_snapshot(400 * 86400), make_snapshot(0)])
+
+        self.assertEqual([r['status'] for r in response.data['results']], ['error', 'stored'])
+
+    def test_alerts_only_for_recent_newest_snapshot(self):
+        cold = make_snapshot(0, temp=-15.0)
+        # A live post, then an older buffer flushed late
+        self.client.post('/api/v1/sensors/data/', {
+            'station_id': 'test-station', 'timestamp': '2026-01-01T12:00:00Z',
+            'sensors': make_snapshot(0)['sensors'],
+        }, format='json')
+        late = self.post_batch([{**cold, 'age_seconds': 600}])
+        self.assertEqual(late.data['stored'], 1)
+        self.assertFalse(late.data['notification_queued'])
+
+        stale = self.post_batch([{**cold, 'age_seconds': 7200}], station_id='other-station')
+        self.assertFalse(stale.data['notification_queued'])
+        fresh = self.post_batch([{**cold, 'age_seconds': 7200}, cold], station_id='third-station')
+        self.assertTrue(fresh.data['notification_queued'])
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_batch_requires_snapshot_list(self):
+        response = self.client.post(self.url, {'station_id': 'test-station'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SingleIngestTests(TestCase):
+    url = '/api/v1/sensors/data/'
+
+    def test_snapshot_writes_one_statement_per_reading(self):
+        payload = {
+            'station_id': 'test-station',
+            'timestamp': '2026-01-01T12:00:00Z',
+            'sensors': make_snapshot(0)['sensors'],
+            'power': {'percentage': None, 'voltage_mv': None, 'is_charging': None},
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        reading_writes = [q['sql'] for q in ctx.captured_queries
+                          if 'ON CONFLICT' in q['sql'] and '_readings' in q['sql']]
+        self.assertEqual(len(reading_writes), 2)
+        self.assertFalse(any(q['sql'].startswith('UPDATE') and '_readings' in q['sql']
+                             for q in ctx.captured_queries))
+        self.assertTrue(StationLatest.objects.filter(station_id='test-station').exists())
+        self.assertEqual(PowerReading.objects.count(), 0)
+
+    def test_value_beyond_the_column_digits_is_refused(self):
+        for temperature in (1e9, 123456.7):
+            response = APIClient().post(self.url, {
+                'station_id': 'test-station',
+                'timestamp': '2026-01-01T12:00:00Z',
+                'sensors': {'atmospheric': {'temperature': temperature}},
+            }, format='json')
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('temperature', response.data['message'])
+        self.assertFalse(AtmosphericReading.objects.exists())
+
+    def test_alert_is_queued_without_device_lookup(self):
+        payload = {
+            'station_id': 'test-station',
+            'timestamp': '2026-01-01T12:00:00Z',
+            'sensors': make_snapshot(0, temp=-15.0)['sensors'],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().post(self.url, payload, format='json')
+
+        self.assertTrue(response.data['notification_queued'])
+        self.assertEqual(NotificationOutbox.objects.get().severity, 'danger')
+        self.assertFalse(any('device_tokens' in q['sql'] for q in ctx.captured_queries))
+
+    def test_memory_pressure_history_is_capped(self):
+        history = MemoryPressureHistory(max_stations=2)
+        with mock.patch.object(alert_analyzer, 'pressure_history', history):
+            for station_id in ('station-a', 'station-b', 'station-c'):
+                APIClient().post(self.url, {
+                    'station_id': station_id,
+                    'timestamp': '2026-01-01T12:00:00Z',
+                    'sensors': make_snapshot(0)['sensors'],
+                }, format='json')
+            health = APIClient().get('/api/v1/health/').data
+
+        self.assertEqual(health['pressure_history']['entries'], 2)
+        self.assertEqual(health['pressure_history']['evicted'], 1)
+        self.assertNotIn('pressure_history', APIClient().get('/api/v1/health/').data)
+
+
+class SpoolIngestTests(TestCase):
+    url = '/api/v1/sensors/data/'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(
+            INGEST_MODE='spool',
+            INGEST_SPOOL_PATH=os.path.join(tmp.name, 'spool.sqlite3'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def post(self, sensors):
+        return APIClient().post(self.url, {
+            'station_id': 'test-station',
+            'timestamp': '2026-01-01T12:00:00Z',
+            'sensors': sensors,
+        }, format='json')
+
+    def test_spool_mode_queues_and_worker_stores(self):
+        response = self.post(make_snapshot(0)['sensors'])
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(AtmosphericReading.objects.count(), 0)
+        self.assertEqual(ingest_spool.depth(), {'pending': 1, 'failed': 0})
+
+        health = APIClient().get('/api/v1/health/')
+        self.assertEqual(health.data['ingest_spool']['pending'], 1)
+
+        self.assertEqual(drain_once(ingest_spool, 100), 1)
+        self.assertEqual(AtmosphericReading.objects.count(), 1)
+        self.assertEqual(ingest_spool.depth(), {'pending': 0, 'failed': 0})
+
+    def test_spool_mode_rejects_invalid_values_up_front(self):
+        response = self.post({'atmospheric': {'temperature': 'warm'}})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ingest_spool.depth()['pending'], 0)
+
+    def test_concurrent_workers_do_not_claim_the_same_entries(self):
+        now = [1000.0]
+        first, second = (IngestSpool(ingest_spool.path, clock=lambda: now[0]) for _ in range(2))
+        for age_seconds in (0, 60, 120):
+            self.post(make_snapshot(age_seconds)['sensors'])
+
+        self.assertEqual(len(first.claim(2)), 2)
+        self.assertEqual([entry_id for entry_id, _, _ in second.claim(10)], [3])
+        self.assertEqual(second.claim(10), [])
+
+        # A failed entry is released for the next attempt
+        second.fail([3], ValueError('boom'))
+        self.assertEqual([entry_id for entry_id, _, _ in second.claim(10)], [3])
+
+        # Claims of a worker that died are taken back after the lease
+        now[0] += CLAIM_LEASE.total_seconds() + 1
+        self.assertEqual([entry_id for entry_id, _, _ in second.claim(10)], [1, 2, 3])
+        self.assertEqual(drain_once(first, 10), 0)
+
+
+
+class StationDataTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        post_cold_rain_snapshot(self.client)
+
+    def test_station_data_is_a_single_snapshot_read(self):
+        # Validator lookup for the conditional GET, then the snapshot row
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/stations/test-station/data/')
+
+        sensors = response.data['sensors']
+        self.assertEqual(sensors['atmospheric']['temperature'], 5.0)
+        self.assertTrue(sensors['atmospheric']['temperature_is_dangerous'])
+        self.assertTrue(sensors['atmospheric']['pressure_is_dangerous'])
+        self.assertTrue(sensors['precipitation']['is_raining_is_dangerous'])
+        self.assertEqual(sensors['light']['uv_index'], 0.0)
+        self.assertEqual(response.data['power']['percentage'], 80)
+
+    def test_station_without_data_is_served_without_writing(self):
+        make_station(station_id='new-station')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/stations/new-station/data/', {'compact': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['ts'])
+        self.assertFalse([q for q in ctx.captured_queries if not q['sql'].startswith('SELECT')])
+        self.assertFalse(StationLatest.objects.filter(station_id='new-station').exists())
+
+    def test_partial_snapshot_keeps_other_sections(self):
+        self.client.post('/api/v1/sensors/data/', {
+            'station_id': 'test-station',
+            'timestamp': '2026-01-01T12:15:00Z',
+            'sensors': {'precipitation': {'is_raining': False, 'rain_detected_last_hour': True}},
+        }, format='json')
+
+        sensors = self.client.get('/api/v1/stations/test-station/data/').data['sensors']
+        self.assertEqual(sensors['atmospheric']['pressure'], 850.0)
+        self.assertFalse(sensors['precipitation']['is_raining'])
+        # Still hypothermia risk from 95% humidity
+        self.assertTrue(sensors['atmospheric']['temperature_is_dangerous'])
+
+    def test_unknown_station_is_404(self):
+        response = self.client.get('/api/v1/stations/nope/data/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_returns_304_until_next_ingest(self):
+        first = self.client.get('/api/v1/stations/test-station/data/')
+        etag = first['ETag']
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/v1/stations/test-station/data/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        self.client.post('/api/v1/sensors/data/', {
+            'station_id': 'test-station',
+            'timestamp': '2026-01-01T12:15:00Z',
+            'sensors': {'atmospheric': {'temperature': 6.0}},
+        }, format='json')
+
+        fresh = self.client.get('/api/v1/stations/test-station/data/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual(fresh.data['sensors']['atmospheric']['temperature'], 6.0)
+
+
+class StationHistoryTests(TestCase):
+    url = '/api/v1/stations/test-station/history/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.post('/api/v1/sensors/data/batch/', {
+            'station_id': 'test-station',
+            'location': {'latitude': 45.5615, 'longitude': 8.0573, 'altitude': 1250},
+            'snapshots': [make_snapshot(age, temp=age / 100) for age in range(0, 5000, 1000)],
+        }, format='json')
+
+    def test_pages_follow_the_timestamp_cursor(self):
+        first = self.client.get(self.url, {'sensor': 'atmospheric', 'limit': 2})
+        self.assertEqual([r['temperature'] for r in first.data['results']], [0.0, 10.0])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual([r['temperature'] for r in second.data['results']], [20.0, 30.0])
+
+        last = self.client.get(second.data['next'])
+        self.assertEqual([r['temperature'] for r in last.data['results']], [40.0])
+        self.assertIsNone(last.data['next'])
+
+    def test_page_is_one_seek_query_without_offset(self):
+        before = AtmosphericReading.objects.order_by('-timestamp')[1].timestamp
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'before': before.isoformat(), 'limit': 2})
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+        self.assertEqual(response.data['count'], 2)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'sensor': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'before': 'yesterday'}).status_code, 400)
+
+    def test_unknown_station_is_404(self):
+        response = self.client.get('/api/v1/stations/nope/history/')
+        self.assertEqual(response.status_code, 404)
+
+
+# The fixtures are older than the default raw retention
+@override_settings(READING_RETENTION_DAYS={})
+class StationSeriesTests(TestCase):
+    url = '/api/v1/stations/test-station/series/'
+
+    def setUp(self):
+        self.client = APIClient()
+        station = make_station()
+        base = datetime(2026, 1, 1, 10, 0, tzinfo=dt_timezone.utc)
+        AtmosphericReading.objects.bulk_create([
+            AtmosphericReading(station=station, timestamp=base + timedelta(minutes=minutes),
+                               temperature=temp, humidity=60, pressure=870)
+            for minutes, temp in [(0, 10), (20, 12), (40, 14), (65, 20), (130, 5)]
+        ])
+        PrecipitationReading.objects.bulk_create([
+            PrecipitationReading(station=station, timestamp=base + timedelta(minutes=minutes),
+                                 is_raining=raining, rain_detected_last_hour=True)
+            for minutes, raining in [(0, True), (30, False), (45, False), (50, False)]
+        ])
+        rebuild_rollups(station)
+        self.range = {'start': '2026-01-01T10:00:00Z', 'end': '2026-01-01T13:00:00Z'}
+
+    def test_hourly_buckets_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'interval': '1h', 'metrics': 'temperature',
+                                                  **self.range})
+
+        buckets = response.data['buckets']
+        self.assertEqual([b['start'] for b in buckets], [
+            '2026-01-01T10:00:00+00:00', '2026-01-01T11:00:00+00:00', '2026-01-01T12:00:00+00:00',
+        ])
+        self.assertEqual(buckets[0]['count'], 3)
+        self.assertEqual(buckets[0]['temperature'], {'avg': 12.0, 'min': 10.0, 'max': 14.0})
+        self.assertEqual(buckets[1]['temperature'], {'avg': 20.0, 'min': 20.0, 'max': 20.0})
+        self.assertNotIn('humidity', buckets[0])
+
+    def test_readings_before_the_first_rollup_are_read_raw(self):
+        expected = self.client.get(self.url, {'interval': '1h', **self.range}).data['buckets']
+        HourlyRollup.objects.filter(bucket__lt=datetime(2026, 1, 1, 12, 0, tzinfo=dt_timezone.utc)).delete()
+
+        buckets = self.client.get(self.url, {'interval': '1h', **self.range}).data['buckets']
+        self.assertEqual(buckets, expected)
+
+        HourlyRollup.objects.all().delete()
+        buckets = self.client.get(self.url, {'interval': '1h', **self.range}).data['buckets']
+        self.assertEqual(buckets, expected)
+
+    def test_quarter_hour_buckets_default_to_every_metric(self):
+        response = self.client.get(self.url, {'interval': '15m', **self.range})
+
+        buckets = response.data['buckets']
+        self.assertEqual(len(buckets), 5)
+        self.assertEqual(response.data['metrics'], ['temperature', 'humidity', 'pressure'])
+        self.assertEqual(buckets[1]['pressure']['avg'], 870.0)
+
+    def test_boolean_metrics_average_to_a_share(self):
+        response = self.client.get(self.url, {'sensor': 'precipitation', 'interval': '1d',
+                                              **self.range})
+
+        bucket, = response.data['buckets']
+        self.assertEqual(bucket['is_raining'], {'avg': 0.25, 'min': 0.0, 'max': 1.0})
+
+    def test_lttb_downsampling_keeps_the_spike(self):
+        response = self.client.get(self.url, {'downsample': 'lttb', 'points': 3,
+                                              'metrics': 'temperature', **self.range})
+
+        points = response.data['series']['temperature']
+        self.assertEqual([p['value'] for p in points], [10.0, 20.0, 5.0])
+        self.assertEqual(points[0]['timestamp'], '2026-01-01T10:00:00+00:00')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'downsample': 'lttb', 'points': 2}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'downsample': 'mean'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'interval': '5m'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'metrics': 'lux'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'interval': '15m', 'start': '2020-01-01T00:00:00Z',
+                                                    'end': '2026-01-01T00:00:00Z'}).status_code, 400)
+
+    def test_unknown_station_is_404(self):
+        response = self.client.get('/api/v1/stations/nope/series/')
+        self.assertEqual(response.status_code, 404)
+
+
+class StationDataProjectionTests(TestCase):
+    url = '/api/v1/stations/test-station/data/'
+
+    def setUp(self):
+        self.client = APIClient()
+        post_cold_rain_snapshot(self.client)
+
+    def test_projection_loads_only_the_selected_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {
+                'fields': 'atmospheric.temperature,atmospheric.temperature_is_dangerous,precipitation'
+            })
+
+        self.assertEqual(response.data['sensors'], {
+            'atmospheric': {'temperature': 5.0, 'temperature_is_dangerous': True},
+            'precipitation': {
+                'is_raining': True, 'is_raining_is_dangerous': True,
+                'rain_detected_last_hour': True, 'rain_detected_last_hour_is_dangerous': False,
+            },
+        })
+        self.assertNotIn('location', response.data)
+        self.assertNotIn('power', response.data)
+        snapshot_read = ctx.captured_queries[-1]['sql']
+        self.assertNotIn('humidity', snapshot_read)
+        self.assertNotIn('stations', snapshot_read)
+
+    def test_location_and_power_parts(self):
+        response = self.client.get(self.url, {'fields': 'location,power.percentage'})
+
+        self.assertEqual(response.data['location']['altitude'], 0)
+        self.assertEqual(response.data['power'], {'percentage': 80})
+        self.assertNotIn('sensors', response.data)
+
+    def test_compact_mode(self):
+        response = self.client.get(self.url, {'fields': 'atmospheric,power', 'compact': '1'})
+
+        self.assertEqual(response.json(), {
+            'id': 'test-station',
+            'ts': response.json()['ts'],
+            'a': {'t': 5.0, 't!': True, 'h': 95.0, 'h!': True, 'p': 850.0, 'p!': True},
+            'pw': {'pct': 80, 'mv': 3900, 'chg': False},
+        })
+        full = self.client.get(self.url, {'compact': '1'}).json()
+        self.assertEqual(set(full), {'id', 'ts', 'loc', 'a', 'l', 's', 'aq', 'p', 'ta', 'pw'})
+
+    def test_each_projection_has_its_own_etag(self):
+        full = self.client.get(self.url)
+        projected = self.client.get(self.url, {'fields': 'soil'}, HTTP_IF_NONE_MATCH=full['ETag'])
+
+        self.assertEqual(projected.status_code, 200)
+        self.assertNotEqual(projected['ETag'], full['ETag'])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(self.url, {'fields': 'atmospheric.wind,weather'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('atmospheric.wind, weather', response.data['message'])
+
+
+class StationChangesTests(TestCase):
+    url = '/api/v1/stations/test-station/changes/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.post([make_snapshot(900, temp=1.0), make_snapshot(0, temp=2.0, power={
+            'percentage': 80, 'voltage_mv': 3900, 'is_charging': False})])
+
+    def post(self, snapshots):
+        self.client.post('/api/v1/sensors/data/batch/', {
+            'station_id': 'test-station',
+            'snapshots': snapshots,
+        }, format='json')
+
+    def test_full_then_delta_sync(self):
+        full = self.client.get(self.url).data
+
+        self.assertFalse(full['has_more'])
+        first, second = full['snapshots']
+        self.assertEqual(first['sensors']['atmospheric']['temperature'], 1.0)
+        self.assertNotIn('power', first)
+        self.assertEqual(second['sensors']['soil'], {'temperature': None, 'moisture_percent': 45.5})
+        self.assertEqual(second['power']['voltage_mv'], 3900)
+
+        self.post([make_snapshot(0, temp=3.0)])
+        with self.assertNumQueries(len(READING_MODELS)):
+            delta = self.client.get(self.url, {'since': full['cursor']}).data
+
+        snapshot, = delta['snapshots']
+        self.assertEqual(snapshot['sensors']['atmospheric']['temperature'], 3.0)
+        self.assertEqual(self.client.get(self.url, {'since': delta['cursor']}).data['snapshots'], [])
+
+    def test_limit_pages_through_changes(self):
+        self.post([make_snapshot(0, temp=3.0)])
+
+        page = self.client.get(self.url, {'limit': 1}).data
+
+        # The first batch comes whole, the second waits for the next page
+        self.assertTrue(page['has_more'])
+        self.assertEqual([s['sensors']['atmospheric']['temperature'] for s in page['snapshots']], [1.0, 2.0])
+        rest = self.client.get(self.url, {'limit': 1, 'since': page['cursor']}).data
+        snapshot, = rest['snapshots']
+        self.assertEqual(snapshot['sensors']['atmospheric']['temperature'], 3.0)
+        self.assertFalse(rest['has_more'])
+
+    def test_overwritten_readings_are_sent_again(self):
+        cursor = self.client.get(self.url).data['cursor']
+        payload = {
+            'station_id': 'test-station',
+            'timestamp': '2026-01-01T12:00:00Z',
+            'sensors': {'atmospheric': {'temperature': 4.0}},
+        }
+        self.client.post('/api/v1/sensors/data/', payload, format='json')
+        cursor = self.client.get(self.url, {'since': cursor}).data['cursor']
+
+        payload['sensors']['atmospheric']['temperature'] = 6.0
+        self.client.post('/api/v1/sensors/data/', payload, format='json')
+        delta = self.client.get(self.url, {'since': cursor}).data
+
+        snapshot, = delta['snapshots']
+        self.assertEqual(snapshot['sensors']['atmospheric']['temperature'], 6.0)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'since': '1.2'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': 'abc'}).status_code, 400)
+
+    def test_unknown_station_is_404(self):
+        self.assertEqual(self.client.get('/api/v1/stations/nope/changes/').status_code, 404)
+
+
+class StationBacktestTests(TestCase):
+    url = '/api/v1/stations/test-station/backtest/'
+
+    def setUp(self):
+        self.client = APIClient()
+        post_cold_rain_snapshot(self.client)
+        self.client.force_login(User.objects.create_user('tuner', is_staff=True))
+
+    def test_replay_report(self):
+        response = self.client.get(self.url, {'set': 'TEMP_HYPOTHERMIA_WET=4'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['snapshots'], 1)
+        self.assertEqual(response.data['baseline']['pushes'], {'hypothermia_wet': 1})
+        self.assertEqual(response.data['candidate']['thresholds'], {'TEMP_HYPOTHERMIA_WET': 4.0})
+        self.assertEqual(response.data['diff']['alerts']['hypothermia_wet'], -1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'set': 'BOGUS=1'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'baseline': 'LUX_DARK=x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/stations/nope/backtest/').status_code, 404)
+
+    def test_backtest_is_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class StationsLatestTests(TestCase):
+    url = '/api/v1/stations/latest/'
+
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(5):
+            self.client.post('/api/v1/sensors/data/', {
+                'station_id': f'station-{i}',
+                'timestamp': '2026-01-01T12:00:00Z',
+                'location': {'latitude': 45.0 + i, 'longitude': 8.0 + i, 'altitude': 1000},
+                'sensors': {'atmospheric': {'temperature': 10.0 + i}},
+            }, format='json')
+        Station.objects.create(station_id='silent', name='Silent', latitude=45.5,
+                               longitude=8.5, altitude=900)
+        Station.objects.filter(station_id='station-4').update(is_active=False)
+
+    def test_fleet_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        stations = {s['station_id']: s for s in response.data['stations']}
+        self.assertEqual(response.data['count'], 5)
+        self.assertNotIn('station-4', stations)
+        self.assertEqual(stations['station-2']['sensors']['atmospheric']['temperature'], 12.0)
+        self.assertIsNone(stations['silent']['sensors'])
+
+    def test_bbox_filter(self):
+        response = self.client.get(self.url, {'bbox': '8.5,45.5,10.5,47.5'})
+
+        ids = sorted(s['station_id'] for s in response.data['stations'])
+        self.assertEqual(ids, ['silent', 'station-1', 'station-2'])
+
+    def test_invalid_bbox(self):
+        response = self.client.get(self.url, {'bbox': '1,2,3'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    url = '/api/v1/export/atmospheric/'
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('researcher', is_staff=True))
+        make_station()
+        make_station('other-station')
+        for station_id, temperature in [('test-station', 12.5), ('other-station', -3.0)]:
+            AtmosphericReading.objects.create(
+                station_id=station_id, temperature=temperature, humidity=65, pressure=None,
+                timestamp=datetime(2026, 1, 1, 12, 0, tzinfo=dt_timezone.utc),
+            )
+
+    def test_csv_is_streamed_with_header(self):
+        response = self.client.get(self.url, {'station': 'test-station'})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [
+            'station_id,timestamp,temperature,humidity,pressure',
+            'test-station,2026-01-01T12:00:00+00:00,12.50,65.00,',
+        ])
+
+    def test_ndjson(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['station_id'] for row in rows], ['other-station', 'test-station'])
+        self.assertEqual(rows[1]['temperature'], 12.5)
+        self.assertIsNone(rows[1]['pressure'])
+
+    def test_export_is_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/v1/export/bogus/').status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'yesterday'}).status_code, 400)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('export_readings', 'atmospheric', '--format', 'ndjson',
+                     '--start', '2026-01-01T00:00:00Z', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+        for start in ('yesterday', '2026-13-01T00:00:00Z'):
+            with self.assertRaises(CommandError):
+                call_command('export_readings', 'atmospheric', '--start', start, stdout=StringIO())
+
+
+@skipIf(parquet_export.pa is None, 'pyarrow is not installed')
+class ParquetExportTests(TestCase):
+
+    def setUp(self):
+        self.station = make_station()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        for month, temperature in [(1, 1.5), (1, 2.5), (2, -4.0)]:
+            self.add_reading(month, temperature)
+
+    def add_reading(self, month, temperature):
+        count = AtmosphericReading.objects.count()
+        AtmosphericReading.objects.create(
+            station=self.station, temperature=temperature, humidity=None, pressure=870,
+            timestamp=datetime(2026, month, 1, count, 0, tzinfo=dt_timezone.utc),
+        )
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export_parquet', self.root, '--sensor', 'atmospheric', stdout=out, **options)
+        return out.getvalue()
+
+    def read(self, month):
+        return parquet_export.pq.read_table(os.path.join(
+            self.root, 'atmospheric_readings', 'station_id=test-station', f'month={month}',
+            'part-0.parquet'))
+
+    def test_partitions_by_station_and_month(self):
+        self.assertIn('2 partitions written', self.export())
+
+        january = self.read('2026-01')
+        self.assertEqual(january.column('temperature').to_pylist(), [1.5, 2.5])
+        self.assertEqual(january.column('humidity').to_pylist(), [None, None])
+        self.assertEqual(str(january.schema.field('timestamp').type), 'timestamp[us, tz=UTC]')
+        self.assertEqual(self.read('2026-02').num_rows, 1)
+
+    def test_incremental_only_rewrites_changed_months(self):
+        self.export()
+        self.add_reading(2, 8.0)
+
+        self.assertIn('1 partitions written', self.export(incremental=True))
+        self.assertEqual(self.read('2026-02').num_rows, 2)
+        self.assertIn('0 partitions written', self.export(incremental=True))
+
+
+class LiveStreamTests(TestCase):
+
+    def fake_database(self, **state):
+        """Patch the poller's database read to serve state['change_seq'] and state['document']."""
+        def changed_documents(seen):
+            return {station_id: (state['change_seq'], state['document'])
+                    for station_id, change_seq in seen.items() if change_seq != state['change_seq']}
+
+        patcher = mock.patch('api.stream._changed_documents', side_effect=changed_documents)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return state
+
+    def test_database_changes_wake_every_subscriber(self):
+        state = self.fake_database(change_seq=1, document={'v': 1})
+        updates = StationUpdates(poll_interval=0.01)
+
+        async def scenario():
+            first = updates.subscribe('s1', heartbeat=0.2)
+            second = updates.subscribe('s1', heartbeat=0.2)
+            received = [await asyncio.gather(first.__anext__(), second.__anext__())]
+            self.assertEqual(updates.subscriber_count('s1'), 2)
+
+            # Stored by another process, nothing published here
+            state.update(change_seq=2, document={'v': 2})
+            received.append(await asyncio.gather(first.__anext__(), second.__anext__()))
+            # A late batch moves change_seq but not the document: heartbeat only
+            state.update(change_seq=3)
+            received.append(await first.__anext__())
+
+            await first.aclose()
+            await second.aclose()
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), [['{"v": 1}', '{"v": 1}'], ['{"v": 2}', '{"v": 2}'], None])
+        self.assertEqual(updates.subscriber_count(), 0)
+
+    def test_publish_polls_without_waiting_for_the_interval(self):
+        state = self.fake_database(change_seq=1, document={'v': 1})
+        updates = StationUpdates(poll_interval=60)
+
+        async def scenario():
+            updates.bind(asyncio.get_running_loop())
+            subscription = updates.subscribe('s1')
+            await subscription.__anext__()
+
+            state.update(change_seq=2, document={'v': 2})
+            # From an ingest thread, after commit
+            thread = threading.Thread(target=updates.publish, args=('s1',))
+            thread.start()
+            thread.join()
+            message = await asyncio.wait_for(subscription.__anext__(), 5)
+            await subscription.aclose()
+            return message
+
+        self.assertEqual(asyncio.run(scenario()), '{"v": 2}')
+
+    def test_poller_reads_change_seq_and_document(self):
+        station = make_station()
+        APIClient().post('/api/v1/sensors/data/batch/', {
+            'station_id': station.station_id, 'snapshots': [make_snapshot(0, temp=7.0)],
+        }, format='json')
+        change_seq = Station.objects.get(pk=station.pk).change_seq
+
+        changed = _changed_documents({station.station_id: None, 'unknown': None})
+
+        self.assertEqual(list(changed), [station.station_id])
+        self.assertEqual(changed[station.station_id][0], change_seq)
+        self.assertEqual(changed[station.station_id][1]['sensors']['atmospheric']['temperature'], 7.0)
+        with self.assertNumQueries(1):
+            self.assertEqual(_changed_documents({station.station_id: change_seq}), {})
+
+    def test_idle_subscription_yields_heartbeats(self):
+        updates = StationUpdates()
+
+        async def scenario():
+            subscription = updates.subscribe('s1', heartbeat=0.01)
+            message = await subscription.__anext__()
+            await subscription.aclose()
+            return message
+
+        self.assertIsNone(asyncio.run(scenario()))
+
+    @mock.patch('api.stream._current_document', return_value={'station_id': 's1', 'v': 0})
+    def test_stream_endpoint_sends_current_then_pushed_documents(self, _):
+        state = self.fake_database(change_seq=1, document={'station_id': 's1', 'v': 0})
+        django_app = mock.AsyncMock()
+        app = route_streams(django_app)
+        sent = []
+
+        async def scenario():
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if len(sent) == 2:
+                    state.update(change_seq=2, document={'station_id': 's1', 'v': 1})
+                    station_updates.publish('s1')
+                elif len(sent) == 3:
+                    disconnected.set()
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/api/v1/stations/s1/stream/'}
+            await asyncio.wait_for(app(scope, receive, send), 5)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        self.assertIn(b'data: {"station_id": "s1", "v": 0}\n\n', sent[1]['body'])
+        self.assertEqual(sent[2]['body'], b'event: station\ndata: {"station_id": "s1", "v": 1}\n\n')
+        django_app.assert_not_called()
+        self.assertEqual(station_updates.subscriber_count(), 0)
+
+    def test_other_requests_go_to_django(self):
+        django_app = mock.AsyncMock()
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/v1/stations/s1/data/'}
+
+        asyncio.run(route_streams(django_app)(scope, None, None))
+
+        django_app.assert_awaited_once_with(scope, None, None)
+
+    @mock.patch('api.ingest.station_updates')
+    def test_ingest_publishes_after_commit_only_when_newer(self, updates):
+        def post(age_seconds, temp):
+            with self.captureOnCommitCallbacks(execute=True):
+                APIClient().post('/api/v1/sensors/data/batch/', {
+                    'station_id': 'test-station',
+                    'snapshots': [make_snapshot(age_seconds, temp=temp)],
+                }, format='json')
+
+        post(0, 7.0)
+        # A late snapshot older than the current one
+        post(3600, 3.0)
+
+        updates.publish.assert_called_once_with('test-station')
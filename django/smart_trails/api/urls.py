@@ -6,5 +6,12 @@ app_name = 'api'
 urlpatterns = [
     path('health/', views.health_check, name='health_check'),
     path('sensors/data/', views.receive_sensor_data, name='receive_sensor_data'),
+    path('sensors/data/batch/', views.receive_sensor_data_batch, name='receive_sensor_data_batch'),
+    path('export/<str:sensor>/', views.export_readings, name='export_readings'),
+    path('stations/latest/', views.get_stations_latest, name='get_stations_latest'),
     path('stations/<str:station_id>/data/', views.get_station_data, name='get_station_data'),
+    path('stations/<str:station_id>/history/', views.get_station_history, name='get_station_history'),
+    path('stations/<str:station_id>/series/', views.get_station_series, name='get_station_series'),
+    path('stations/<str:station_id>/changes/', views.get_station_changes, name='get_station_changes'),
+    path('stations/<str:station_id>/backtest/', views.get_station_backtest, name='get_station_backtest'),
 ]
\ No newline at end of file
@@ -2,26 +2,74 @@ from django.shortcuts import render
 
 # Create your views here.
 
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import models, transaction
+from rest_framework.utils.urls import replace_query_param
 from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseBadRequest, HttpResponseNotFound, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.utils import timezone
+from datetime import datetime, timedelta
+import hashlib
+from decimal import Decimal, InvalidOperation
 
 from stations.models import Station
-from sensors.models import (
-    AtmosphericReading,
-    LightReading,
-    SoilReading,
-    AirQualityReading,
-    PrecipitationReading,
-    TrailActivityReading,
-    PowerReading,
-)
 from notifications.alert_system import alert_analyzer
-from notifications.models import DeviceToken
-from notifications.apns_service import apns_service
+from notifications.backtest import parse_thresholds, replay
+from sensors.models import READING_MODELS, StationLatest, reading_fields
+from sensors.downsample import lttb_series
+from sensors.rollups import ROLLUP_MODELS, rollup_series
+from sensors.series import INTERVALS, bucket_series, numeric_fields
+from .ingest import (
+    get_or_create_station,
+    process_alerts,
+    store_batch,
+    store_snapshot,
+    validate_snapshot,
+)
+from .export import EXPORT_FORMATS, stream_export
+from .payloads import (
+    compact_payload, parse_fields, required_columns, station_location, station_payload,
+)
+from .serializers import READING_SERIALIZERS
+from .spool import ingest_spool
+
+
+# Upper bound on snapshots per batch POST, about five days of 15-minute posts
+MAX_BATCH_SNAPSHOTS = 500
+
+# Oldest snapshot a batch may carry: a full buffer of 15-minute posts
+MAX_BATCH_AGE = MAX_BATCH_SNAPSHOTS * timedelta(minutes=15)
+
+# A batch whose newest snapshot is older than this only backfills history,
+# its conditions are no longer current enough for alerts
+BATCH_ALERT_MAX_AGE = timedelta(minutes=30)
+
+# Page size bounds of the history endpoint
+HISTORY_DEFAULT_LIMIT = 100
+HISTORY_MAX_LIMIT = 1000
+
+# Rows read per reading table by one delta sync page
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+
+# Range served by the series endpoint when no start is given
+SERIES_DEFAULT_SPAN = {
+    '15m': timedelta(days=1),
+    '1h': timedelta(days=7),
+    '1d': timedelta(days=90),
+}
+SERIES_MAX_BUCKETS = 5000
+
+# Bounds of downsample=lttb, which reads raw readings
+LTTB_DEFAULT_POINTS = 500
+LTTB_MAX_POINTS = 5000
+LTTB_MAX_SPAN = timedelta(days=366)
 
 
 @api_view(['POST'])
@@ -30,6 +78,9 @@ def receive_sensor_data(request):
     POST /api/v1/sensors/data
     
     Arduino posts complete sensor snapshot here.
+
+    With settings.INGEST_MODE = 'spool' the payload is only validated and
+    queued, the response is 202 and `drain_spool` stores it later.
     
     Expected JSON format:
     {
@@ -83,137 +134,31 @@ def receive_sensor_data(request):
                 'message': 'timestamp is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        station, created = Station.objects.get_or_create(
-            station_id=data['station_id'],
-            defaults={
-                'name': data.get('name', data['station_id']),
-                'latitude': data.get('location', {}).get('latitude', 0),
-                'longitude': data.get('location', {}).get('longitude', 0),
-                'altitude': data.get('location', {}).get('altitude', 0),
-                'trail_name': data.get('location', {}).get('trail_name', ''),
-            }
-        )
-        
         # Use server time instead of Arduino's timestamp (Arduino doesn't have RTC)
         timestamp = timezone.now()
+
+        # Values that do not fit their column are refused before any write
+        validate_snapshot(data)
+
+        if settings.INGEST_MODE == 'spool':
+            # Queue for the drain_spool worker and free the modem right away
+            ingest_spool.append(data, timestamp)
+            return Response({
+                'status': 'accepted',
+                'station_id': data['station_id'],
+                'timestamp': timestamp.isoformat(),
+                'message': 'Data queued for processing',
+            }, status=status.HTTP_202_ACCEPTED)
+
+        station = get_or_create_station(data)
         
         sensors = data.get('sensors', {})
         
         # Create all sensor readings in a transaction
         # If any INSERT fails, all are rolled back
-        with transaction.atomic():
-            if 'atmospheric' in sensors:
-                atm = sensors['atmospheric']
-                AtmosphericReading.objects.update_or_create(
-                    station=station,
-                    timestamp=timestamp,
-                    defaults={
-                        'temperature': atm.get('temperature'),
-                        'humidity': atm.get('humidity'),
-                        'pressure': atm.get('pressure')
-                    }
-                )
-            
-            if 'light' in sensors:
-                light = sensors['light']
-                LightReading.objects.update_or_create(
-                    station=station,
-                    timestamp=timestamp,
-                    defaults={
-                        'uv_index': light.get('uv_index'),
-                        'lux': light.get('lux')
-                    }
-                )
-            
-            if 'soil' in sensors:
-                soil = sensors['soil']
-                SoilReading.objects.update_or_create(
-                    station=station,
-                    timestamp=timestamp,
-                    defaults={
-                        'temperature': soil.get('temperature'),
-                        'moisture_percent': soil.get('moisture_percent'),
-                    }
-                )
-            
-            if 'air_quality' in sensors:
-                air = sensors['air_quality']
-                AirQualityReading.objects.update_or_create(
-                    station=station,
-                    timestamp=timestamp,
-                    defaults={
-                        'co2_ppm': air.get('co2_ppm'),
-                        'tvoc_ppb': air.get('tvoc_ppb'),
-                        'aqi': air.get('aqi'),
-                    }
-                )
-            
-            if 'precipitation' in sensors:
-                precip = sensors['precipitation']
-                PrecipitationReading.objects.update_or_create(
-                    station=station,
-                    timestamp=timestamp,
-                    defaults={
-                        'is_raining': precip.get('is_raining'),
-                        'rain_detected_last_hour': precip.get('rain_detected_last_hour')
-                    }
-                )
-            
-            if 'trail_activity' in sensors:
-                activity = sensors['trail_activity']
-                TrailActivityReading.objects.update_or_create(
-                    station=station,
-                    timestamp=timestamp,
-                    defaults={
-                        'motion_count': activity.get('motion_count'),
-                        'period_minutes': activity.get('period_minutes')
-                    }
-                )
+        store_snapshot(station, timestamp, data)
 
-            power = data.get('power', {})
-            if power and any(v is not None for v in power.values()):
-                PowerReading.objects.update_or_create(
-                    station=station,
-                    timestamp=timestamp,
-                    defaults={
-                        'percentage': power.get('percentage'),
-                        'voltage_mv': power.get('voltage_mv'),
-                        'is_charging': power.get('is_charging'),
-                    }
-                )
-        
-        # Run AlertAnalyzer and send push notifications for danger/warning alerts
-        alerts = alert_analyzer.analyze(
-            data=sensors,
-            station_name=station.trail_name or station.name,
-            station_id=station.station_id,
-            timestamp=timestamp,
-        )
-
-        notifications_sent = 0
-        actionable_alerts = [a for a in alerts if a.severity in ('danger', 'warning')]
-
-        if actionable_alerts:
-            # Send the highest-severity alert as a push notification
-            top_alert = alert_analyzer.get_highest_severity_alert(actionable_alerts)
-            devices = DeviceToken.objects.filter(is_active=True).filter(
-                models.Q(station=station) | models.Q(station__isnull=True)
-            )
-
-            for device in devices:
-                success = apns_service.send_sync(
-                    device_token=device.token,
-                    bundle_id=device.bundle_id,
-                    title=top_alert.title,
-                    body=top_alert.body,
-                    data={
-                        'station_id': station.station_id,
-                        'category': top_alert.category,
-                    },
-                    category=top_alert.category,
-                )
-                if success:
-                    notifications_sent += 1
+        actionable_alerts, notification_queued = process_alerts(station, sensors, timestamp)
 
         return Response({
             'status': 'success',
@@ -221,7 +166,135 @@ def receive_sensor_data(request):
             'timestamp': timestamp.isoformat(),
             'message': 'Data received and stored successfully',
             'alerts_triggered': len(actionable_alerts),
-            'notifications_sent': notifications_sent,
+            'notification_queued': notification_queued,
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+def receive_sensor_data_batch(request):
+    """
+    POST /api/v1/sensors/data/batch
+
+    Stations that lost connectivity replay their buffered snapshots here in
+    one request. The Arduino has no RTC, so every snapshot carries
+    `age_seconds`: how long before this POST it was taken.
+
+    Expected JSON format:
+    {
+        "station_id": "mombarone-san-carlo",
+        "location": {...},
+        "snapshots": [
+            {"age_seconds": 1800, "sensors": {...}, "power": {...}},
+            {"age_seconds": 900, "sensors": {...}},
+            {"age_seconds": 0, "sensors": {...}}
+        ]
+    }
+
+    Each table is written with one bulk INSERT inside a single transaction.
+    The response has one result per snapshot, in request order. Invalid
+    snapshots (bad or duplicate age_seconds, older than MAX_BATCH_AGE,
+    malformed sections or values) are reported and skipped, the rest are
+    stored. Alerts run on the newest snapshot only when it is recent and
+    newer than the station's latest stored one.
+    """
+    data = request.data
+
+    try:
+        if 'station_id' not in data:
+            return Response({
+                'status': 'error',
+                'message': 'station_id is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        snapshots = data.get('snapshots')
+        if not isinstance(snapshots, list) or not snapshots:
+            return Response({
+                'status': 'error',
+                'message': 'snapshots must be a non-empty list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(snapshots) > MAX_BATCH_SNAPSHOTS:
+            return Response({
+                'status': 'error',
+                'message': f'At most {MAX_BATCH_SNAPSHOTS} snapshots per batch'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        results = []
+        accepted = []
+        seen_ages = set()
+
+        for index, snapshot in enumerate(snapshots):
+            age = snapshot.get('age_seconds') if isinstance(snapshot, dict) else None
+            if isinstance(age, bool) or not isinstance(age, (int, float)) or age < 0:
+                results.append({
+                    'index': index,
+                    'status': 'error',
+                    'message': 'age_seconds must be a non-negative number',
+                })
+                continue
+            if age > MAX_BATCH_AGE.total_seconds():
+                results.append({
+                    'index': index,
+                    'status': 'error',
+                    'message': f'age_seconds must be at most {int(MAX_BATCH_AGE.total_seconds())}',
+                })
+                continue
+            if age in seen_ages:
+                results.append({
+                    'index': index,
+                    'status': 'error',
+                    'message': 'duplicate age_seconds in batch',
+                })
+                continue
+
+            try:
+                validate_snapshot(snapshot)
+            except (ValueError, TypeError, ValidationError, InvalidOperation, OverflowError) as e:
+                results.append({
+                    'index': index,
+                    'status': 'rejected',
+                    'message': str(e),
+                })
+                continue
+
+            seen_ages.add(age)
+            timestamp = now - timedelta(seconds=age)
+            accepted.append((timestamp, snapshot))
+            results.append({
+                'index': index,
+                'status': 'stored',
+                'timestamp': timestamp.isoformat(),
+            })
+
+        station = get_or_create_station(data)
+        advanced = store_batch(station, accepted)
+
+        # Only the newest snapshot can still describe current trail conditions,
+        # and only if no newer one was stored already (an old buffer flushed
+        # after live posts)
+        actionable_alerts, notification_queued = [], False
+        if advanced is not None:
+            timestamp, latest = max(accepted, key=lambda item: item[0])
+            if now - timestamp <= BATCH_ALERT_MAX_AGE:
+                actionable_alerts, notification_queued = process_alerts(
+                    station, latest.get('sensors', {}), timestamp
+                )
+
+        return Response({
+            'status': 'success',
+            'station_id': station.station_id,
+            'stored': len(accepted),
+            'rejected': len(snapshots) - len(accepted),
+            'results': results,
+            'alerts_triggered': len(actionable_alerts),
+            'notification_queued': notification_queued,
         }, status=status.HTTP_201_CREATED)
 
     except Exception as e:
@@ -233,135 +306,520 @@ def receive_sensor_data(request):
 
 @api_view(['GET'])
 def health_check(request):
-    return Response({
+    response = {
         'status': 'healthy',
         'message': 'SmartTrails API is running'
-    })
+    }
+    if settings.INGEST_MODE == 'spool':
+        response['ingest_spool'] = ingest_spool.depth()
+    pressure_history = alert_analyzer.pressure_history.stats()
+    if pressure_history is not None:
+        response['pressure_history'] = pressure_history
+    return Response(response)
+
+
+def _station_data_versions(request, station_id):
+    """
+    (snapshot updated_at, station updated_at) of a station, or None before
+    its first snapshot. Cached on the request, so the ETag and Last-Modified
+    checks share one query.
+    """
+    if not hasattr(request, '_station_data_versions'):
+        request._station_data_versions = StationLatest.objects.filter(
+            station_id=station_id
+        ).values_list('updated_at', 'station__updated_at').first()
+    return request._station_data_versions
+
+
+def _station_data_etag(request, station_id):
+    versions = _station_data_versions(request, station_id)
+    if versions is None:
+        return None
+    # Each projection is its own representation
+    representation = f"{request.GET.get('fields', '')}:{request.GET.get('compact', '')}"
+    return hashlib.md5(
+        f'{station_id}:{versions[0].isoformat()}:{versions[1].isoformat()}:{representation}'.encode()
+    ).hexdigest()
+
 
+def _station_data_last_modified(request, station_id):
+    versions = _station_data_versions(request, station_id)
+    return max(versions) if versions else None
 
+
+@cache_control(no_cache=True)
+@condition(etag_func=_station_data_etag, last_modified_func=_station_data_last_modified)
 @api_view(['GET'])
 def get_station_data(request, station_id):
     """
-    GET /api/v1/stations/<station_id>/data
+    GET /api/v1/stations/<station_id>/data?fields=<paths>&compact=1
 
     Returns latest sensor readings with danger flags from AlertAnalyzer.
+
+    Served from the station's StationLatest row, which ingest keeps up to
+    date together with its danger flags, so this is a single query.
+
+    fields projects the document, e.g. atmospheric.temperature,precipitation,
+    power or location: only those parts are built and only their columns
+    loaded (the station row only for location). compact=1 returns short
+    keys with the sensor sections flattened, for the watch.
+
+    The response carries a strong ETag and Last-Modified tied to the last
+    ingest (and station metadata edits). Polls with a matching
+    If-None-Match get a 304 after one small query, without building the body.
     """
+    projection = None
+    if request.query_params.get('fields'):
+        try:
+            projection = parse_fields(request.query_params['fields'])
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+    with_location = projection is None or 'location' in projection
+
+    latests = StationLatest.objects.all()
+    if with_location:
+        latests = latests.select_related('station')
+    columns = required_columns(projection)
+    if columns is not None:
+        latests = latests.only(*columns, *(['station'] if with_location else []))
+
     try:
-        station = Station.objects.get(station_id=station_id)
-    except Station.DoesNotExist:
+        latest = latests.get(station_id=station_id)
+    except StationLatest.DoesNotExist:
+        # Stations that never sent data: every value is null, nothing is written
+        try:
+            station = Station.objects.get(station_id=station_id)
+        except Station.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': f'Station {station_id} not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        latest = StationLatest(station=station)
+
+    document = station_payload(latest.station if with_location else None, latest, projection)
+    if request.query_params.get('compact') in ('1', 'true'):
+        document = compact_payload(document)
+    return Response(document)
+
+
+@api_view(['GET'])
+def get_stations_latest(request):
+    """
+    GET /api/v1/stations/latest?bbox=<min_lon>,<min_lat>,<max_lon>,<max_lat>
+
+    Latest readings and danger flags of every active station, for the map
+    view. One query whatever the number of stations: each station is joined
+    with its StationLatest row. Stations that never sent data are listed
+    with null sensors and power.
+
+    The optional bbox keeps only stations inside the bounding box.
+    """
+    stations = Station.objects.filter(is_active=True).select_related('latest')
+
+    bbox = request.query_params.get('bbox')
+    if bbox:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(','))
+        except ValueError:
+            return Response({
+                'status': 'error',
+                'message': 'bbox must be min_lon,min_lat,max_lon,max_lat'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        stations = stations.filter(
+            longitude__gte=min_lon, longitude__lte=max_lon,
+            latitude__gte=min_lat, latitude__lte=max_lat,
+        )
+
+    results = []
+    for station in stations:
+        try:
+            results.append(station_payload(station, station.latest))
+        except StationLatest.DoesNotExist:
+            results.append({
+                'station_id': station.station_id,
+                'timestamp': None,
+                'location': station_location(station),
+                'sensors': None,
+                'power': None,
+            })
+
+    return Response({
+        'count': len(results),
+        'stations': results,
+    })
+
+
+@api_view(['GET'])
+def get_station_history(request, station_id):
+    """
+    GET /api/v1/stations/<station_id>/history/?sensor=atmospheric&before=<timestamp>&limit=<n>
+
+    Readings of one sensor table, newest first, paginated with a keyset
+    cursor instead of OFFSET: each page is a range scan of the
+    (station, -timestamp) index starting right below `before`, so deep
+    pages cost the same as the first one and rows stored meanwhile do not
+    shift the pages. `next` is the URL of the following page, or null.
+    """
+    sensor = request.query_params.get('sensor', 'atmospheric')
+    if sensor not in READING_MODELS:
+        return Response({
+            'status': 'error',
+            'message': f"sensor must be one of: {', '.join(READING_MODELS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(request.query_params.get('limit', HISTORY_DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= HISTORY_MAX_LIMIT:
+        return Response({
+            'status': 'error',
+            'message': f'limit must be between 1 and {HISTORY_MAX_LIMIT}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    readings = READING_MODELS[sensor].objects.filter(station_id=station_id)
+
+    before = request.query_params.get('before')
+    if before:
+        before = _parse_timestamp(before)
+        if before is None:
+            return Response({
+                'status': 'error',
+                'message': 'before must be an ISO 8601 timestamp'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        readings = readings.filter(timestamp__lt=before)
+
+    # (station, timestamp) is unique, so the timestamp alone is the cursor.
+    # One extra row tells whether another page exists.
+    rows = list(readings.order_by('-timestamp')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if not rows and not Station.objects.filter(station_id=station_id).exists():
         return Response({
             'status': 'error',
             'message': f'Station {station_id} not found'
         }, status=status.HTTP_404_NOT_FOUND)
 
-    atmospheric = station.atmospheric_readings.first()
-    light = station.light_readings.first()
-    soil = station.soil_readings.first()
-    air_quality = station.air_quality_readings.first()
-    precipitation = station.precipitation_readings.first()
-    trail_activity = station.trail_activity_readings.first()
-    power = station.power_readings.first()
-
-    # Extract raw values
-    temp = float(atmospheric.temperature) if atmospheric and atmospheric.temperature else None
-    humidity = float(atmospheric.humidity) if atmospheric and atmospheric.humidity else None
-    pressure = float(atmospheric.pressure) if atmospheric and atmospheric.pressure else None
-    uv = float(light.uv_index) if light and light.uv_index else None
-    lux = float(light.lux) if light and light.lux else None
-    soil_temp = float(soil.temperature) if soil and soil.temperature else None
-    moisture = float(soil.moisture_percent) if soil and soil.moisture_percent else None
-    co2 = air_quality.co2_ppm if air_quality and air_quality.co2_ppm else None
-    tvoc = air_quality.tvoc_ppb if air_quality and air_quality.tvoc_ppb else None
-    aqi_val = air_quality.aqi if air_quality and air_quality.aqi else None
-    is_raining = precipitation.is_raining if precipitation else False
-    rain_recent = precipitation.rain_detected_last_hour if precipitation else False
-    motion = trail_activity.motion_count if trail_activity and trail_activity.motion_count else 0
-    period = trail_activity.period_minutes if trail_activity and trail_activity.period_minutes else 15
-
-    # Build sensor data dict for AlertAnalyzer
-    sensor_data = {
-        'atmospheric': {
-            'temperature': temp,
-            'humidity': humidity,
-            'pressure': pressure,
-        },
-        'light': {
-            'uv_index': uv,
-            'lux': lux,
-        },
-        'soil': {
-            'moisture_percent': moisture,
-        },
-        'air_quality': {
-            'co2_ppm': co2,
-        },
-        'precipitation': {
-            'is_raining': is_raining,
-            'rain_detected_last_hour': rain_recent,
-        },
-        'trail_activity': {
-            'motion_count': motion,
-        },
-    }
+    results = READING_SERIALIZERS[sensor](rows, many=True).data
 
-    # Get danger flags from AlertAnalyzer
-    flags = alert_analyzer.get_is_dangerous_flags(sensor_data)
-
-    response_data = {
-        'station_id': station.station_id,
-        'timestamp': timezone.now().isoformat(),
-        'location': {
-            'latitude': float(station.latitude),
-            'longitude': float(station.longitude),
-            'altitude': station.altitude,
-            'trail_name': station.trail_name or station.name
-        },
-        'sensors': {
-            'atmospheric': {
-                'temperature': temp if temp is not None else 0.0,
-                'temperature_is_dangerous': flags['temperature_is_dangerous'],
-                'humidity': humidity if humidity is not None else 0.0,
-                'humidity_is_dangerous': flags['humidity_is_dangerous'],
-                'pressure': pressure if pressure is not None else 0.0,
-                'pressure_is_dangerous': flags['pressure_is_dangerous'],
-            },
-            'light': {
-                'uv_index': uv if uv is not None else 0.0,
-                'uv_index_is_dangerous': flags['uv_index_is_dangerous'],
-                'lux': lux if lux is not None else 0,
-                'lux_is_dangerous': flags['lux_is_dangerous'],
-            },
-            'soil': {
-                'temperature': soil_temp if soil_temp is not None else 0.0,
-                'moisture_percent': moisture if moisture is not None else 0.0,
-                'moisture_percent_is_dangerous': flags['moisture_percent_is_dangerous'],
-            },
-            'air_quality': {
-                'co2_ppm': co2 if co2 is not None else 0,
-                'co2_ppm_is_dangerous': flags['co2_ppm_is_dangerous'],
-                'tvoc_ppb': tvoc if tvoc is not None else 0,
-                'aqi': aqi_val if aqi_val is not None else 0,
-            },
-            'precipitation': {
-                'is_raining': is_raining,
-                'is_raining_is_dangerous': flags['is_raining_is_dangerous'],
-                'rain_detected_last_hour': rain_recent,
-                'rain_detected_last_hour_is_dangerous': flags['rain_detected_last_hour_is_dangerous'],
-            },
-            'trail_activity': {
-                'motion_count': motion,
-                'motion_count_is_dangerous': flags['motion_count_is_dangerous'],
-                'period_minutes': period,
-            },
-        },
-        'power': {
-            'percentage': power.percentage if power else None,
-            'voltage_mv': power.voltage_mv if power else None,
-            'is_charging': power.is_charging if power else None,
+    next_url = None
+    if has_more:
+        next_url = replace_query_param(
+            request.build_absolute_uri(), 'before', results[-1]['timestamp']
+        )
+
+    return Response({
+        'station_id': station_id,
+        'sensor': sensor,
+        'count': len(results),
+        'next': next_url,
+        'results': results,
+    })
+
+
+@api_view(['GET'])
+def get_station_series(request, station_id):
+    """
+    GET /api/v1/stations/<station_id>/series/?sensor=atmospheric&interval=1h
+        &metrics=temperature,humidity&start=<timestamp>&end=<timestamp>
+
+    Readings aggregated into 15m, 1h or 1d buckets for charts: avg, min
+    and max of each metric plus the reading count, computed with a single
+    GROUP BY in the database. Hourly and daily series are read from the
+    rollup tables, so their cost does not grow with raw history; readings
+    older than the station's first rollup are aggregated raw. metrics
+    defaults to every numeric field of the sensor, end to now and start to
+    a span that fits the interval. Empty buckets are omitted.
+
+    With downsample=lttb&points=N the raw readings are reduced to at most
+    N points per metric with Largest-Triangle-Three-Buckets instead, which
+    keeps spikes and drops that averaging would hide. interval then only
+    picks the default range.
+    """
+    sensor = request.query_params.get('sensor', 'atmospheric')
+    if sensor not in READING_MODELS:
+        return Response({
+            'status': 'error',
+            'message': f"sensor must be one of: {', '.join(READING_MODELS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    model = READING_MODELS[sensor]
+
+    interval = request.query_params.get('interval', '1h')
+    if interval not in INTERVALS:
+        return Response({
+            'status': 'error',
+            'message': f"interval must be one of: {', '.join(INTERVALS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    seconds = INTERVALS[interval]
+
+    available = numeric_fields(model)
+    metrics = request.query_params.get('metrics')
+    metrics = metrics.split(',') if metrics else available
+    unknown = [name for name in metrics if name not in available]
+    if unknown:
+        return Response({
+            'status': 'error',
+            'message': f"Unknown {sensor} metrics: {', '.join(unknown)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    end = request.query_params.get('end')
+    end = _parse_timestamp(end) if end else timezone.now()
+    start = request.query_params.get('start')
+    if start:
+        start = _parse_timestamp(start)
+    elif end is not None:
+        start = end - SERIES_DEFAULT_SPAN[interval]
+    if start is None or end is None:
+        return Response({
+            'status': 'error',
+            'message': 'start and end must be ISO 8601 timestamps'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    downsample = request.query_params.get('downsample')
+    if downsample:
+        return _downsampled_series(request, station_id, sensor, metrics, start, end)
+
+    if not start < end or (end - start).total_seconds() / seconds > SERIES_MAX_BUCKETS:
+        return Response({
+            'status': 'error',
+            'message': f'start must be before end and span at most {SERIES_MAX_BUCKETS} intervals'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if interval in ROLLUP_MODELS:
+        buckets = rollup_series(station_id, sensor, metrics, interval, start, end)
+    else:
+        buckets = bucket_series(model, station_id, metrics, seconds, start, end)
+
+    if not buckets and not Station.objects.filter(station_id=station_id).exists():
+        return Response({
+            'status': 'error',
+            'message': f'Station {station_id} not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    for bucket in buckets:
+        bucket['start'] = bucket['start'].isoformat()
+
+    return Response({
+        'station_id': station_id,
+        'sensor': sensor,
+        'interval': interval,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'metrics': metrics,
+        'buckets': buckets,
+    })
+
+
+def _downsampled_series(request, station_id, sensor, metrics, start, end):
+    """LTTB variant of get_station_series."""
+    if request.query_params['downsample'] != 'lttb':
+        return Response({
+            'status': 'error',
+            'message': 'downsample must be lttb'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        points = int(request.query_params.get('points', LTTB_DEFAULT_POINTS))
+    except ValueError:
+        points = 0
+    if not 3 <= points <= LTTB_MAX_POINTS:
+        return Response({
+            'status': 'error',
+            'message': f'points must be between 3 and {LTTB_MAX_POINTS}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not start < end or end - start > LTTB_MAX_SPAN:
+        return Response({
+            'status': 'error',
+            'message': f'start must be before end and span at most {LTTB_MAX_SPAN.days} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    series = lttb_series(READING_MODELS[sensor], station_id, metrics, start, end, points)
+
+    if not any(series.values()) and not Station.objects.filter(station_id=station_id).exists():
+        return Response({
+            'status': 'error',
+            'message': f'Station {station_id} not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    utc = timezone.utc
+    return Response({
+        'station_id': station_id,
+        'sensor': sensor,
+        'downsample': 'lttb',
+        'points': points,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'metrics': metrics,
+        'series': {
+            name: [
+                {'timestamp': datetime.fromtimestamp(ts, tz=utc).isoformat(), 'value': value}
+                for ts, value in values
+            ]
+            for name, values in series.items()
         },
-    }
+    })
 
-    return Response(response_data)
+
+@api_view(['GET'])
+def get_station_changes(request, station_id):
+    """
+    GET /api/v1/stations/<station_id>/changes/?since=<cursor>&limit=<n>
+
+    Delta sync for clients keeping local history: readings of all reading
+    tables written after `since`, merged into snapshots by timestamp (same
+    shape as the ingest payload), and the cursor to pass next time. Omit
+    since for a full sync.
+
+    The cursor is the station's change sequence number (see
+    api.ingest.next_change_seq): every batch stored gets the next one, in
+    commit order, and writes it on each row it inserts or overwrites, so
+    overwritten values are sent again and rows of a batch committing late
+    are not skipped. Each table is a range scan of its
+    (station, change_seq, timestamp) index. At most `limit` rows per table
+    are returned, batches are never split (a larger one comes whole);
+    has_more tells the client to call again right away.
+    """
+    try:
+        since = _parse_changes_cursor(request.query_params.get('since', ''))
+    except ValueError:
+        return Response({
+            'status': 'error',
+            'message': 'since must be a cursor returned by this endpoint'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(request.query_params.get('limit', CHANGES_DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= CHANGES_MAX_LIMIT:
+        return Response({
+            'status': 'error',
+            'message': f'limit must be between 1 and {CHANGES_MAX_LIMIT}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Sequence number every table is complete through, when one has more rows
+    complete_through = None
+    fetched = []
+    for section, model in READING_MODELS.items():
+        fields = reading_fields(model)
+        readings = (
+            model.objects.filter(station_id=station_id)
+            .order_by('change_seq', 'timestamp')
+            .values_list('change_seq', 'timestamp', *fields)
+        )
+        rows = list(readings.filter(change_seq__gt=since)[:limit + 1])
+        if len(rows) > limit:
+            # First batch not complete in this page
+            cut = rows[limit][0]
+            if rows[0][0] == cut:
+                # A batch larger than limit, sent whole
+                rows = list(readings.filter(change_seq=cut))
+                cut += 1
+            complete_through = cut - 1 if complete_through is None else min(complete_through, cut - 1)
+        fetched.append((section, fields, rows))
+
+    snapshots = {}
+    cursor = since
+    for section, fields, rows in fetched:
+        for change_seq, timestamp, *values in rows:
+            if complete_through is not None and change_seq > complete_through:
+                break
+            snapshot = snapshots.setdefault(timestamp, {'sensors': {}})
+            values = {name: float(value) if isinstance(value, Decimal) else value
+                      for name, value in zip(fields, values)}
+            if section == 'power':
+                snapshot['power'] = values
+            else:
+                snapshot['sensors'][section] = values
+            cursor = max(cursor, change_seq)
+    if complete_through is not None:
+        cursor = complete_through
+
+    if not snapshots and not Station.objects.filter(station_id=station_id).exists():
+        return Response({
+            'status': 'error',
+            'message': f'Station {station_id} not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'station_id': station_id,
+        'cursor': _format_changes_cursor(cursor),
+        'has_more': complete_through is not None,
+        'snapshots': [
+            {'timestamp': timestamp.isoformat(), **snapshot}
+            for timestamp, snapshot in sorted(snapshots.items())
+        ],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_station_backtest(request, station_id):
+    """
+    GET /api/v1/stations/<station_id>/backtest/?start=<timestamp>&end=<timestamp>&set=NAME=VALUE&baseline=NAME=VALUE
+
+    Replay the station's stored readings in [start, end) through
+    AlertAnalyzer with the thresholds under test (`set`, repeatable or
+    comma separated, e.g. set=LUX_DARK=130) and against a baseline
+    (current constants, overridden by `baseline`). Returns alert and push
+    counts per type and per day for both, and their difference (see
+    notifications.backtest). Staff only.
+    """
+    if not Station.objects.filter(station_id=station_id).exists():
+        return Response({
+            'status': 'error',
+            'message': f'Station {station_id} not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    bounds = {}
+    for name in ('start', 'end'):
+        if request.query_params.get(name):
+            bounds[name] = _parse_timestamp(request.query_params[name])
+            if bounds[name] is None:
+                return Response({
+                    'status': 'error',
+                    'message': f'{name} must be an ISO 8601 timestamp'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        thresholds = parse_thresholds(request.query_params.getlist('set'))
+        baseline = parse_thresholds(request.query_params.getlist('baseline'))
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(replay(station_id, thresholds=thresholds, baseline=baseline, **bounds))
+
+
+def _parse_changes_cursor(cursor):
+    """'<change_seq>' -> last change sequence number seen; '' is the start (-1)."""
+    if not cursor:
+        return -1
+    if not cursor.isdigit():
+        raise ValueError(cursor)
+    return int(cursor)
+
+
+def _format_changes_cursor(change_seq):
+    return str(change_seq) if change_seq >= 0 else ''
+
+
+def _parse_timestamp(value):
+    """Parse an ISO 8601 query parameter, naive values are in the server time zone."""
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 
 def index(request):
@@ -373,3 +831,37 @@ from django.contrib.admin.views.decorators import staff_member_required
 @staff_member_required
 def sensor_dashboard(request):
     return render(request, 'admin/dashboard.html')
+
+
+@staff_member_required
+def export_readings(request, sensor):
+    """
+    GET /api/v1/export/<sensor>/?format=csv|ndjson&station=<id>&start=<timestamp>&end=<timestamp>
+
+    Full dump of a reading table for researchers, streamed as CSV or NDJSON
+    in constant memory (see api.export). station may be repeated; start
+    and end bound the timestamps. Staff only, like the admin it replaces.
+    """
+    if sensor not in READING_MODELS:
+        return HttpResponseNotFound(f"sensor must be one of: {', '.join(READING_MODELS)}")
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    bounds = {}
+    for name in ('start', 'end'):
+        if request.GET.get(name):
+            bounds[name] = _parse_timestamp(request.GET[name])
+            if bounds[name] is None:
+                return HttpResponseBadRequest(f'{name} must be an ISO 8601 timestamp')
+
+    model = READING_MODELS[sensor]
+    response = StreamingHttpResponse(
+        stream_export(model, export_format, station_ids=request.GET.getlist('station'), **bounds),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{model._meta.db_table}.{export_format}"'
+    )
+    return response
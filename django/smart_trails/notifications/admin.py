@@ -3,7 +3,7 @@ from django.shortcuts import render
 from django.http import HttpResponseRedirect
 from django.urls import path
 from django.utils.html import format_html
-from .models import DeviceToken
+from .models import AlertState, DeviceToken, NotificationOutbox
 from .apns_service import apns_service
 from .alert_system import Alert
 import random
@@ -205,28 +205,25 @@ class DeviceTokenAdmin(admin.ModelAdmin):
         
         alert = self._generate_random_alert()
         
-        sent_count = 0
-        failed_count = 0
-        
-        for device in active_devices:
-            success = apns_service.send_sync(
-                device_token=device.token,
-                bundle_id=device.bundle_id,
-                title=alert.title,
-                body=alert.body,
-                data={
+        results = apns_service.send_many(
+            {
+                'device_token': device.token,
+                'bundle_id': device.bundle_id,
+                'title': alert.title,
+                'body': alert.body,
+                'data': {
                     'severity': alert.severity,
                     'category': alert.category,
                     'test': True
                 },
-                image_url='https://smart-trails.com/static/st_background.jpg',
-                category='TRAIL_ALERT'
-            )
-            
-            if success:
-                sent_count += 1
-            else:
-                failed_count += 1
+                'image_url': 'https://smart-trails.com/static/st_background.jpg',
+                'category': 'TRAIL_ALERT'
+            }
+            for device in active_devices
+        )
+
+        sent_count = sum(1 for r in results if r.success)
+        failed_count = len(results) - sent_count
         
         self.message_user(
             request,
@@ -235,3 +232,17 @@ class DeviceTokenAdmin(admin.ModelAdmin):
         )
     
     send_alert_to_selected.short_description = 'Send random test alert to selected devices'
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['station', 'severity', 'title', 'status', 'sent_count', 'failed_count',
+                    'created_at', 'dispatched_at']
+    list_filter = ['status', 'severity', 'station']
+    readonly_fields = ['created_at', 'dispatched_at']
+
+
+@admin.register(AlertState)
+class AlertStateAdmin(admin.ModelAdmin):
+    list_display = ['station', 'hazard', 'state', 'severity', 'notified_at', 'changed_at']
+    list_filter = ['state', 'severity', 'station']
@@ -1,8 +1,15 @@
 
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, List, Dict, Tuple
 
+import numpy as np
+
+from .pressure_history import (
+    MemoryPressureHistory, PressureHistory, configured_pressure_history,
+    epoch_microseconds, pressure_slope, ring_put, window,
+)
+
 
 @dataclass
 class Alert:
@@ -11,6 +18,31 @@ class Alert:
     body: str
     emoji: str
     category: str 
+    alert_type: str = ''
+
+
+@dataclass
+class BatchAnalysis:
+    """
+    Result of AlertAnalyzer.analyze_batch over n rows.
+
+    severity: (n,) int8, highest AlertAnalyzer.SEVERITY_CODES value per row, 0 without hazards
+    hazards: (n, len(HAZARD_CHECKS)) int8, index into AlertAnalyzer.HAZARD_TYPES
+             found by each check, -1 where it found nothing
+    top_hazard: (n,) int8, code of the alert get_highest_severity_alert picks, -1 without hazards
+    pressure_rate: (n,) float64 hPa/hour as computed by the scalar path, NaN where it has none
+    pressure_history: Pressure ring after the last row, {slot: (microseconds, pressure)},
+                      pass it to the next analyze_batch call to continue the series
+    """
+    severity: np.ndarray
+    hazards: np.ndarray
+    top_hazard: np.ndarray
+    pressure_rate: np.ndarray
+    pressure_history: Optional[Dict[int, Tuple[int, float]]] = None
+
+    def hazard_types(self, row: int) -> List[str]:
+        """Hazard types of a row, in the order analyze() returns its alerts."""
+        return [AlertAnalyzer.HAZARD_TYPES[code] for code in self.hazards[row] if code >= 0]
     
 
 class AlertAnalyzer:
@@ -230,42 +262,23 @@ class AlertAnalyzer:
     SOIL_SATURATED = 80         # Trail likely flooded or very muddy
     SOIL_WET = 60               # Expect mud in low-lying areas
 
-    def __init__(self):
-        # Pressure history per station: {station_id: (pressure, timestamp)}
-        self._pressure_history: Dict[str, Tuple[float, datetime]] = {}
+    def __init__(self, pressure_history: PressureHistory = None):
+        # Recent pressure readings per station, see notifications.pressure_history.
+        # Defaults to a private in-memory one that is not seeded from the database.
+        self.pressure_history = pressure_history or MemoryPressureHistory(seed=False)
 
     def _get_pressure_rate(self, station_id: str, current_pressure: float,
                             current_time: datetime) -> Optional[float]:
         """
         Calculate pressure rate of change in hPa/hour.
 
-        Returns negative values for dropping pressure, positive for rising.
-        Returns None if no previous reading or reading too old (>2 hours).
+        Records the reading and returns the least-squares slope over the
+        station's readings of the last 2 hours: negative for dropping
+        pressure, positive for rising. Returns None until they span at
+        least 10 minutes.
         """
-        if station_id not in self._pressure_history:
-            self._pressure_history[station_id] = (current_pressure, current_time)
-            return None
-
-        prev_pressure, prev_time = self._pressure_history[station_id]
-        time_diff = current_time - prev_time
-
-        # Ignore readings older than 2 hours
-        if time_diff > timedelta(hours=2):
-            self._pressure_history[station_id] = (current_pressure, current_time)
-            return None
-
-        # Need at least 10 minutes between readings for meaningful rate
-        if time_diff < timedelta(minutes=10):
-            return None
-
-        # Calculate rate in hPa per hour
-        hours = time_diff.total_seconds() / 3600
-        rate = (current_pressure - prev_pressure) / hours
-
-        # Update history
-        self._pressure_history[station_id] = (current_pressure, current_time)
-
-        return rate
+        samples = self.pressure_history.record(station_id, current_pressure, current_time)
+        return pressure_slope(samples)
 
     def analyze(self, data: dict, station_name: str = "this trail",
                 station_id: str = None, timestamp: datetime = None) -> List[Alert]:
@@ -278,6 +291,14 @@ class AlertAnalyzer:
             station_id: Unique station ID for tracking pressure history
             timestamp: Reading timestamp for rate-of-change calculations
         """
+        hazards = self._detect_hazards(data, station_id, timestamp)
+        alerts = [self._build_alert(h, station_name) for h in hazards]
+        
+        return alerts
+
+    def _detect_hazards(self, data: dict, station_id: str = None,
+                        timestamp: datetime = None) -> List[dict]:
+        """Run every detection helper on a snapshot, in alert order."""
         sensors = self._extract_sensor_data(data)
 
         hazards = []
@@ -303,9 +324,7 @@ class AlertAnalyzer:
             sensors['rained_recently'], sensors['temp']
         ))
 
-        alerts = [self._build_alert(h, station_name) for h in hazards]
-        
-        return alerts
+        return hazards
     
     def _extract_sensor_data(self, data: dict) -> dict:
         atmo = data.get('atmospheric', {})
@@ -344,7 +363,8 @@ class AlertAnalyzer:
             title=template['title'],
             body=template['body'].format(**values),
             emoji=template['emoji'],
-            category=hazard['category']
+            category=hazard['category'],
+            alert_type=hazard['type'],
         )
     
     def _check_thermal_hazards(self, temp: Optional[float], humidity: Optional[float],
@@ -769,6 +789,202 @@ class AlertAnalyzer:
         severity_order = {'danger': 0, 'warning': 1, 'info': 2}
         return min(alerts, key=lambda a: severity_order.get(a.severity, 999))
 
+    # ==========================================================================
+    # BATCH MODE - The same detection over columnar NumPy arrays, for
+    # re-evaluating history. Every elif chain of a _check_* helper becomes one
+    # np.select over masks; NaN (missing) values fail every comparison.
+    # ==========================================================================
+    HAZARD_TYPES = list(ALERT_MESSAGES)
+    SEVERITY_CODES = {'info': 1, 'warning': 2, 'danger': 3}
+
+    # Columns of BatchAnalysis.hazards, in the order analyze() runs the checks
+    HAZARD_CHECKS = ('thermal', 'pressure', 'pressure_rate', 'rain', 'uv', 'visibility',
+                     'air_quality', 'traffic', 'soil', 'slippery')
+
+    # Severity of each hazard type, as its _check_* helper reports it
+    HAZARD_SEVERITIES = {
+        'severe_cold': 'danger', 'freezing': 'warning', 'hypothermia_wet': 'danger',
+        'cold_dry': 'info', 'heat_stroke': 'danger', 'heat_warning': 'warning',
+        'heat_monitor': 'info', 'pressure_severe': 'danger', 'pressure_low': 'warning',
+        'pressure_dropping_fast': 'warning', 'pressure_dropping_very_fast': 'danger',
+        'rain_active': 'warning', 'uv_extreme': 'danger', 'uv_very_high': 'warning',
+        'uv_high': 'info', 'visibility_poor': 'warning', 'visibility_dark': 'info',
+        'co2_idlh': 'danger', 'co2_evacuate': 'danger', 'co2_dangerous': 'danger',
+        'co2_impairment': 'warning', 'co2_poor': 'warning', 'co2_stuffy': 'info',
+        'traffic_high': 'info', 'traffic_moderate': 'info', 'slippery': 'warning',
+        'soil_saturated': 'warning', 'soil_wet': 'info',
+    }
+
+    # HAZARD_CHECKS column raising each hazard type: the types of one check
+    # are severities of the same condition
+    HAZARD_FAMILIES = {
+        'severe_cold': 'thermal', 'freezing': 'thermal', 'hypothermia_wet': 'thermal',
+        'cold_dry': 'thermal', 'heat_stroke': 'thermal', 'heat_warning': 'thermal',
+        'heat_monitor': 'thermal', 'pressure_severe': 'pressure', 'pressure_low': 'pressure',
+        'pressure_dropping_fast': 'pressure_rate', 'pressure_dropping_very_fast': 'pressure_rate',
+        'rain_active': 'rain', 'uv_extreme': 'uv', 'uv_very_high': 'uv', 'uv_high': 'uv',
+        'visibility_poor': 'visibility', 'visibility_dark': 'visibility',
+        'co2_idlh': 'air_quality', 'co2_evacuate': 'air_quality', 'co2_dangerous': 'air_quality',
+        'co2_impairment': 'air_quality', 'co2_poor': 'air_quality', 'co2_stuffy': 'air_quality',
+        'traffic_high': 'traffic', 'traffic_moderate': 'traffic', 'slippery': 'slippery',
+        'soil_saturated': 'soil', 'soil_wet': 'soil',
+    }
+
+    def _select(self, choices: List[Tuple[np.ndarray, str]]) -> np.ndarray:
+        """First matching hazard code per row, -1 if none, like an elif chain."""
+        conditions = [condition for condition, _ in choices]
+        codes = [self.HAZARD_TYPES.index(hazard_type) for _, hazard_type in choices]
+        return np.select(conditions, codes, default=-1).astype(np.int8)
+
+    def _pressure_rates(self, pressure: np.ndarray, timestamps, previous=None):
+        """
+        Replay _get_pressure_rate over one station's rows in order, from
+        the `previous` ring or an empty one (never seeded).
+        Sequential by nature, only this scan runs in Python.
+
+        Returns (rates, ring after the last row).
+        """
+        rates = np.full(len(pressure), np.nan)
+        if timestamps is None:
+            return rates, previous
+
+        ring = dict(previous or {})
+        microseconds = _epoch_microseconds(timestamps)
+
+        for row in np.flatnonzero(~np.isnan(pressure)).tolist():
+            now = microseconds[row].item()
+            ring_put(ring, now, pressure[row].item())
+            rate = pressure_slope(window(ring, now))
+            if rate is not None:
+                rates[row] = rate
+
+        return rates, ring
+
+    def analyze_batch(self, temperature=None, humidity=None, pressure=None, uv_index=None,
+                      lux=None, co2_ppm=None, moisture_percent=None, is_raining=None,
+                      rain_detected_last_hour=None, motion_count=None,
+                      timestamps=None, pressure_history=None) -> BatchAnalysis:
+        """
+        Analyze n readings given as columns, e.g. a year of one station's history.
+
+        Args:
+            temperature ... motion_count: Sequences or arrays of length n,
+                None (missing) or NaN where a row has no value. Omitted
+                columns are missing for every row (motion_count: 0).
+            timestamps: Reading times (datetimes or datetime64) of a single
+                station's rows in time order, enables the pressure rate
+                checks. The analyzer's live pressure history is not touched.
+            pressure_history: BatchAnalysis.pressure_history of the previous
+                batch of the same station, to replay a long series in chunks.
+
+        Row i gives the same hazards and highest severity as analyze() on
+        the matching snapshot, for a fresh analyzer fed the rows in order.
+        """
+        columns = {
+            'temperature': temperature, 'humidity': humidity, 'pressure': pressure,
+            'uv_index': uv_index, 'lux': lux, 'co2_ppm': co2_ppm,
+            'moisture_percent': moisture_percent, 'is_raining': is_raining,
+            'rain_detected_last_hour': rain_detected_last_hour, 'motion_count': motion_count,
+            'timestamps': timestamps,
+        }
+        lengths = {len(values) for values in columns.values() if values is not None}
+        if len(lengths) > 1:
+            raise ValueError('analyze_batch columns must all have the same length')
+        n = lengths.pop() if lengths else 0
+
+        def numbers(values, missing=np.nan):
+            if values is None:
+                return np.full(n, missing, dtype=np.float64)
+            return np.asarray(values, dtype=np.float64)
+
+        def flags(values):
+            if values is None:
+                return np.zeros(n, dtype=bool)
+            return np.asarray(values, dtype=bool)
+
+        temp = numbers(temperature)
+        humidity = numbers(humidity)
+        pressure = numbers(pressure)
+        uv = numbers(uv_index)
+        lux = numbers(lux)
+        co2 = numbers(co2_ppm)
+        moisture = numbers(moisture_percent)
+        motion = numbers(motion_count, missing=0)
+        is_raining = flags(is_raining)
+        rained_recently = flags(rain_detected_last_hour)
+
+        is_wet = is_raining | (humidity > self.HUMIDITY_VERY_HIGH)
+        rates, pressure_history = self._pressure_rates(pressure, timestamps, pressure_history)
+
+        hazards = np.stack([
+            self._select([
+                (temp < self.TEMP_SEVERE_COLD, 'severe_cold'),
+                (temp < self.TEMP_FREEZING, 'freezing'),
+                ((temp < self.TEMP_HYPOTHERMIA_WET) & is_wet, 'hypothermia_wet'),
+                (temp < self.TEMP_HYPOTHERMIA_WET, 'cold_dry'),
+                (temp > self.TEMP_HEAT_DANGER, 'heat_stroke'),
+                (temp > self.TEMP_HEAT_WARNING, 'heat_warning'),
+                (temp > self.TEMP_HEAT_MONITOR, 'heat_monitor'),
+            ]),
+            self._select([
+                (pressure < self.PRESSURE_BASELINE_1250M - self.PRESSURE_SEVERE_DROP, 'pressure_severe'),
+                (pressure < self.PRESSURE_BASELINE_1250M - self.PRESSURE_STORM_DROP, 'pressure_low'),
+            ]),
+            self._select([
+                (rates <= -self.PRESSURE_VERY_RAPID_DROP, 'pressure_dropping_very_fast'),
+                (rates <= -self.PRESSURE_RAPID_DROP, 'pressure_dropping_fast'),
+            ]),
+            self._select([(is_raining, 'rain_active')]),
+            self._select([
+                (uv >= self.UV_EXTREME, 'uv_extreme'),
+                (uv >= self.UV_VERY_HIGH, 'uv_very_high'),
+                (uv >= self.UV_HIGH, 'uv_high'),
+            ]),
+            self._select([
+                ((lux < self.LUX_DARK) & is_wet, 'visibility_poor'),
+                ((lux < self.LUX_DARK) & (lux < self.LUX_VERY_DARK), 'visibility_dark'),
+            ]),
+            self._select([
+                (co2 >= self.CO2_IDLH, 'co2_idlh'),
+                (co2 >= self.CO2_EVACUATE, 'co2_evacuate'),
+                (co2 >= self.CO2_DANGEROUS, 'co2_dangerous'),
+                (co2 >= self.CO2_IMPAIRMENT, 'co2_impairment'),
+                (co2 >= self.CO2_POOR, 'co2_poor'),
+                (co2 >= self.CO2_STUFFY, 'co2_stuffy'),
+            ]),
+            self._select([
+                (motion > self.TRAFFIC_HIGH, 'traffic_high'),
+                (motion > self.TRAFFIC_MODERATE, 'traffic_moderate'),
+            ]),
+            self._select([
+                (moisture >= self.SOIL_SATURATED, 'soil_saturated'),
+                (moisture >= self.SOIL_WET, 'soil_wet'),
+            ]),
+            self._select([(rained_recently & (temp < 5), 'slippery')]),
+        ], axis=1) if n else np.empty((0, len(self.HAZARD_CHECKS)), dtype=np.int8)
+
+        # Severity of each code, with a trailing 0 that code -1 indexes
+        code_severity = np.array(
+            [self.SEVERITY_CODES[self.HAZARD_SEVERITIES[t]] for t in self.HAZARD_TYPES] + [0],
+            dtype=np.int8,
+        )
+        hazard_severity = code_severity[hazards]
+        severity = hazard_severity.max(axis=1, initial=0)
+        # get_highest_severity_alert keeps the first alert of the top severity
+        first = np.argmax(hazard_severity == severity[:, None], axis=1)
+        top_hazard = np.where(severity > 0, hazards[np.arange(n), first], -1).astype(np.int8)
+
+        return BatchAnalysis(severity=severity, hazards=hazards, top_hazard=top_hazard,
+                             pressure_rate=rates, pressure_history=pressure_history)
+
+
+
+def _epoch_microseconds(timestamps) -> np.ndarray:
+    """Integer microseconds since the epoch of datetimes or a datetime64 array."""
+    array = np.asarray(timestamps)
+    if array.dtype.kind == 'M':
+        return array.astype('datetime64[us]').astype(np.int64)
+    return np.array([epoch_microseconds(t) for t in timestamps], dtype=np.int64)
 
 
-alert_analyzer = AlertAnalyzer()
+alert_analyzer = AlertAnalyzer(pressure_history=configured_pressure_history())
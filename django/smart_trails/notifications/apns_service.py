@@ -1,49 +1,70 @@
 import asyncio
+from dataclasses import dataclass
+from typing import Optional
 from aioapns import APNs, NotificationRequest
 from django.conf import settings
-from threading import Lock
+from threading import Lock, Thread
+
+
+@dataclass
+class SendResult:
+    device_token: str
+    success: bool
+    status: Optional[str] = None
+    description: Optional[str] = None
 
 
 class APNsService:
-    """Service for sending push notifications via APNs"""
-    
+    """
+    Service for sending push notifications via APNs
+
+    All sends run on one long-lived event loop in a background thread, so
+    the aioapns client and its pooled HTTP/2 connections are reused across
+    calls and many requests can be multiplexed at once (see send_many).
+    """
+
     def __init__(self):
         self.client = None
         self._lock = Lock()
-    
+        self._loop = None
+        self._thread = None
+
     async def get_client(self):
         """Get or create APNs client"""
         if self.client is None:
             # Read key file as bytes
             with open(settings.APNS_KEY_PATH, 'rb') as f:
                 key_data = f.read()
-            
+
             self.client = APNs(
                 key=key_data,
                 key_id=settings.APNS_KEY_ID,
                 team_id=settings.APNS_TEAM_ID,
                 topic='com.kateDmitrieva.SmartTrails',
                 use_sandbox=settings.APNS_USE_SANDBOX,
+                max_connections=settings.APNS_MAX_CONNECTIONS,
             )
         return self.client
-    
-    async def send_notification(self, device_token, bundle_id, title, body, 
-                                 data=None, image_url=None, category=None):
-        """
-        Send push notification to a device
-        
-        Args:
-            device_token: Device APNs token
-            bundle_id: App bundle identifier
-            title: Notification title
-            body: Notification body
-            data: Additional data payload
-            image_url: URL to image to attach (optional)
-            category: Notification category for actions (optional)
-        """
-        client = await self.get_client()
-        
-        # Build notification payload
+
+    def _get_loop(self):
+        """Start the background event loop thread on first use"""
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = Thread(target=loop.run_forever, name='apns-loop', daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+                # The client's connections belong to the loop that created them
+                self.client = None
+        return self._loop
+
+    def _run(self, coro):
+        """Run a coroutine on the background loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def _build_request(self, device_token, title, body, data=None,
+                       image_url=None, category=None):
+        """Build the APNs request for one device"""
         aps = {
             "alert": {
                 "title": title,
@@ -52,53 +73,98 @@ class APNsService:
             "sound": "default",
             "badge": 1,
         }
-        
+
         if category:
             aps["category"] = category
-        
+
         message = {"aps": aps}
-        
+
         if data:
             message.update(data)
-        
+
         if image_url:
             message["image_url"] = image_url
-        
-        request = NotificationRequest(
+
+        return NotificationRequest(
             device_token=device_token,
             message=message,
         )
-        
+
+    async def _send(self, client, device_token, title, body, data=None,
+                    image_url=None, category=None, **kwargs):
+        request = self._build_request(device_token, title, body, data, image_url, category)
         try:
             response = await client.send_notification(request)
-            return response.is_successful
+            return SendResult(device_token, response.is_successful,
+                              response.status, response.description)
         except Exception as e:
             print(f"Failed to send notification: {e}")
-            return False
-    
-    def send_sync(self, device_token, bundle_id, title, body, data=None, 
+            return SendResult(device_token, False, description=str(e))
+
+    async def send_notification(self, device_token, bundle_id, title, body,
+                                 data=None, image_url=None, category=None):
+        """
+        Send push notification to a device
+
+        Args:
+            device_token: Device APNs token
+            bundle_id: App bundle identifier
+            title: Notification title
+            body: Notification body
+            data: Additional data payload
+            image_url: URL to image to attach (optional)
+            category: Notification category for actions (optional)
+        """
+        client = await self.get_client()
+        result = await self._send(client, device_token, title, body, data, image_url, category)
+        return result.success
+
+    async def send_many_async(self, notifications, concurrency):
+        """Send notifications with at most `concurrency` requests in flight"""
+        client = await self.get_client()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_one(notification):
+            async with semaphore:
+                return await self._send(client, **notification)
+
+        return await asyncio.gather(*(send_one(n) for n in notifications))
+
+    def send_sync(self, device_token, bundle_id, title, body, data=None,
                    image_url=None, category=None):
         """Synchronous wrapper for send_notification"""
-        with self._lock:
-            try:
-                # Try to get existing event loop
-                loop = asyncio.get_event_loop()
-                if loop.is_closed():
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-            except RuntimeError:
-                # No event loop in current thread
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            try:
-                return loop.run_until_complete(
-                    self.send_notification(device_token, bundle_id, title, body, 
-                                           data, image_url, category)
-                )
-            except Exception as e:
-                print(f"Error in send_sync: {e}")
-                return False
+        try:
+            return self._run(
+                self.send_notification(device_token, bundle_id, title, body,
+                                       data, image_url, category)
+            )
+        except Exception as e:
+            print(f"Error in send_sync: {e}")
+            return False
+
+    def send_many(self, notifications, concurrency=None):
+        """
+        Send many notifications concurrently and wait for all of them.
+
+        Args:
+            notifications: Iterable of dicts with send_sync keyword arguments
+                (device_token, bundle_id, title, body, data, image_url, category)
+            concurrency: Max requests in flight, defaults to settings.APNS_CONCURRENCY
+
+        Returns a SendResult per notification, in input order.
+        """
+        notifications = list(notifications)
+        if not notifications:
+            return []
+
+        try:
+            return self._run(self.send_many_async(
+                notifications, concurrency or settings.APNS_CONCURRENCY
+            ))
+        except Exception as e:
+            print(f"Error in send_many: {e}")
+            return [SendResult(n['device_token'], False, description=str(e))
+                    for n in notifications]
 
 
 
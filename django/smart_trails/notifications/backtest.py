@@ -0,0 +1,237 @@
+"""
+Replay of stored readings through AlertAnalyzer, for tuning thresholds.
+
+A replay rebuilds a station's snapshots from the reading tables, oldest
+first, and runs them through two analyzers: the baseline (the current
+thresholds, optionally overridden) and a candidate with the thresholds
+under test. It reports, for both and as a difference:
+
+    alerts          every alert analyze() would have returned, per type
+    pushes          the alerts process_alerts would have queued, per type:
+                    the top danger/warning alert due under the cooldowns of
+                    notifications.cooldown, or 'all_clear'
+    pushes_per_day  the same per local calendar day
+
+Pushes count what ingest queues, replaying the cooldown states from clear
+at the start of the range; the outbox may still coalesce pending ones
+before delivery.
+
+The reading tables are merged by timestamp from one streaming cursor each
+and analyzed REPLAY_CHUNK_ROWS snapshots at a time with the vectorized
+AlertAnalyzer.analyze_batch, carrying the pressure rate history from chunk
+to chunk, so memory stays bounded whatever the range.
+"""
+
+import heapq
+from collections import Counter
+from operator import itemgetter
+
+import numpy as np
+from django.utils import timezone
+
+from sensors.models import READING_MODELS
+
+from .alert_system import Alert, AlertAnalyzer
+from .cooldown import ALL_CLEAR, advance
+
+
+# Snapshots analyzed per batch, also the database fetch size
+REPLAY_CHUNK_ROWS = 20000
+
+# Reading section -> columns analyze_batch reads from it
+REPLAY_FIELDS = {
+    'atmospheric': ['temperature', 'humidity', 'pressure'],
+    'light': ['uv_index', 'lux'],
+    'soil': ['moisture_percent'],
+    'air_quality': ['co2_ppm'],
+    'precipitation': ['is_raining', 'rain_detected_last_hour'],
+    'trail_activity': ['motion_count'],
+}
+
+# Value of a column when its section is missing from a snapshot, as
+# AlertAnalyzer._extract_sensor_data defaults it
+COLUMN_DEFAULTS = {
+    'temperature': None,
+    'humidity': None,
+    'pressure': None,
+    'uv_index': None,
+    'lux': None,
+    'moisture_percent': None,
+    'co2_ppm': None,
+    'is_raining': False,
+    'rain_detected_last_hour': False,
+    'motion_count': 0,
+}
+
+# Numeric class constants of AlertAnalyzer a replay can override
+THRESHOLDS = sorted(
+    name for name, value in vars(AlertAnalyzer).items()
+    if name.isupper() and isinstance(value, (int, float)) and not isinstance(value, bool)
+)
+
+
+def parse_thresholds(items):
+    """
+    Parse 'NAME=VALUE' overrides (also comma separated) into {name: number}.
+
+    Raises ValueError naming unknown constants or bad values.
+    """
+    thresholds = {}
+    for item in items:
+        for override in filter(None, (part.strip() for part in item.split(','))):
+            name, _, value = override.partition('=')
+            name = name.strip().upper()
+            if name not in THRESHOLDS:
+                raise ValueError(f'Unknown threshold: {name}')
+            try:
+                thresholds[name] = float(value)
+            except ValueError:
+                raise ValueError(f'{name} must be a number, got {value!r}')
+    return thresholds
+
+
+def analyzer_with(thresholds):
+    """A fresh AlertAnalyzer whose constants are overridden by `thresholds`."""
+    analyzer = AlertAnalyzer()
+    for name, value in thresholds.items():
+        setattr(analyzer, name, value)
+    return analyzer
+
+
+def _section_rows(section, station_id, start, end, chunk_size):
+    readings = READING_MODELS[section].objects.filter(station_id=station_id)
+    if start is not None:
+        readings = readings.filter(timestamp__gte=start)
+    if end is not None:
+        readings = readings.filter(timestamp__lt=end)
+    rows = (
+        readings.order_by('timestamp')
+        .values_list('timestamp', *REPLAY_FIELDS[section])
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield row[0], section, row[1:]
+
+
+def snapshot_chunks(station_id, start=None, end=None, chunk_size=REPLAY_CHUNK_ROWS):
+    """
+    Yield (timestamps, {column: values}) of up to chunk_size snapshots,
+    oldest first, merging the readings stored with the same timestamp.
+    """
+    streams = [_section_rows(section, station_id, start, end, chunk_size) for section in REPLAY_FIELDS]
+
+    timestamps = []
+    columns = {name: [] for name in COLUMN_DEFAULTS}
+    for timestamp, section, values in heapq.merge(*streams, key=itemgetter(0)):
+        if not timestamps or timestamp != timestamps[-1]:
+            if len(timestamps) >= chunk_size:
+                yield timestamps, columns
+                timestamps = []
+                columns = {name: [] for name in COLUMN_DEFAULTS}
+            timestamps.append(timestamp)
+            for name, default in COLUMN_DEFAULTS.items():
+                columns[name].append(default)
+        for name, value in zip(REPLAY_FIELDS[section], values):
+            columns[name][-1] = value
+
+    if timestamps:
+        yield timestamps, columns
+
+
+class _Replay:
+    """Counters of one analyzer over the replayed snapshots."""
+
+    def __init__(self, station_id, thresholds):
+        self.station_id = station_id
+        self.thresholds = thresholds
+        self.analyzer = analyzer_with(thresholds)
+        self.pressure_history = None
+        # Unsaved AlertStates, advanced like ingest does
+        self.states = {}
+        self.alerts = Counter()
+        self.pushes = Counter()
+        self.pushes_per_day = Counter()
+
+    def feed(self, timestamps, columns):
+        result = self.analyzer.analyze_batch(**columns, timestamps=timestamps,
+                                             pressure_history=self.pressure_history)
+        self.pressure_history = result.pressure_history
+        types = AlertAnalyzer.HAZARD_TYPES
+
+        codes, counts = np.unique(result.hazards[result.hazards >= 0], return_counts=True)
+        for code, count in zip(codes.tolist(), counts.tolist()):
+            self.alerts[types[code]] += count
+
+        # process_alerts only queues danger and warning alerts
+        severities = AlertAnalyzer.HAZARD_SEVERITIES
+        for row, codes in enumerate(result.hazards.tolist()):
+            alerts = [
+                Alert(severity=severities[types[code]], title='', body='', emoji='', category='',
+                      alert_type=types[code])
+                for code in codes
+                if code >= 0 and severities[types[code]] in ('danger', 'warning')
+            ]
+            if not alerts and not self.states:
+                continue
+            push, all_clear, _ = advance(self.states, alerts, timestamps[row], self.station_id)
+            if push:
+                pushed = self.analyzer.get_highest_severity_alert(push).alert_type
+            elif all_clear is not None:
+                pushed = ALL_CLEAR
+            else:
+                continue
+            self.pushes[pushed] += 1
+            self.pushes_per_day[timezone.localdate(timestamps[row]).isoformat()] += 1
+
+    def report(self):
+        return {
+            'thresholds': self.thresholds,
+            'alerts': dict(sorted(self.alerts.items())),
+            'pushes': dict(sorted(self.pushes.items())),
+            'pushes_per_day': dict(sorted(self.pushes_per_day.items())),
+        }
+
+
+def _diff(candidate, baseline):
+    keys = sorted(set(candidate) | set(baseline))
+    return {key: candidate.get(key, 0) - baseline.get(key, 0)
+            for key in keys if candidate.get(key, 0) != baseline.get(key, 0)}
+
+
+def replay(station_id, start=None, end=None, thresholds=None, baseline=None,
+           chunk_size=REPLAY_CHUNK_ROWS):
+    """
+    Replay a station's readings in [start, end) through the baseline and
+    candidate thresholds.
+
+    Args:
+        station_id: Station to replay
+        start, end: Optional aware datetimes bounding the readings
+        thresholds: {constant: value} overrides under test, on top of the baseline
+        baseline: {constant: value} overrides of the baseline, default none
+
+    Returns the report described in the module docstring.
+    """
+    baseline_run = _Replay(station_id, baseline or {})
+    candidate_run = _Replay(station_id, {**(baseline or {}), **(thresholds or {})})
+    snapshots = 0
+
+    for timestamps, columns in snapshot_chunks(station_id, start, end, chunk_size):
+        snapshots += len(timestamps)
+        baseline_run.feed(timestamps, columns)
+        candidate_run.feed(timestamps, columns)
+
+    baseline_report = baseline_run.report()
+    candidate_report = candidate_run.report()
+    return {
+        'station_id': station_id,
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'snapshots': snapshots,
+        'baseline': baseline_report,
+        'candidate': candidate_report,
+        'diff': {
+            name: _diff(candidate_report[name], baseline_report[name])
+            for name in ('alerts', 'pushes', 'pushes_per_day')
+        },
+    }
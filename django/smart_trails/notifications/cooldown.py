@@ -0,0 +1,147 @@
+"""
+Cooldown and deduplication of alert pushes.
+
+Every snapshot re-runs AlertAnalyzer, so a storm lasting six hours raises
+the same alert on each of its 24 readings. Each (station, hazard) has an
+AlertState deciding whether its danger/warning alert is pushed. The hazard
+is the AlertAnalyzer check raising the alert (AlertAnalyzer.HAZARD_FAMILIES),
+so freezing turning into severe cold, or back, stays one condition:
+
+    clear     appears                  -> active     push
+    active    present                  -> active     push only if the severity
+                                                     rises above the last pushed
+                                                     one (escalation) or the
+                                                     COOLDOWNS of its severity
+                                                     passed since the last push
+    active    absent                   -> clearing
+    clearing  present                  -> active     as active, it only blinked
+    clearing  absent ALL_CLEAR_AFTER   -> clear      once no hazard of the station
+                                                     is active or clearing any
+                                                     more, one "all clear" push
+
+States are rows, so they survive restarts and are shared by every worker.
+Times are snapshot timestamps, so a replay decides like ingest did. A
+snapshot repeating the current conditions costs one indexed read of the
+station's states: no write, no outbox entry, no device query, no APNs call.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+
+from sensors.upsert import upsert_rows
+
+from .alert_system import Alert, AlertAnalyzer, alert_analyzer
+from .models import AlertState
+
+
+# Time after a push before the same hazard is pushed again at that severity
+COOLDOWNS = {
+    'danger': timedelta(hours=2),
+    'warning': timedelta(hours=6),
+}
+
+# Time a hazard must stay absent before it is over
+ALL_CLEAR_AFTER = timedelta(minutes=45)
+
+SEVERITY_RANK = {'warning': 1, 'danger': 2}
+
+ALL_CLEAR = 'all_clear'
+
+
+def advance(states, alerts, timestamp, station_id):
+    """
+    Apply one snapshot to a station's alert states.
+
+    Args:
+        states: {hazard: AlertState} of the station, new hazards are added
+        alerts: The snapshot's danger and warning alerts, in analyze() order
+        timestamp: Snapshot time
+        station_id: Station of new states
+
+    Returns (alerts to push, state of the all clear or None, changed states).
+    The all clear state is the highest-severity hazard that just cleared.
+    """
+    push = []
+    changed = []
+    present = set()
+
+    for alert in alerts:
+        hazard = AlertAnalyzer.HAZARD_FAMILIES[alert.alert_type]
+        present.add(hazard)
+        state = states.get(hazard)
+        if state is None:
+            state = states[hazard] = AlertState(station_id=station_id, hazard=hazard)
+
+        rank = SEVERITY_RANK[alert.severity]
+        if (state.state == 'clear'
+                or rank > SEVERITY_RANK[state.severity]
+                or timestamp - state.notified_at >= COOLDOWNS[alert.severity]):
+            state.state = 'active'
+            state.severity = alert.severity
+            state.category = alert.category
+            state.notified_at = timestamp
+            state.changed_at = timestamp
+            push.append(alert)
+            changed.append(state)
+        elif state.state == 'clearing':
+            state.state = 'active'
+            state.changed_at = timestamp
+            changed.append(state)
+
+    cleared = []
+    for hazard, state in states.items():
+        if hazard in present:
+            continue
+        if state.state == 'active':
+            state.state = 'clearing'
+            state.changed_at = timestamp
+            changed.append(state)
+        elif state.state == 'clearing' and timestamp - state.changed_at >= ALL_CLEAR_AFTER:
+            state.state = 'clear'
+            state.changed_at = timestamp
+            changed.append(state)
+            cleared.append(state)
+
+    all_clear = None
+    if cleared and all(state.state == 'clear' for state in states.values()):
+        all_clear = max(cleared, key=lambda state: SEVERITY_RANK[state.severity])
+
+    return push, all_clear, changed
+
+
+def all_clear_alert(station_name, state):
+    return Alert(
+        severity='info',
+        title='✅ All Clear',
+        body=f'{station_name}: Conditions are back to normal.',
+        emoji='✅',
+        category=state.category,
+        alert_type=ALL_CLEAR,
+    )
+
+
+def alert_to_push(station, alerts, timestamp, station_name):
+    """
+    Advance the station's stored alert states with a snapshot's danger and
+    warning alerts, return the Alert to push or None.
+
+    Of several alerts due, the highest severity one is pushed, as
+    get_highest_severity_alert picks it.
+    """
+    with transaction.atomic():
+        states = {
+            state.hazard: state
+            for state in AlertState.objects.select_for_update().filter(station=station)
+        }
+        if not states and not alerts:
+            return None
+
+        push, all_clear, changed = advance(states, alerts, timestamp, station.station_id)
+        upsert_rows(AlertState, changed, ['station', 'hazard'])
+
+    if push:
+        return alert_analyzer.get_highest_severity_alert(push)
+    if all_clear is not None:
+        return all_clear_alert(station_name, all_clear)
+    return None
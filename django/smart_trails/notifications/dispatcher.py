@@ -0,0 +1,165 @@
+"""
+Delivers queued alerts from NotificationOutbox to subscribed devices.
+
+Run by the `dispatch_notifications` management command, separately from
+the web workers that ingest sensor data.
+"""
+
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from stations.models import Station
+
+from .apns_service import apns_service
+from .models import DeviceToken, NotificationOutbox
+
+
+# Outbox entries whose fan-out raised this many times are marked failed
+MAX_ATTEMPTS = 3
+
+# Time a dispatcher may spend on one entry before another one may take it over
+SENDING_LEASE = timedelta(minutes=15)
+
+# Devices loaded and pushed per send_many call
+FAN_OUT_CHUNK_SIZE = 1000
+
+# APNs reasons meaning the token will never work again
+INVALID_TOKEN_REASONS = {'BadDeviceToken', 'Unregistered', 'DeviceTokenNotForTopic'}
+
+
+def enqueue_alert(station, alert):
+    """
+    Queue an alert push for a station.
+
+    A station keeps at most one pending entry: a newer alert replaces one
+    the dispatcher has not picked up yet, so subscribers only get the
+    current conditions. The station row is locked meanwhile, so concurrent
+    ingests of one station cannot both find no pending entry and insert two.
+    """
+    values = {
+        'severity': alert.severity,
+        'category': alert.category,
+        'title': alert.title,
+        'body': alert.body,
+    }
+    with transaction.atomic():
+        list(Station.objects.select_for_update().filter(pk=station.pk).values_list('pk'))
+        updated = NotificationOutbox.objects.filter(station=station, status='pending').update(
+            created_at=timezone.now(), **values
+        )
+        if not updated:
+            NotificationOutbox.objects.create(station=station, **values)
+
+
+def recover_interrupted():
+    """
+    Requeue entries left in 'sending' by a dispatcher that died mid fan-out.
+
+    Only claims older than SENDING_LEASE are taken back, so entries a live
+    dispatcher is still sending are left alone.
+    """
+    expired = models.Q(claimed_at__lt=timezone.now() - SENDING_LEASE) | models.Q(claimed_at__isnull=True)
+    return NotificationOutbox.objects.filter(expired, status='sending').update(
+        status='pending', claimed_at=None
+    )
+
+
+def dispatch_pending(limit=50):
+    """
+    Send up to `limit` pending outbox entries, oldest first.
+
+    Returns the number of entries handled.
+    """
+    entries = list(
+        NotificationOutbox.objects.filter(status='pending').order_by('created_at')[:limit]
+    )
+
+    for entry in entries:
+        # Claim the entry, another dispatcher may have taken it already
+        claimed = NotificationOutbox.objects.filter(pk=entry.pk, status='pending').update(
+            status='sending', attempts=models.F('attempts') + 1, claimed_at=timezone.now()
+        )
+        if not claimed:
+            continue
+        entry.refresh_from_db(fields=['attempts', 'title', 'body', 'severity', 'category'])
+
+        try:
+            sent, failed = _fan_out(entry)
+        except Exception as e:
+            print(f"Dispatch of outbox entry {entry.pk} failed: {e}")
+            entry.status = 'failed' if entry.attempts >= MAX_ATTEMPTS else 'pending'
+            entry.claimed_at = None
+            entry.save(update_fields=['status', 'claimed_at'])
+            continue
+
+        entry.status = 'sent'
+        entry.sent_count = sent
+        entry.failed_count = failed
+        entry.dispatched_at = timezone.now()
+        entry.save(update_fields=['status', 'sent_count', 'failed_count', 'dispatched_at'])
+
+    return len(entries)
+
+
+def _fan_out(entry):
+    """
+    Push one outbox entry to every active device of its station.
+
+    Devices are streamed from the database and sent in chunks through
+    apns_service.send_many. Tokens APNs reports as no longer valid are
+    deactivated. Returns (sent, failed).
+    """
+    devices = DeviceToken.objects.filter(is_active=True).filter(
+        models.Q(station_id=entry.station_id) | models.Q(station__isnull=True)
+    ).values_list('token', 'bundle_id')
+
+    sent = 0
+    failed = 0
+    invalid = []
+    chunk = []
+    for device in devices.iterator(chunk_size=FAN_OUT_CHUNK_SIZE):
+        chunk.append(device)
+        if len(chunk) == FAN_OUT_CHUNK_SIZE:
+            results = _send_chunk(entry, chunk)
+            chunk = []
+            sent, failed = _tally(results, sent, failed, invalid)
+
+    if chunk:
+        sent, failed = _tally(_send_chunk(entry, chunk), sent, failed, invalid)
+
+    # Deactivated after the device cursor is closed
+    if invalid:
+        DeviceToken.objects.filter(token__in=invalid).update(is_active=False)
+
+    return sent, failed
+
+
+def _send_chunk(entry, devices):
+    return apns_service.send_many(
+        {
+            'device_token': token,
+            'bundle_id': bundle_id,
+            'title': entry.title,
+            'body': entry.body,
+            'data': {
+                'station_id': entry.station_id,
+                'category': entry.category,
+            },
+            'category': entry.category,
+        }
+        for token, bundle_id in devices
+    )
+
+
+def _tally(results, sent, failed, invalid):
+    """Add a chunk's SendResults to the running counts, collecting dead tokens."""
+    for result in results:
+        if result.success:
+            sent += 1
+        else:
+            failed += 1
+            if result.description in INVALID_TOKEN_REASONS:
+                invalid.append(result.device_token)
+    return sent, failed
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from stations.models import Station
+from notifications.backtest import THRESHOLDS, parse_thresholds, replay
+
+
+class Command(BaseCommand):
+    help = 'Replay stored readings of a station through AlertAnalyzer and compare threshold sets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('station_id')
+        parser.add_argument('--start', help='ISO 8601 timestamp of the first reading replayed')
+        parser.add_argument('--end', help='ISO 8601 timestamp the replay stops before')
+        parser.add_argument('--set', action='append', default=[], dest='thresholds',
+                            metavar='NAME=VALUE',
+                            help=f"Threshold under test (repeatable), one of: {', '.join(THRESHOLDS)}")
+        parser.add_argument('--baseline', action='append', default=[], metavar='NAME=VALUE',
+                            help='Override of the baseline thresholds (repeatable, default: current)')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def _timestamp(self, options, name):
+        if not options[name]:
+            return None
+        value = parse_datetime(options[name])
+        if value is None:
+            raise CommandError(f'--{name} must be an ISO 8601 timestamp')
+        return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+    def handle(self, *args, **options):
+        if not Station.objects.filter(station_id=options['station_id']).exists():
+            raise CommandError(f"Station {options['station_id']} not found")
+        try:
+            thresholds = parse_thresholds(options['thresholds'])
+            baseline = parse_thresholds(options['baseline'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        report = replay(options['station_id'], self._timestamp(options, 'start'),
+                        self._timestamp(options, 'end'), thresholds, baseline)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{report['snapshots']} snapshots replayed")
+        for name in ('pushes', 'alerts'):
+            self.stdout.write(f'\n{name:<28} {"baseline":>9} {"candidate":>9} {"diff":>6}')
+            baseline_counts = report['baseline'][name]
+            candidate_counts = report['candidate'][name]
+            for hazard_type in sorted(set(baseline_counts) | set(candidate_counts)):
+                before = baseline_counts.get(hazard_type, 0)
+                after = candidate_counts.get(hazard_type, 0)
+                self.stdout.write(f'{hazard_type:<28} {before:>9} {after:>9} {after - before:>+6}')
+
+        days = report['diff']['pushes_per_day']
+        self.stdout.write(f'\n{len(days)} days with a different number of pushes')
+        for day, change in days.items():
+            self.stdout.write(f'{day} {change:+d}')
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.dispatcher import dispatch_pending, recover_interrupted
+
+
+class Command(BaseCommand):
+    help = 'Send queued alert pushes from the notification outbox to subscribed devices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Outbox entries handled per batch')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Dispatch until the outbox is empty, then exit')
+
+    def handle(self, *args, **options):
+        recovered = recover_interrupted()
+        if recovered:
+            self.stdout.write(f'Requeued {recovered} interrupted outbox entries')
+
+        while True:
+            handled = dispatch_pending(options['batch_size'])
+
+            if handled:
+                self.stdout.write(f'Dispatched {handled} outbox entries')
+                continue
+
+            if options['once']:
+                return
+            # Take over the entries of dispatchers that died since
+            recovered = recover_interrupted()
+            if recovered:
+                self.stdout.write(f'Requeued {recovered} interrupted outbox entries')
+                continue
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0001_initial'),
+        ('notifications', '0002_auto_20261018_0030'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PressureSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.SmallIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('pressure', models.FloatField()),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pressure_samples', to='stations.station')),
+            ],
+            options={
+                'db_table': 'pressure_history',
+                'unique_together': {('station', 'slot')},
+            },
+        ),
+    ]
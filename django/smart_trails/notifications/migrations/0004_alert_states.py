@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0001_initial'),
+        ('notifications', '0003_pressure_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(max_length=50)),
+                ('state', models.CharField(choices=[('active', 'Active'), ('clearing', 'Clearing'), ('clear', 'Clear')], default='clear', max_length=10)),
+                ('severity', models.CharField(help_text='Severity of the last push', max_length=10)),
+                ('category', models.CharField(max_length=50)),
+                ('notified_at', models.DateTimeField(blank=True, help_text='Snapshot time of the last push', null=True)),
+                ('changed_at', models.DateTimeField(blank=True, help_text='Snapshot time of the last state change', null=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to='stations.station')),
+            ],
+            options={
+                'db_table': 'alert_states',
+                'unique_together': {('station', 'alert_type')},
+            },
+        ),
+    ]
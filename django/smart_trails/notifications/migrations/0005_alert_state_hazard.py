@@ -0,0 +1,60 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:48
+
+from django.db import migrations, models
+
+
+# AlertAnalyzer.HAZARD_FAMILIES of the danger and warning types, as of this migration
+HAZARD_FAMILIES = {
+    'severe_cold': 'thermal', 'freezing': 'thermal', 'hypothermia_wet': 'thermal',
+    'heat_stroke': 'thermal', 'heat_warning': 'thermal',
+    'pressure_severe': 'pressure', 'pressure_low': 'pressure',
+    'pressure_dropping_fast': 'pressure_rate', 'pressure_dropping_very_fast': 'pressure_rate',
+    'rain_active': 'rain', 'uv_extreme': 'uv', 'uv_very_high': 'uv',
+    'visibility_poor': 'visibility',
+    'co2_idlh': 'air_quality', 'co2_evacuate': 'air_quality', 'co2_dangerous': 'air_quality',
+    'co2_impairment': 'air_quality', 'co2_poor': 'air_quality',
+    'slippery': 'slippery', 'soil_saturated': 'soil',
+}
+
+STATE_RANK = {'clear': 0, 'clearing': 1, 'active': 2}
+SEVERITY_RANK = {'warning': 1, 'danger': 2}
+
+
+def merge_types_into_hazards(apps, schema_editor):
+    """Keep the most current state of the types of each hazard."""
+    AlertState = apps.get_model('notifications', 'AlertState')
+
+    kept = {}
+    for state in AlertState.objects.order_by('pk'):
+        key = (state.station_id, HAZARD_FAMILIES.get(state.hazard, state.hazard))
+        rank = (STATE_RANK.get(state.state, 0), SEVERITY_RANK.get(state.severity, 0),
+                state.notified_at is not None, state.notified_at)
+        if key not in kept or rank > kept[key][0]:
+            kept[key] = (rank, state)
+
+    keep = {state.pk for _, state in kept.values()}
+    AlertState.objects.exclude(pk__in=keep).delete()
+    for (_, hazard), (_, state) in kept.items():
+        if state.hazard != hazard:
+            AlertState.objects.filter(pk=state.pk).update(hazard=hazard)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_alert_states'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='alertstate',
+            old_name='alert_type',
+            new_name='hazard',
+        ),
+        migrations.AlterField(
+            model_name='alertstate',
+            name='hazard',
+            field=models.CharField(help_text='Check raising the alert types', max_length=50),
+        ),
+        migrations.RunPython(merge_types_into_hazards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_alert_state_hazard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a dispatcher took the entry for fan-out', null=True),
+        ),
+    ]
@@ -26,3 +26,95 @@ class DeviceToken(models.Model):
     
     def __str__(self):
         return f"{self.platform} - {self.token[:20]}..."
+
+
+class NotificationOutbox(models.Model):
+    """
+    Alert push waiting for the dispatch_notifications worker.
+
+    Ingest only stores the top alert of a station here, the dispatcher does
+    the device lookup and APNs fan-out, so ingest latency does not depend
+    on the number of subscribers.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    station = models.ForeignKey(Station, on_delete=models.CASCADE,
+                                related_name='outbox_notifications')
+    severity = models.CharField(max_length=10)
+    category = models.CharField(max_length=50)
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True,
+                                      help_text="When a dispatcher took the entry for fan-out")
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'notification_outbox'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.station_id} - {self.title} ({self.status})"
+
+
+class PressureSample(models.Model):
+    """
+    One slot of a station's pressure ring buffer (see
+    notifications.pressure_history), shared by every worker computing
+    pressure rates.
+    """
+    station = models.ForeignKey(Station, on_delete=models.CASCADE,
+                                related_name='pressure_samples')
+    slot = models.SmallIntegerField()
+    timestamp = models.DateTimeField()
+    pressure = models.FloatField()
+
+    class Meta:
+        db_table = 'pressure_history'
+        unique_together = [['station', 'slot']]
+
+    def __str__(self):
+        return f"{self.station_id} - {self.timestamp} - {self.pressure} hPa"
+
+
+class AlertState(models.Model):
+    """
+    Push state of one hazard (AlertAnalyzer.HAZARD_CHECKS entry) at one
+    station, advanced on every snapshot by notifications.cooldown so a
+    lasting condition is not pushed again on each reading.
+    """
+    STATE_CHOICES = [
+        ('active', 'Active'),
+        ('clearing', 'Clearing'),
+        ('clear', 'Clear'),
+    ]
+
+    station = models.ForeignKey(Station, on_delete=models.CASCADE,
+                                related_name='alert_states')
+    hazard = models.CharField(max_length=50, help_text="Check raising the alert types")
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='clear')
+    severity = models.CharField(max_length=10, help_text="Severity of the last push")
+    category = models.CharField(max_length=50)
+    notified_at = models.DateTimeField(null=True, blank=True,
+                                       help_text="Snapshot time of the last push")
+    changed_at = models.DateTimeField(null=True, blank=True,
+                                      help_text="Snapshot time of the last state change")
+
+    class Meta:
+        db_table = 'alert_states'
+        unique_together = [['station', 'hazard']]
+
+    def __str__(self):
+        return f"{self.station_id} - {self.hazard} ({self.state})"
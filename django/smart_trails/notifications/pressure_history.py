@@ -0,0 +1,355 @@
+"""
+Recent pressure readings of each station, for the rate-of-change alerts.
+
+AlertAnalyzer estimates how fast pressure drops from the readings of the
+last PRESSURE_WINDOW. Each station keeps them in a ring buffer of
+PRESSURE_SLOTS slots, one per PRESSURE_WINDOW / PRESSURE_SLOTS of time:
+a reading goes to the slot of its timestamp, replacing the reading of the
+previous lap (or an older one of the same slot), so a station never holds
+more than PRESSURE_SLOTS readings. The rate is the least-squares slope of
+the readings in the window, less sensitive to one noisy reading than the
+difference of the last two.
+
+settings.PRESSURE_HISTORY_BACKEND selects where rings live:
+
+    database    PressureSample rows, shared by every worker and host (default)
+    file        a WAL-mode SQLite file at settings.PRESSURE_HISTORY_PATH,
+                shared by the workers of one host
+    memory      the current process, at most PRESSURE_HISTORY_MAX_STATIONS
+                rings, least recently used evicted first
+
+or is the dotted path of a PressureHistory subclass. A station without
+readings in the window before the current one (a new worker, a restart,
+a station back from an outage, an evicted ring) is seeded from
+AtmosphericReading.
+
+A sample older than PRESSURE_WINDOW holds nothing usable: the memory
+backend drops idle rings, the shared ones delete expired samples of every
+station at most every PRESSURE_EXPIRE_INTERVAL per process, so stations
+that stopped reporting do not stay stored forever.
+"""
+
+import abc
+import math
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from sensors.models import AtmosphericReading
+from sensors.upsert import upsert_rows
+
+from .models import PressureSample
+
+
+# Readings the rate is computed over
+PRESSURE_WINDOW = timedelta(hours=2)
+
+# Slots of the ring buffer of each station, 5 minutes each
+PRESSURE_SLOTS = 24
+
+# Minimum time between the first and last reading of the window for a rate
+PRESSURE_MIN_SPAN = timedelta(minutes=10)
+
+# Time between two deletions of expired samples by one process
+PRESSURE_EXPIRE_INTERVAL = timedelta(minutes=5)
+
+_MICROSECOND = timedelta(microseconds=1)
+_WINDOW = PRESSURE_WINDOW // _MICROSECOND
+_SLOT = _WINDOW // PRESSURE_SLOTS
+_MIN_SPAN = PRESSURE_MIN_SPAN // _MICROSECOND
+_HOUR = timedelta(hours=1) // _MICROSECOND
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def epoch_microseconds(timestamp):
+    """Integer microseconds since the epoch, naive datetimes taken as UTC."""
+    return (timestamp - (_EPOCH_UTC if timestamp.tzinfo else _EPOCH)) // _MICROSECOND
+
+
+def slot_of(microseconds):
+    return microseconds // _SLOT % PRESSURE_SLOTS
+
+
+def ring_put(ring, microseconds, pressure):
+    """Store a reading in a {slot: (microseconds, pressure)} ring, unless its slot holds a newer one."""
+    slot = slot_of(microseconds)
+    if slot not in ring or ring[slot][0] <= microseconds:
+        ring[slot] = (microseconds, pressure)
+
+
+def window(ring, microseconds):
+    """(microseconds, pressure) readings of the window ending at `microseconds`, oldest first."""
+    start = microseconds - _WINDOW
+    return sorted(sample for sample in ring.values() if start < sample[0] <= microseconds)
+
+
+def pressure_slope(samples):
+    """
+    Least-squares slope in hPa/hour of (microseconds, pressure) samples,
+    oldest first. None with fewer than two or spanning under PRESSURE_MIN_SPAN.
+    """
+    if len(samples) < 2 or samples[-1][0] - samples[0][0] < _MIN_SPAN:
+        return None
+    first = samples[0][0]
+    hours = [(t - first) / _HOUR for t, _ in samples]
+    pressures = [pressure for _, pressure in samples]
+    mean_hours = sum(hours) / len(hours)
+    mean_pressure = sum(pressures) / len(pressures)
+    covariance = sum((h - mean_hours) * (p - mean_pressure) for h, p in zip(hours, pressures))
+    variance = sum((h - mean_hours) ** 2 for h in hours)
+    return covariance / variance
+
+
+class PressureHistory(abc.ABC):
+    """
+    Ring buffers of recent pressure readings, keyed by station.
+
+    Subclasses implement load() and save(); record() is what AlertAnalyzer
+    calls for every reading.
+    """
+
+    def __init__(self, seed=True, clock=time.monotonic):
+        # Fill an empty window from AtmosphericReading
+        self.seed = seed
+        self._clock = clock
+        self._next_expiry = clock() + PRESSURE_EXPIRE_INTERVAL.total_seconds()
+
+    @abc.abstractmethod
+    def load(self, station_id):
+        """The station's ring, {slot: (microseconds, pressure)}."""
+
+    @abc.abstractmethod
+    def save(self, station_id, samples):
+        """Store (microseconds, pressure) samples in their slots, a newer reading wins."""
+
+    def expire(self, before):
+        """Delete the stored samples of every station older than `before` microseconds."""
+
+    def stats(self):
+        """Counters of the state kept in this process, None if it keeps none."""
+        return None
+
+    def seed_samples(self, station_id, timestamp):
+        """Stored readings of the window before `timestamp`, oldest first."""
+        readings = (
+            AtmosphericReading.objects
+            .filter(station_id=station_id, pressure__isnull=False,
+                    timestamp__gt=timestamp - PRESSURE_WINDOW, timestamp__lt=timestamp)
+            .order_by('timestamp')
+            .values_list('timestamp', 'pressure')
+        )
+        return [(epoch_microseconds(t), pressure) for t, pressure in readings]
+
+    def record(self, station_id, pressure, timestamp):
+        """
+        Add a reading, return the (microseconds, pressure) readings of the
+        window ending at it, oldest first.
+        """
+        now = epoch_microseconds(timestamp)
+        ring = self.load(station_id)
+        samples = [(now, pressure)]
+        if self.seed and not any(now - _WINDOW < t < now for t, _ in ring.values()):
+            samples = self.seed_samples(station_id, timestamp) + samples
+
+        for sample in samples:
+            ring_put(ring, *sample)
+        self.save(station_id, samples)
+
+        clock = self._clock()
+        if clock >= self._next_expiry:
+            self._next_expiry = clock + PRESSURE_EXPIRE_INTERVAL.total_seconds()
+            self.expire(now - _WINDOW)
+        return window(ring, now)
+
+
+class _CompactRing:
+    """A station's ring as two fixed arrays, NaN pressure marking an empty slot."""
+
+    __slots__ = ('timestamps', 'pressures', 'touched')
+
+    def __init__(self):
+        self.timestamps = array('q', bytes(8 * PRESSURE_SLOTS))
+        self.pressures = array('d', [math.nan]) * PRESSURE_SLOTS
+        self.touched = 0.0
+
+    def put(self, microseconds, pressure):
+        slot = slot_of(microseconds)
+        if math.isnan(self.pressures[slot]) or self.timestamps[slot] <= microseconds:
+            self.timestamps[slot] = microseconds
+            self.pressures[slot] = pressure
+
+    def as_dict(self):
+        return {
+            slot: (self.timestamps[slot], self.pressures[slot])
+            for slot in range(PRESSURE_SLOTS) if not math.isnan(self.pressures[slot])
+        }
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.timestamps) + sys.getsizeof(self.pressures)
+
+
+class MemoryPressureHistory(PressureHistory):
+    """
+    Rings private to the process, in an LRU of at most `max_stations`
+    (settings.PRESSURE_HISTORY_MAX_STATIONS) where a ring not written for
+    PRESSURE_WINDOW expires, so readings from any number of station ids
+    cannot grow the worker.
+    """
+
+    def __init__(self, seed=True, max_stations=None, clock=time.monotonic):
+        super().__init__(seed, clock)
+        self.max_stations = max_stations or settings.PRESSURE_HISTORY_MAX_STATIONS
+        self._ttl = PRESSURE_WINDOW.total_seconds()
+        # Least recently written first
+        self._rings = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def _expire(self, now):
+        while self._rings:
+            ring = next(iter(self._rings.values()))
+            if now - ring.touched < self._ttl:
+                break
+            self._rings.popitem(last=False)
+            self.expired += 1
+
+    def load(self, station_id):
+        with self._lock:
+            self._expire(self._clock())
+            ring = self._rings.get(station_id)
+            return ring.as_dict() if ring is not None else {}
+
+    def save(self, station_id, samples):
+        with self._lock:
+            ring = self._rings.get(station_id)
+            if ring is None:
+                ring = self._rings[station_id] = _CompactRing()
+            for sample in samples:
+                ring.put(*sample)
+            ring.touched = self._clock()
+            self._rings.move_to_end(station_id)
+
+            while len(self._rings) > self.max_stations:
+                self._rings.popitem(last=False)
+                self.evicted += 1
+
+    def stats(self):
+        """
+        entries: stations with a ring; evicted: rings dropped for the size
+        cap; expired: rings dropped after PRESSURE_WINDOW idle; bytes:
+        approximate memory of the rings and their index.
+        """
+        with self._lock:
+            self._expire(self._clock())
+            size = sys.getsizeof(self._rings) + sum(
+                sys.getsizeof(station_id) + ring.nbytes() for station_id, ring in self._rings.items())
+            return {
+                'entries': len(self._rings),
+                'evicted': self.evicted,
+                'expired': self.expired,
+                'bytes': size,
+            }
+
+
+class FilePressureHistory(PressureHistory):
+    """Rings in a local SQLite file, shared by the processes of one host."""
+
+    def __init__(self, path=None, seed=True, clock=time.monotonic):
+        super().__init__(seed, clock)
+        self._path = path
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        return str(self._path or settings.PRESSURE_HISTORY_PATH)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.path != self.path:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pressure_history ('
+                ' station_id TEXT NOT NULL,'
+                ' slot INTEGER NOT NULL,'
+                ' timestamp INTEGER NOT NULL,'
+                ' pressure REAL NOT NULL,'
+                ' PRIMARY KEY (station_id, slot))'
+            )
+            self._local.conn = conn
+            self._local.path = self.path
+        return conn
+
+    def load(self, station_id):
+        rows = self._connection().execute(
+            'SELECT slot, timestamp, pressure FROM pressure_history WHERE station_id = ?',
+            (station_id,),
+        )
+        return {slot: (t, pressure) for slot, t, pressure in rows}
+
+    def save(self, station_id, samples):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO pressure_history (station_id, slot, timestamp, pressure) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (station_id, slot) DO UPDATE SET '
+                'timestamp = excluded.timestamp, pressure = excluded.pressure '
+                'WHERE excluded.timestamp >= pressure_history.timestamp',
+                [(station_id, slot_of(t), t, pressure) for t, pressure in samples],
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def expire(self, before):
+        self._connection().execute('DELETE FROM pressure_history WHERE timestamp < ?', (before,))
+
+
+class DatabasePressureHistory(PressureHistory):
+    """Rings in the PressureSample table, shared by every worker."""
+
+    def load(self, station_id):
+        rows = PressureSample.objects.filter(station_id=station_id).values_list(
+            'slot', 'timestamp', 'pressure')
+        return {slot: (epoch_microseconds(t), pressure) for slot, t, pressure in rows}
+
+    def save(self, station_id, samples):
+        ring = {}
+        for sample in samples:
+            ring_put(ring, *sample)
+        # A worker saving late keeps the newer samples of the others
+        upsert_rows(PressureSample, [
+            PressureSample(station_id=station_id, slot=slot,
+                           timestamp=_EPOCH_UTC + t * _MICROSECOND, pressure=pressure)
+            for slot, (t, pressure) in ring.items()
+        ], ['station', 'slot'], newer_field='timestamp')
+
+    def expire(self, before):
+        PressureSample.objects.filter(timestamp__lt=_EPOCH_UTC + before * _MICROSECOND).delete()
+
+
+PRESSURE_HISTORY_BACKENDS = {
+    'database': DatabasePressureHistory,
+    'file': FilePressureHistory,
+    'memory': MemoryPressureHistory,
+}
+
+
+def configured_pressure_history():
+    """The PressureHistory of settings.PRESSURE_HISTORY_BACKEND."""
+    backend = settings.PRESSURE_HISTORY_BACKEND
+    backend_class = PRESSURE_HISTORY_BACKENDS.get(backend) or import_string(backend)
+    return backend_class()
@@ -1,6 +1,34 @@
+import asyncio
+import os
+import random
+import tempfile
 import unittest
-from datetime import datetime, timedelta
-from notifications.alert_system import AlertAnalyzer, Alert
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.ingest import process_alerts, store_batch
+from notifications.alert_system import AlertAnalyzer, Alert, BatchAnalysis
+from notifications.backtest import parse_thresholds, replay
+from notifications.cooldown import ALL_CLEAR_AFTER, COOLDOWNS, advance
+from notifications.apns_service import APNsService, SendResult
+from notifications.dispatcher import SENDING_LEASE, dispatch_pending, enqueue_alert, recover_interrupted
+from notifications.models import AlertState, DeviceToken, NotificationOutbox, PressureSample
+from notifications.pressure_history import (
+    PRESSURE_EXPIRE_INTERVAL, PRESSURE_SLOTS, PRESSURE_WINDOW, DatabasePressureHistory,
+    FilePressureHistory, MemoryPressureHistory, configured_pressure_history, epoch_microseconds,
+    pressure_slope,
+)
+from sensors.models import AtmosphericReading
+from stations.models import Station
 
 
 def make_sensor_data(
@@ -221,8 +249,8 @@ class TestAlertAnalyzerStatefulLogic(unittest.TestCase):
         self.assertIsNone(rate)
 
         # Verify history was stored
-        self.assertIn('new-station', self.analyzer._pressure_history)
-        self.assertEqual(self.analyzer._pressure_history['new-station'][0], 830.0)
+        stored, = self.analyzer.pressure_history.load('new-station').values()
+        self.assertEqual(stored[1], 830.0)
 
         # Full analyze() should not produce pressure rate alerts on first reading
         data = make_sensor_data(pressure=830.0)
@@ -359,5 +387,643 @@ class TestAlertAnalyzerStructural(unittest.TestCase):
         self.assertEqual(len(result), 0)
 
 
+# Columns of analyze_batch -> make_sensor_data argument
+BATCH_COLUMNS = {
+    'temperature': 'temp', 'humidity': 'humidity', 'pressure': 'pressure',
+    'uv_index': 'uv', 'lux': 'lux', 'co2_ppm': 'co2', 'moisture_percent': 'moisture',
+    'is_raining': 'is_raining', 'rain_detected_last_hour': 'rain_last_hour',
+    'motion_count': 'motion',
+}
+
+
+def random_rows(count, seed=0):
+    """Sensor rows around every threshold, with missing values."""
+    rng = random.Random(seed)
+
+    def pick(values, missing=None):
+        value = rng.choice(values)
+        if isinstance(value, float):
+            value = round(value + rng.choice([-0.01, 0, 0, 0.01]), 2)
+        return missing if rng.random() < 0.1 else value
+
+    rows = []
+    for _ in range(count):
+        rows.append({
+            'temperature': pick([-10.0, 0.0, 5.0, 10.0, 18.0, 25.0, 30.0, 35.0, rng.uniform(-25, 45)]),
+            'humidity': pick([0.0, 50.0, 90.0, rng.uniform(0, 100)]),
+            'pressure': pick([845.0, 855.0, 870.0, rng.uniform(830, 880)]),
+            'uv_index': pick([6.0, 8.0, 11.0, rng.uniform(0, 14)]),
+            'lux': pick([10.0, 100.0, rng.uniform(0, 200)]),
+            'co2_ppm': pick([400, 1000, 1500, 2500, 5000, 30000, 40000, rng.randrange(45000)]),
+            'moisture_percent': pick([60.0, 80.0, rng.uniform(0, 100)]),
+            'is_raining': rng.random() < 0.3,
+            'rain_detected_last_hour': rng.random() < 0.3,
+            'motion_count': pick([15, 16, 30, 31, rng.randrange(60)], missing=0),
+        })
+    return rows
+
+
+def batch_columns(rows):
+    return {column: [row[column] for row in rows] for column in BATCH_COLUMNS}
+
+
+def snapshot(row):
+    return make_sensor_data(**{BATCH_COLUMNS[column]: value for column, value in row.items()})
+
+
+class TestAlertAnalyzerBatch(unittest.TestCase):
+    """analyze_batch must agree exactly with analyze on every row."""
+
+    def setUp(self):
+        self.analyzer = AlertAnalyzer()
+
+    def assert_matches_scalar(self, rows, result, station_id=None, timestamps=None, scalar=None):
+        scalar = scalar or AlertAnalyzer()
+        for i, row in enumerate(rows):
+            timestamp = timestamps[i] if timestamps else None
+            hazards = scalar._detect_hazards(snapshot(row), station_id, timestamp)
+            alerts = [scalar._build_alert(h, 'Test') for h in hazards]
+            top = scalar.get_highest_severity_alert(alerts)
+
+            self.assertEqual(result.hazard_types(i), [h['type'] for h in hazards], row)
+            self.assertEqual(result.severity[i], AlertAnalyzer.SEVERITY_CODES[top.severity] if top else 0, row)
+            self.assertEqual(result.top_hazard[i],
+                             AlertAnalyzer.HAZARD_TYPES.index(hazards[alerts.index(top)]['type']) if top else -1)
+
+    def test_batch_matches_scalar_path(self):
+        rows = random_rows(3000)
+        result = self.analyzer.analyze_batch(**batch_columns(rows))
+
+        self.assertIsInstance(result, BatchAnalysis)
+        self.assertEqual(result.hazards.shape, (3000, len(AlertAnalyzer.HAZARD_CHECKS)))
+        self.assert_matches_scalar(rows, result)
+        # Each column holds the types of its check
+        for hazards in result.hazards.tolist():
+            for check, code in zip(AlertAnalyzer.HAZARD_CHECKS, hazards):
+                if code >= 0:
+                    self.assertEqual(AlertAnalyzer.HAZARD_FAMILIES[AlertAnalyzer.HAZARD_TYPES[code]], check)
+        # Every hazard type of the thresholds above is reached
+        seen = {t for i in range(len(rows)) for t in result.hazard_types(i)}
+        self.assertEqual(seen, set(AlertAnalyzer.HAZARD_TYPES) - {
+            'pressure_dropping_fast', 'pressure_dropping_very_fast'})
+
+    def test_batch_accepts_numpy_arrays_with_nan(self):
+        rows = random_rows(500, seed=1)
+        columns = batch_columns(rows)
+        arrays = {
+            column: np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            for column, values in columns.items()
+        }
+        arrays['is_raining'] = np.array(columns['is_raining'])
+        arrays['rain_detected_last_hour'] = np.array(columns['rain_detected_last_hour'])
+
+        from_arrays = self.analyzer.analyze_batch(**arrays)
+        from_lists = self.analyzer.analyze_batch(**columns)
+
+        np.testing.assert_array_equal(from_arrays.hazards, from_lists.hazards)
+        np.testing.assert_array_equal(from_arrays.severity, from_lists.severity)
+
+    def test_batch_pressure_rates_are_bit_identical(self):
+        rng = random.Random(2)
+        t0 = datetime(2026, 1, 1, 12, 0, 0)
+        rows, timestamps = [], []
+        for i in range(2000):
+            # Gaps below 10 minutes, in range and over 2 hours
+            t0 += timedelta(seconds=rng.choice([120, 600, 900, 1800, 3600, 9000]) + rng.randrange(60))
+            row = random_rows(1, seed=i)[0]
+            row['pressure'] = None if rng.random() < 0.05 else round(rng.uniform(840, 880), 2)
+            rows.append(row)
+            timestamps.append(t0)
+
+        result = self.analyzer.analyze_batch(**batch_columns(rows), timestamps=timestamps)
+
+        scalar = AlertAnalyzer()
+        for i, row in enumerate(rows):
+            if row['pressure'] is None:
+                self.assertTrue(np.isnan(result.pressure_rate[i]))
+                continue
+            rate = scalar._get_pressure_rate('station', row['pressure'], timestamps[i])
+            if rate is None:
+                self.assertTrue(np.isnan(result.pressure_rate[i]))
+            else:
+                self.assertEqual(result.pressure_rate[i].item().hex(), rate.hex())
+
+        self.assert_matches_scalar(rows, result, 'station', timestamps)
+        datetime64 = self.analyzer.analyze_batch(
+            **batch_columns(rows), timestamps=np.array(timestamps, dtype='datetime64[us]'))
+        np.testing.assert_array_equal(datetime64.pressure_rate, result.pressure_rate)
+        # The live pressure history is left alone
+        self.assertEqual(self.analyzer.pressure_history.load('station'), {})
+
+        # Replayed in chunks, the history carries over
+        history = None
+        rates = []
+        for start in range(0, len(rows), 300):
+            chunk = self.analyzer.analyze_batch(**batch_columns(rows[start:start + 300]),
+                                                timestamps=timestamps[start:start + 300],
+                                                pressure_history=history)
+            history = chunk.pressure_history
+            rates.append(chunk.pressure_rate)
+        np.testing.assert_array_equal(np.concatenate(rates), result.pressure_rate)
+
+    def test_batch_on_existing_scenarios(self):
+        scenarios = [
+            {'temperature': -15.0}, {'temperature': 36.0}, {'pressure': 840.0},
+            {'is_raining': True}, {'uv_index': 12.0}, {'co2_ppm': 50000},
+            {'lux': 5, 'humidity': 95.0}, {'moisture_percent': 90.0},
+            {'temperature': 2.0, 'rain_detected_last_hour': True},
+            {'temperature': 18.0, 'humidity': 50.0, 'pressure': 870.0},
+        ]
+        rows = [{**{column: None for column in BATCH_COLUMNS},
+                 'is_raining': False, 'rain_detected_last_hour': False, 'motion_count': 0, **scenario}
+                for scenario in scenarios]
+
+        result = self.analyzer.analyze_batch(**batch_columns(rows))
+
+        self.assert_matches_scalar(rows, result)
+        self.assertEqual(result.hazard_types(0), ['severe_cold'])
+        self.assertEqual(result.severity[-1], 0)
+
+    def test_batch_matches_scalar_with_overridden_thresholds(self):
+        analyzer = AlertAnalyzer()
+        analyzer.LUX_DARK = 10
+        analyzer.LUX_VERY_DARK = 100
+        rows = random_rows(1000, seed=1)
+
+        result = analyzer.analyze_batch(**batch_columns(rows))
+
+        self.assert_matches_scalar(rows, result, scalar=analyzer)
+
+    def test_batch_column_lengths_must_match(self):
+        with self.assertRaises(ValueError):
+            self.analyzer.analyze_batch(temperature=[1.0, 2.0], humidity=[50.0])
+
+        empty = self.analyzer.analyze_batch()
+        self.assertEqual(empty.hazards.shape, (0, len(AlertAnalyzer.HAZARD_CHECKS)))
+        self.assertEqual(len(empty.severity), 0)
+
+
+class TestAlertBacktest(TestCase):
+    """A replay of stored readings must count what analyze() would have raised."""
+
+    def setUp(self):
+        self.station = Station.objects.create(
+            station_id='test-station', name='Test Station',
+            latitude=45.5615, longitude=8.0573, altitude=1250,
+        )
+        rng = random.Random(3)
+        self.snapshots = []
+        timestamp = datetime(2026, 1, 1, 20, 0, tzinfo=dt_timezone.utc)
+        for i, row in enumerate(random_rows(120, seed=3)):
+            timestamp += timedelta(minutes=rng.choice([5, 20, 20, 40]))
+            # Lux is stored with one decimal
+            row['lux'] = None if row['lux'] is None else round(row['lux'], 1)
+            sensors = snapshot(row)
+            # Stations without every sensor board
+            for section in list(sensors):
+                if rng.random() < 0.15:
+                    del sensors[section]
+            self.snapshots.append((timestamp, sensors))
+        store_batch(self.station, [(t, {'sensors': sensors}) for t, sensors in self.snapshots])
+
+    def expected(self, thresholds=None):
+        analyzer = AlertAnalyzer()
+        for name, value in (thresholds or {}).items():
+            setattr(analyzer, name, value)
+        alerts, pushes, per_day = {}, {}, {}
+        states = {}
+        for timestamp, sensors in self.snapshots:
+            built = analyzer.analyze(sensors, 'Test', 'test-station', timestamp)
+            for alert in built:
+                alerts[alert.alert_type] = alerts.get(alert.alert_type, 0) + 1
+            actionable = [a for a in built if a.severity in ('danger', 'warning')]
+            push, all_clear, _ = advance(states, actionable, timestamp, 'test-station')
+            if push or all_clear:
+                pushed = analyzer.get_highest_severity_alert(push).alert_type if push else 'all_clear'
+                pushes[pushed] = pushes.get(pushed, 0) + 1
+                day = timezone.localdate(timestamp).isoformat()
+                per_day[day] = per_day.get(day, 0) + 1
+        return alerts, pushes, per_day
+
+    def test_replay_matches_scalar_analysis(self):
+        report = replay('test-station', chunk_size=7)
+
+        alerts, pushes, per_day = self.expected()
+        self.assertEqual(report['snapshots'], len(self.snapshots))
+        self.assertEqual(report['baseline']['alerts'], alerts)
+        self.assertEqual(report['baseline']['pushes'], pushes)
+        self.assertEqual(report['baseline']['pushes_per_day'], per_day)
+        self.assertEqual(report['candidate'], report['baseline'])
+        self.assertEqual(report['diff'], {'alerts': {}, 'pushes': {}, 'pushes_per_day': {}})
+
+    def test_candidate_thresholds_diff(self):
+        thresholds = {'LUX_DARK': 150.0, 'TEMP_HYPOTHERMIA_WET': 12.0}
+        report = replay('test-station', thresholds=thresholds, baseline={'CO2_DANGEROUS': 1000.0})
+
+        baseline = self.expected({'CO2_DANGEROUS': 1000.0})
+        candidate = self.expected({'CO2_DANGEROUS': 1000.0, **thresholds})
+        self.assertEqual(report['baseline']['alerts'], baseline[0])
+        self.assertEqual(report['candidate']['alerts'], candidate[0])
+        self.assertEqual(report['candidate']['pushes'], candidate[1])
+        for hazard_type in set(baseline[0]) | set(candidate[0]):
+            change = candidate[0].get(hazard_type, 0) - baseline[0].get(hazard_type, 0)
+            self.assertEqual(report['diff']['alerts'].get(hazard_type, 0), change)
+        self.assertGreater(report['diff']['alerts']['visibility_poor'], 0)
+
+    def test_replay_range(self):
+        start, end = self.snapshots[10][0], self.snapshots[30][0]
+
+        report = replay('test-station', start, end)
+
+        self.assertEqual(report['snapshots'], 20)
+        self.assertEqual(report['start'], start.isoformat())
+        self.assertEqual(replay('other-station')['snapshots'], 0)
+
+    def test_parse_thresholds(self):
+        self.assertEqual(parse_thresholds(['lux_dark=120', 'UV_HIGH=7, UV_EXTREME=10']),
+                         {'LUX_DARK': 120.0, 'UV_HIGH': 7.0, 'UV_EXTREME': 10.0})
+        with self.assertRaisesRegex(ValueError, 'Unknown threshold'):
+            parse_thresholds(['ALERT_MESSAGES=1'])
+        with self.assertRaisesRegex(ValueError, 'must be a number'):
+            parse_thresholds(['LUX_DARK=dark'])
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('backtest_alerts', 'test-station', '--set', 'LUX_DARK=150', stdout=out)
+        self.assertIn(f'{len(self.snapshots)} snapshots replayed', out.getvalue())
+        self.assertIn('visibility_poor', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('backtest_alerts', 'test-station', '--set', 'BOGUS=1', stdout=StringIO())
+
+
+class TestPressureHistory(TestCase):
+    """Pressure rings shared between workers, seeded from stored readings."""
+
+    def setUp(self):
+        self.station = Station.objects.create(
+            station_id='test-station', name='Test Station',
+            latitude=45.5615, longitude=8.0573, altitude=1250,
+        )
+        self.t0 = datetime(2026, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def at(self, minutes):
+        return self.t0 + timedelta(minutes=minutes)
+
+    def test_least_squares_slope(self):
+        samples = [(epoch_microseconds(self.at(m)), 870.0 - m / 10) for m in range(0, 61, 15)]
+        self.assertAlmostEqual(pressure_slope(samples), -6.0)
+
+        # One noisy reading moves the slope far less than a two-point rate
+        samples[-1] = (samples[-1][0], samples[-1][1] - 3)
+        self.assertAlmostEqual(pressure_slope(samples), -8.4)
+        self.assertIsNone(pressure_slope(samples[:1]))
+        self.assertIsNone(pressure_slope([samples[0], (samples[0][0] + 5 * 60 * 10**6, 860.0)]))
+
+    def test_ring_is_bounded_to_the_window(self):
+        history = MemoryPressureHistory(seed=False)
+        for minutes in range(0, 600, 5):
+            samples = history.record('test-station', 870.0 - minutes / 60, self.at(minutes))
+
+        self.assertEqual(len(history.load('test-station')), PRESSURE_SLOTS)
+        self.assertEqual(len(samples), PRESSURE_SLOTS)
+        self.assertEqual(samples[0][0], epoch_microseconds(self.at(480)))
+        self.assertAlmostEqual(pressure_slope(samples), -1.0)
+
+        # A late reading does not evict the newer one of its slot
+        history.record('test-station', 800.0, self.at(470))
+        self.assertNotIn(800.0, [p for _, p in history.load('test-station').values()])
+
+    def test_late_save_keeps_newer_stored_samples(self):
+        history = DatabasePressureHistory()
+        history.save('test-station', [(epoch_microseconds(self.at(60)), 865.0)])
+
+        # Same slot, one window earlier, written by a worker that was behind
+        with CaptureQueriesContext(connection) as ctx:
+            history.save('test-station', [(epoch_microseconds(self.at(60) - PRESSURE_WINDOW), 870.0)])
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(list(history.load('test-station').values()),
+                         [(epoch_microseconds(self.at(60)), 865.0)])
+
+    def test_history_is_shared_between_workers(self):
+        for backend in (DatabasePressureHistory, lambda: FilePressureHistory(self.path)):
+            worker_a, worker_b = AlertAnalyzer(backend()), AlertAnalyzer(backend())
+
+            worker_a.analyze(make_sensor_data(pressure=870.0), 'Test', 'test-station', self.at(0))
+            alerts = worker_b.analyze(make_sensor_data(pressure=866.0), 'Test', 'test-station', self.at(30))
+
+            self.assertIn('⛈️ SEVERE WEATHER IMMINENT', [a.title for a in alerts])
+            self.assertAlmostEqual(worker_a._get_pressure_rate('test-station', 865.0, self.at(60)), -5.0)
+            PressureSample.objects.all().delete()
+
+        self.assertEqual(PressureSample.objects.count(), 0)
+        self.assertEqual(len(FilePressureHistory(self.path).load('test-station')), 3)
+
+    def test_cold_start_is_seeded_from_readings(self):
+        for minutes, pressure in [(-150, 800.0), (-90, 872.0), (-60, 871.0), (-30, 870.0)]:
+            AtmosphericReading.objects.create(station=self.station, timestamp=self.at(minutes),
+                                              pressure=pressure)
+
+        for history in (DatabasePressureHistory(), FilePressureHistory(self.path), MemoryPressureHistory()):
+            samples = history.record('test-station', 869.0, self.at(0))
+
+            # The reading older than the window is left out
+            self.assertEqual([p for _, p in samples], [872.0, 871.0, 870.0, 869.0])
+            self.assertAlmostEqual(pressure_slope(samples), -2.0)
+
+            with self.assertNumQueries(0 if not isinstance(history, DatabasePressureHistory) else 2):
+                history.record('test-station', 868.0, self.at(10))
+
+    def test_shared_backends_expire_stale_stations(self):
+        Station.objects.create(station_id='gone-station', name='Gone', latitude=45.5,
+                               longitude=8.0, altitude=1250)
+        clock = mock.Mock(return_value=0.0)
+
+        for history in (DatabasePressureHistory(seed=False, clock=clock),
+                        FilePressureHistory(self.path, seed=False, clock=clock)):
+            clock.return_value = 0.0
+            history.record('gone-station', 870.0, self.at(0))
+            history.record('test-station', 870.0, self.at(0))
+            history.record('test-station', 869.0, self.at(150))
+            # Not before the interval since the last sweep
+            self.assertEqual(len(history.load('gone-station')), 1)
+
+            clock.return_value = PRESSURE_EXPIRE_INTERVAL.total_seconds()
+            history.record('test-station', 868.0, self.at(155))
+
+            self.assertEqual(history.load('gone-station'), {})
+            self.assertEqual([p for _, p in history.load('test-station').values()], [869.0, 868.0])
+
+    def test_memory_state_is_bounded(self):
+        clock = mock.Mock(return_value=0.0)
+        history = MemoryPressureHistory(seed=False, max_stations=3, clock=clock)
+
+        for i in range(10):
+            history.record(f'station-{i}', 870.0, self.at(0))
+        history.record('station-7', 869.0, self.at(15))  # Most recently used again
+        history.record('station-10', 870.0, self.at(15))
+
+        stats = history.stats()
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['evicted'], 8)
+        self.assertEqual(history.load('station-0'), {})
+        self.assertEqual(len(history.load('station-7')), 2)
+        self.assertEqual(history.load('station-8'), {})
+
+        # Idle for the whole window, the rings hold nothing usable
+        clock.return_value = 1800.0
+        history.record('station-9', 868.0, self.at(30))
+        clock.return_value = 7200.0
+        self.assertEqual(history.stats()['entries'], 1)
+        self.assertEqual(history.stats()['expired'], 2)
+        clock.return_value = 9000.0
+        stats = history.stats()
+        self.assertEqual((stats['entries'], stats['expired']), (0, 3))
+
+    def test_memory_footprint_does_not_grow_with_readings(self):
+        history = MemoryPressureHistory(seed=False, max_stations=50)
+        for i in range(50):
+            history.record(f'station-{i:02}', 870.0, self.at(0))
+        full = history.stats()['bytes']
+        for minutes in range(5, 600, 5):
+            for i in range(60):
+                history.record(f'station-{i:02}', 870.0 - minutes / 100, self.at(minutes))
+
+        self.assertEqual(history.stats()['entries'], 50)
+        self.assertLess(history.stats()['bytes'], 2 * full)
+        self.assertLess(full / 50, 1024)
+
+    def test_configured_backend(self):
+        self.assertIsInstance(configured_pressure_history(), DatabasePressureHistory)
+        with override_settings(PRESSURE_HISTORY_BACKEND='file', PRESSURE_HISTORY_PATH=self.path):
+            history = configured_pressure_history()
+            self.assertIsInstance(history, FilePressureHistory)
+            self.assertEqual(history.path, self.path)
+        with override_settings(
+                PRESSURE_HISTORY_BACKEND='notifications.pressure_history.MemoryPressureHistory'):
+            self.assertIsInstance(configured_pressure_history(), MemoryPressureHistory)
+        # A backend missing load() or save() fails when it is configured, not on the first reading
+        with override_settings(PRESSURE_HISTORY_BACKEND='notifications.pressure_history.PressureHistory'):
+            with self.assertRaises(TypeError):
+                configured_pressure_history()
+
+
+class TestAlertCooldown(TestCase):
+    """Per station and hazard push cooldowns, escalation and all clear."""
+
+    def setUp(self):
+        self.station = Station.objects.create(
+            station_id='test-station', name='Test', latitude=45.5, longitude=8.0, altitude=1250,
+        )
+        self.t0 = datetime(2026, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def at(self, minutes):
+        return self.t0 + timedelta(minutes=minutes)
+
+    def advance(self, states, minutes, **sensors):
+        """advance() over what the analyzer raises for the sensors, returns the pushed types."""
+        alerts = [a for a in AlertAnalyzer().analyze(make_sensor_data(**sensors))
+                  if a.severity in ('danger', 'warning')]
+        push, all_clear, _ = advance(states, alerts, self.at(minutes), 'test-station')
+        return [a.alert_type for a in push], all_clear
+
+    def post(self, minutes, sensors):
+        _, queued = process_alerts(self.station, sensors, self.at(minutes))
+        return NotificationOutbox.objects.order_by('-pk').first().title if queued else None
+
+    def test_six_hour_storm_is_not_pushed_every_reading(self):
+        storm = make_sensor_data(temp=5.0, is_raining=True)
+        pushes = [(minutes, self.post(minutes, storm)) for minutes in range(0, 360, 15)]
+
+        pushed = [(minutes, title) for minutes, title in pushes if title]
+        danger = COOLDOWNS['danger'] // timedelta(minutes=1)
+        self.assertEqual(pushed, [(m, '🥶 Hypothermia Risk') for m in range(0, 360, danger)])
+
+        # Over: one all clear once it stayed away long enough, then silence
+        clear = ALL_CLEAR_AFTER // timedelta(minutes=1)
+        quiet = make_sensor_data(temp=15.0)
+        titles = [self.post(minutes, quiet) for minutes in range(360, 360 + clear + 60, 15)]
+        self.assertEqual([t for t in titles if t], ['✅ All Clear'])
+        self.assertEqual(titles.index('✅ All Clear'), clear // 15)
+        self.assertEqual(set(AlertState.objects.values_list('state', flat=True)), {'clear'})
+
+        # The next storm is news again
+        self.assertEqual(self.post(600, storm), '🥶 Hypothermia Risk')
+
+    def test_repeated_conditions_skip_outbox_and_devices(self):
+        storm = make_sensor_data(temp=5.0, is_raining=True)
+        self.post(0, storm)
+
+        with CaptureQueriesContext(connection) as ctx:
+            _, queued = process_alerts(self.station, storm, self.at(15))
+
+        self.assertFalse(queued)
+        statements = [q['sql'] for q in ctx.captured_queries]
+        self.assertFalse([sql for sql in statements if 'notification_outbox' in sql or 'device_tokens' in sql])
+        self.assertFalse([sql for sql in statements if 'alert_states' in sql and not sql.startswith('SELECT')])
+
+    def test_blink_does_not_push_or_clear(self):
+        states = {}
+        self.assertEqual(self.advance(states, 0, temp=-5.0), (['freezing'], None))
+
+        self.assertEqual(self.advance(states, 15, temp=15.0), ([], None))
+        self.assertEqual(states['thermal'].state, 'clearing')
+        self.assertEqual(self.advance(states, 30, temp=-5.0), ([], None))
+        self.assertEqual(states['thermal'].state, 'active')
+
+    def test_severity_change_stays_one_hazard(self):
+        states = {}
+        self.assertEqual(self.advance(states, 0, temp=-15.0), (['severe_cold'], None))
+
+        # Milder is the same cold, not a new alert
+        self.assertEqual(self.advance(states, 15, temp=-5.0), ([], None))
+        self.assertEqual(self.advance(states, 30, pressure=840.0), (['pressure_severe'], None))
+        self.assertEqual(self.advance(states, 45, pressure=850.0), ([], None))
+        self.assertEqual(list(states), ['thermal', 'pressure'])
+        self.assertEqual(states['thermal'].severity, 'danger')
+
+    def test_escalation_bypasses_cooldown(self):
+        states = {}
+        self.assertEqual(self.advance(states, 0, temp=-5.0, uv=9.0), (['freezing', 'uv_very_high'], None))
+
+        self.assertEqual(self.advance(states, 15, temp=-15.0, uv=9.0), (['severe_cold'], None))
+        self.assertEqual(self.advance(states, 30, temp=-15.0, uv=12.0), (['uv_extreme'], None))
+        # Back down and up again within the danger cooldown is no news
+        self.assertEqual(self.advance(states, 45, temp=-5.0, uv=9.0), ([], None))
+        self.assertEqual(self.advance(states, 60, temp=-15.0, uv=12.0), ([], None))
+        self.assertEqual({h: s.severity for h, s in states.items()}, {'thermal': 'danger', 'uv': 'danger'})
+
+    def test_all_clear_waits_for_every_hazard(self):
+        states = {}
+        self.advance(states, 0, temp=-15.0, uv=9.0)
+        self.advance(states, 15, temp=15.0, uv=9.0)
+
+        self.assertEqual(self.advance(states, 75, temp=15.0, uv=9.0), ([], None))
+        self.assertEqual(states['thermal'].state, 'clear')
+        self.advance(states, 90, temp=15.0)
+        _, all_clear = self.advance(states, 150, temp=15.0)
+        self.assertEqual(all_clear.hazard, 'uv')
+
+    def test_state_survives_restart(self):
+        storm = make_sensor_data(temp=5.0, is_raining=True)
+        self.post(0, storm)
+
+        state = AlertState.objects.get(hazard='thermal')
+        self.assertEqual((state.state, state.severity, state.notified_at), ('active', 'danger', self.at(0)))
+        # A fresh worker reads the stored states
+        self.assertIsNone(self.post(30, storm))
+
+
+class TestNotificationOutbox(TestCase):
+    """Outbox queueing at ingest time and fan-out in the dispatcher."""
+
+    def setUp(self):
+        self.station = Station.objects.create(
+            station_id='test-station', name='Test', latitude=45.5, longitude=8.0, altitude=1250,
+        )
+        self.other = Station.objects.create(
+            station_id='other-station', name='Other', latitude=45.5, longitude=8.0, altitude=1250,
+        )
+
+    def make_alert(self, title='Storm Watch', severity='warning'):
+        return Alert(severity=severity, title=title, body='body', emoji='', category='weather')
+
+    def test_newer_alert_replaces_pending_entry(self):
+        enqueue_alert(self.station, self.make_alert('Storm Watch'))
+        enqueue_alert(self.station, self.make_alert('Storm Incoming', 'danger'))
+
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(entry.title, 'Storm Incoming')
+        self.assertEqual(entry.severity, 'danger')
+
+    @mock.patch('notifications.dispatcher.apns_service.send_many')
+    def test_dispatch_reaches_station_and_global_subscribers(self, send_many):
+        send_many.side_effect = lambda notifications: [
+            SendResult(n['device_token'], n['device_token'] != 'b', description=(
+                None if n['device_token'] != 'b' else 'Unregistered'
+            ))
+            for n in notifications
+        ]
+        DeviceToken.objects.create(token='a', platform='ios', bundle_id='b', station=self.station)
+        DeviceToken.objects.create(token='b', platform='ios', bundle_id='b', station=None)
+        DeviceToken.objects.create(token='c', platform='ios', bundle_id='b', station=self.other)
+        DeviceToken.objects.create(token='d', platform='ios', bundle_id='b', is_active=False)
+        enqueue_alert(self.station, self.make_alert())
+
+        self.assertEqual(dispatch_pending(), 1)
+
+        self.assertEqual(send_many.call_count, 1)
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(entry.status, 'sent')
+        self.assertEqual((entry.sent_count, entry.failed_count), (1, 1))
+        # Unregistered token is switched off for future alerts
+        self.assertFalse(DeviceToken.objects.get(token='b').is_active)
+        self.assertEqual(dispatch_pending(), 0)
+
+
+    @unittest.skipUnless(connection.features.has_select_for_update, 'needs SELECT ... FOR UPDATE')
+    def test_enqueue_locks_the_station(self):
+        with CaptureQueriesContext(connection) as ctx:
+            enqueue_alert(self.station, self.make_alert())
+
+        statements = [q['sql'] for q in ctx.captured_queries]
+        lock = next(i for i, sql in enumerate(statements) if 'FOR UPDATE' in sql)
+        self.assertIn('"stations"', statements[lock])
+        self.assertFalse([sql for sql in statements[:lock] if 'notification_outbox' in sql])
+
+    def test_recovery_only_takes_back_expired_claims(self):
+        enqueue_alert(self.station, self.make_alert())
+        enqueue_alert(self.other, self.make_alert())
+        NotificationOutbox.objects.update(status='sending', claimed_at=timezone.now())
+        NotificationOutbox.objects.filter(station=self.other).update(
+            claimed_at=timezone.now() - SENDING_LEASE - timedelta(minutes=1))
+
+        self.assertEqual(recover_interrupted(), 1)
+
+        self.assertEqual(dict(NotificationOutbox.objects.values_list('station', 'status')),
+                         {'test-station': 'sending', 'other-station': 'pending'})
+
+
+class TestAPNsSendMany(unittest.TestCase):
+    """Concurrent fan-out on the persistent APNs event loop."""
+
+    class FakeClient:
+        def __init__(self):
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+        async def send_notification(self, request):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            ok = request.device_token != 'bad'
+            return mock.Mock(is_successful=ok, status='200' if ok else '400',
+                             description=None if ok else 'BadDeviceToken')
+
+    def test_send_many_bounds_concurrency_and_keeps_order(self):
+        service = APNsService()
+        service._get_loop()
+        service.client = self.FakeClient()
+        tokens = [f'token-{i}' for i in range(20)] + ['bad']
+
+        results = service.send_many(
+            [{'device_token': t, 'bundle_id': 'b', 'title': 't', 'body': 'b'} for t in tokens],
+            concurrency=5,
+        )
+
+        self.assertEqual([r.device_token for r in results], tokens)
+        self.assertTrue(all(r.success for r in results[:-1]))
+        self.assertEqual(results[-1].description, 'BadDeviceToken')
+        self.assertEqual(service.client.max_in_flight, 5)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+"""
+Fixed-point storage for sensor values.
+
+ScaledIntegerField keeps a value with `decimal_places` decimals as an
+integer column holding value * 10**decimal_places (a temperature of
+12.34 °C is stored as 1234 centi-degrees), and hands it to Python as a
+float. Reads skip the Decimal construction and quantization a
+DecimalField pays per value, and SUM/MIN/MAX/AVG run on integers in the
+database; their results are scaled back the same way.
+
+Float conversion of a stored value is exact to its decimals
+(1234 / 100 == float(Decimal('12.34'))), so documents built from these
+columns are unchanged. Values are rounded half to even to the field's
+decimals on write, and values beyond `max_digits` are refused with a
+ValueError, like a DecimalField.
+"""
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models
+from django.utils.functional import cached_property
+
+
+class ScaledIntegerField(models.FloatField):
+    """A decimal value of `max_digits` digits stored as a scaled integer."""
+
+    def __init__(self, *args, max_digits=None, decimal_places=None, **kwargs):
+        # Not named max_digits/decimal_places: DRF would pass them on to
+        # the serializer FloatField
+        self.digits = max_digits
+        self.places = decimal_places
+        self.scale = 10 ** decimal_places
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def validators(self):
+        # Same range as a DecimalField of these digits
+        limit = 10 ** (self.digits - self.places) - 1 / self.scale
+        return super().validators + [MinValueValidator(-limit), MaxValueValidator(limit)]
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['max_digits'] = self.digits
+        kwargs['decimal_places'] = self.places
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'IntegerField'
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return round(value * self.scale)
+
+    def get_db_prep_save(self, value, connection):
+        # A DecimalField raises InvalidOperation on these; an integer column
+        # would store them (SQLite) or fail the whole statement (PostgreSQL)
+        value = super().get_db_prep_save(value, connection)
+        if value is not None and abs(value) >= 10 ** self.digits:
+            raise ValueError(
+                f'{self.name} must have at most {self.digits - self.places} digits '
+                f'before and {self.places} after the decimal point'
+            )
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        # Aggregates arrive as int, float or (AVG on PostgreSQL) Decimal
+        if value is None:
+            return None
+        return float(value) / self.scale
+
+    def format_value(self, value):
+        """Text of a value with the field's decimals, as a DecimalField renders it."""
+        return None if value is None else f'{value:.{self.places}f}'
+
+
+def text_formatters(model, columns):
+    """
+    Per column, the format_value of scaled integer fields or None, for
+    text exports that keep rendering them with their fixed decimals.
+    """
+    formatters = []
+    for name in columns:
+        field = model._meta.get_field(name)
+        formatters.append(field.format_value if isinstance(field, ScaledIntegerField) else None)
+    return formatters
@@ -0,0 +1,134 @@
+"""
+Maintenance of the denormalized StationLatest snapshot.
+
+Ingest merges every stored snapshot into the station's StationLatest row
+inside the same transaction, recomputing the danger flags once per write
+instead of on every app poll.
+"""
+
+from notifications.alert_system import alert_analyzer
+
+from .models import READING_MODELS, StationLatest, reading_fields
+
+
+# Reading section -> {reading field: StationLatest field}
+LATEST_FIELDS = {
+    section: {name: name for name in reading_fields(model)}
+    for section, model in READING_MODELS.items()
+}
+LATEST_FIELDS['soil']['temperature'] = 'soil_temperature'
+LATEST_FIELDS['power'] = {
+    'percentage': 'battery_percentage',
+    'voltage_mv': 'battery_voltage_mv',
+    'is_charging': 'battery_is_charging',
+}
+
+DANGER_FLAGS = [
+    'temperature_is_dangerous',
+    'humidity_is_dangerous',
+    'pressure_is_dangerous',
+    'uv_index_is_dangerous',
+    'lux_is_dangerous',
+    'co2_ppm_is_dangerous',
+    'moisture_percent_is_dangerous',
+    'is_raining_is_dangerous',
+    'rain_detected_last_hour_is_dangerous',
+    'motion_count_is_dangerous',
+]
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def sensor_data(latest):
+    """Return a StationLatest as the sensor dict AlertAnalyzer expects."""
+    return {
+        'atmospheric': {
+            'temperature': _float(latest.temperature),
+            'humidity': _float(latest.humidity),
+            'pressure': _float(latest.pressure),
+        },
+        'light': {
+            'uv_index': _float(latest.uv_index),
+            'lux': _float(latest.lux),
+        },
+        'soil': {
+            'moisture_percent': _float(latest.moisture_percent),
+        },
+        'air_quality': {
+            'co2_ppm': latest.co2_ppm,
+        },
+        'precipitation': {
+            'is_raining': bool(latest.is_raining),
+            'rain_detected_last_hour': bool(latest.rain_detected_last_hour),
+        },
+        'trail_activity': {
+            'motion_count': latest.motion_count or 0,
+        },
+    }
+
+
+def _merge(latest, section, values):
+    opts = StationLatest._meta
+    for name, value in values.items():
+        field = LATEST_FIELDS[section][name]
+        setattr(latest, field, opts.get_field(field).to_python(value))
+
+
+def _refresh_flags(latest):
+    flags = alert_analyzer.get_is_dangerous_flags(sensor_data(latest))
+    for name in DANGER_FLAGS:
+        setattr(latest, name, flags[name])
+
+
+def update_station_latest(station, snapshots):
+    """
+    Merge stored snapshots into the station's StationLatest row.
+
+    Args:
+        station: Station the snapshots belong to
+        snapshots: List of (timestamp, {section: {field: value}}) tuples
+
+    Snapshots older than the row's timestamp are ignored, so a replayed
+    backlog cannot overwrite newer values. Sections missing from a snapshot
+    keep their previous values. Call inside the ingest transaction.
+
+    Returns the updated row, or None when every snapshot was older.
+    """
+    latest = StationLatest.objects.select_for_update().filter(station=station).first()
+    if latest is None:
+        latest = StationLatest(station=station)
+
+    changed = False
+    for timestamp, readings in sorted(snapshots, key=lambda snapshot: snapshot[0]):
+        if latest.timestamp is not None and timestamp < latest.timestamp:
+            continue
+        latest.timestamp = timestamp
+        for section, values in readings.items():
+            _merge(latest, section, values)
+        changed = True
+
+    if not changed:
+        return None
+
+    _refresh_flags(latest)
+    latest.save(force_insert=latest._state.adding)
+    return latest
+
+
+def rebuild_station_latest(station):
+    """Recompute a station's StationLatest row from the newest row of each reading table."""
+    latest = StationLatest(station=station)
+
+    for section, model in READING_MODELS.items():
+        reading = model.objects.filter(station=station).order_by('-timestamp').first()
+        if reading is None:
+            continue
+        _merge(latest, section, {name: getattr(reading, name) for name in LATEST_FIELDS[section]})
+        if latest.timestamp is None or reading.timestamp > latest.timestamp:
+            latest.timestamp = reading.timestamp
+
+    _refresh_flags(latest)
+    latest.save()
+    return latest
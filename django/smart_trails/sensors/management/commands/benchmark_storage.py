@@ -0,0 +1,109 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models import Avg, Max, Min, Sum
+
+from sensors.fields import ScaledIntegerField
+
+
+VALUE_FIELDS = ['temperature', 'humidity', 'pressure']
+
+
+def _sample_models():
+    """
+    Two throwaway tables with the atmospheric value columns, one stored as
+    DecimalField and one as ScaledIntegerField, created and dropped by the
+    benchmark.
+    """
+    def build(name, field_class):
+        attrs = {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {'app_label': 'sensors', 'managed': False,
+                                      'db_table': f'benchmark_{name.lower()}'}),
+            'temperature': field_class(max_digits=5, decimal_places=2, null=True),
+            'humidity': field_class(max_digits=5, decimal_places=2, null=True),
+            'pressure': field_class(max_digits=6, decimal_places=2, null=True),
+        }
+        return type(name, (models.Model,), attrs)
+
+    return build('DecimalSample', models.DecimalField), build('ScaledSample', ScaledIntegerField)
+
+
+def _best(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Compare bulk read and aggregate speed of decimal and scaled integer sensor columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000,
+                            help='Rows written to each sample table')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per measurement, the fastest is reported')
+
+    def measure(self, model, values, repeat):
+        @transaction.atomic
+        def write():
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [model(**dict(zip(VALUE_FIELDS, row))) for row in values], batch_size=5000)
+
+        def read():
+            return list(model.objects.values_list(*VALUE_FIELDS).iterator(chunk_size=5000))
+
+        def python_aggregate():
+            # What the series and payload code does with the values it reads
+            for column in zip(*read()):
+                present = [float(value) for value in column if value is not None]
+                sum(present) / len(present), min(present), max(present)
+
+        def database_aggregate():
+            aggregates = {}
+            for name in VALUE_FIELDS:
+                aggregates.update({f'{name}_avg': Avg(name), f'{name}_sum': Sum(name),
+                                   f'{name}_min': Min(name), f'{name}_max': Max(name)})
+            return model.objects.aggregate(**aggregates)
+
+        return {
+            'write': _best(1, write),
+            'bulk read': _best(repeat, read),
+            'read + python aggregate': _best(repeat, python_aggregate),
+            'database aggregate': _best(repeat, database_aggregate),
+        }
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        rng = random.Random(0)
+        values = [
+            (round(rng.uniform(-20, 35), 2), round(rng.uniform(0, 100), 2), round(rng.uniform(750, 1050), 2))
+            for _ in range(rows)
+        ]
+
+        sample_models = _sample_models()
+        with connection.schema_editor() as editor:
+            for model in sample_models:
+                editor.create_model(model)
+        try:
+            results = [self.measure(model, values, repeat) for model in sample_models]
+        finally:
+            with connection.schema_editor() as editor:
+                for model in sample_models:
+                    editor.delete_model(model)
+
+        self.stdout.write(f'{rows} rows, {connection.vendor}, best of {repeat} runs (write: 1 run)')
+        decimal, scaled = results
+        for name in ['write', 'bulk read', 'read + python aggregate', 'database aggregate']:
+            self.stdout.write(
+                f'{name:<24} decimal {decimal[name] * 1000:9.1f} ms   '
+                f'scaled integer {scaled[name] * 1000:9.1f} ms   '
+                f'x{decimal[name] / scaled[name]:.1f}'
+            )
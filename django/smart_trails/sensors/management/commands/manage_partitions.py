@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from sensors.models import READING_MODELS
+from sensors.partitions import (
+    BRIN_AFTER_MONTHS, PARTITIONS_AHEAD, add_brin_index, add_months, create_partition,
+    detach_partition, is_partitioned, month_range, month_start, partition_name, partitions,
+)
+from sensors.retention import retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the reading tables and index or detach old ones (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', action='append', choices=list(READING_MODELS),
+                            help='Reading table to manage (repeatable, default: all)')
+        parser.add_argument('--ahead', type=int, default=PARTITIONS_AHEAD,
+                            help='Months of partitions to create after the current one')
+        parser.add_argument('--brin-after', type=int, default=BRIN_AFTER_MONTHS,
+                            help='Add BRIN indexes to partitions at least this many months old')
+        parser.add_argument('--detach-expired', action='store_true',
+                            help='Detach partitions past retention, keeping them as standalone tables '
+                                 '(prune_readings archives and drops them instead)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('Reading tables are only partitioned on PostgreSQL, nothing to do')
+            return
+
+        current = month_start(timezone.now())
+        for section in options['sensor'] or READING_MODELS:
+            table = READING_MODELS[section]._meta.db_table
+            if not is_partitioned(connection, table):
+                self.stdout.write(f'{section}: {table} is not partitioned, run migrate')
+                continue
+
+            created = [
+                month for month in month_range(current, add_months(current, options['ahead']))
+                if create_partition(connection, table, month)
+            ]
+
+            brin_until = add_months(current, -options['brin_after'])
+            existing = partitions(connection, table)
+            for month in existing:
+                if month <= brin_until:
+                    add_brin_index(connection, table, month)
+
+            detached = []
+            cutoff = retention_cutoff(section)
+            if options['detach_expired'] and cutoff is not None:
+                for month in existing:
+                    if add_months(month, 1) <= cutoff:
+                        detach_partition(connection, table, month)
+                        detached.append(partition_name(table, month))
+
+            self.stdout.write(
+                f'{section}: {len(created)} partitions created, {len(existing) - len(detached)} attached'
+                + (f", detached {', '.join(detached)}" if detached else '')
+            )
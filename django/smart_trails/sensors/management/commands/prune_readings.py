@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sensors.models import READING_MODELS
+from sensors.retention import count_expired, prune_expired, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Archive and delete raw readings older than settings.READING_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', action='append', choices=list(READING_MODELS),
+                            help='Reading table to prune (repeatable, default: all)')
+        parser.add_argument('--archive-dir', default=str(settings.READING_ARCHIVE_DIR),
+                            help='Where expired rows are archived')
+        parser.add_argument('--no-archive', action='store_true',
+                            help='Delete expired rows without archiving them')
+        parser.add_argument('--batch-size', type=int, default=settings.READING_PRUNE_BATCH_SIZE,
+                            help='Rows archived and deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the expired rows')
+
+    def handle(self, *args, **options):
+        archive_dir = None if options['no_archive'] else options['archive_dir']
+
+        for section in options['sensor'] or READING_MODELS:
+            cutoff = retention_cutoff(section)
+            if cutoff is None:
+                self.stdout.write(f'{section}: kept forever')
+                continue
+
+            if options['dry_run']:
+                self.stdout.write(f'{section}: {count_expired(section)} rows before {cutoff:%Y-%m-%d %H:%M}')
+                continue
+
+            deleted = prune_expired(section, archive_dir, options['batch_size'], options['pause'])
+            self.stdout.write(f'{section}: {deleted} rows before {cutoff:%Y-%m-%d %H:%M} pruned')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from stations.models import Station
+from sensors.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly and daily rollups of stations from their reading tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('station_ids', nargs='*',
+                            help='Stations to rebuild (default: all)')
+        parser.add_argument('--since',
+                            help='Only rebuild from this ISO 8601 timestamp on (default: all history)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('--since must be an ISO 8601 timestamp')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        stations = Station.objects.all()
+        if options['station_ids']:
+            stations = stations.filter(station_id__in=options['station_ids'])
+
+        for station in stations.iterator():
+            written = rebuild_rollups(station, since)
+            self.stdout.write(f'{station.station_id}: {written} hourly rollups')
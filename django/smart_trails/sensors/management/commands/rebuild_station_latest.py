@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from stations.models import Station
+from sensors.latest import rebuild_station_latest
+
+
+class Command(BaseCommand):
+    help = 'Recompute the StationLatest snapshot of stations from their reading tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('station_ids', nargs='*',
+                            help='Stations to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        stations = Station.objects.all()
+        if options['station_ids']:
+            stations = stations.filter(station_id__in=options['station_ids'])
+
+        count = 0
+        for station in stations.iterator():
+            rebuild_station_latest(station)
+            count += 1
+
+        self.stdout.write(f'Rebuilt latest snapshot for {count} stations')
@@ -0,0 +1,101 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Reading model -> (section, {reading field: StationLatest field}), as of this migration
+READING_TABLES = {
+    'AtmosphericReading': ('atmospheric', {'temperature': 'temperature', 'humidity': 'humidity',
+                                           'pressure': 'pressure'}),
+    'LightReading': ('light', {'uv_index': 'uv_index', 'lux': 'lux'}),
+    'SoilReading': ('soil', {'temperature': 'soil_temperature',
+                             'moisture_percent': 'moisture_percent'}),
+    'AirQualityReading': ('air_quality', {'co2_ppm': 'co2_ppm', 'tvoc_ppb': 'tvoc_ppb', 'aqi': 'aqi'}),
+    'PrecipitationReading': ('precipitation', {'is_raining': 'is_raining',
+                                               'rain_detected_last_hour': 'rain_detected_last_hour'}),
+    'TrailActivityReading': ('trail_activity', {'motion_count': 'motion_count',
+                                                'period_minutes': 'period_minutes'}),
+    'PowerReading': ('power', {'percentage': 'battery_percentage', 'voltage_mv': 'battery_voltage_mv',
+                               'is_charging': 'battery_is_charging'}),
+}
+
+
+def backfill_station_latest(apps, schema_editor):
+    """Build the StationLatest row of every station with readings, like rebuild_station_latest."""
+    from sensors.latest import DANGER_FLAGS, sensor_data
+    from notifications.alert_system import alert_analyzer
+
+    Station = apps.get_model('stations', 'Station')
+    StationLatest = apps.get_model('sensors', 'StationLatest')
+
+    for station in Station.objects.all():
+        latest = StationLatest(station=station)
+        for model_name, (section, fields) in READING_TABLES.items():
+            model = apps.get_model('sensors', model_name)
+            reading = model.objects.filter(station=station).order_by('-timestamp').first()
+            if reading is None:
+                continue
+            for name, field in fields.items():
+                setattr(latest, field, getattr(reading, name))
+            if latest.timestamp is None or reading.timestamp > latest.timestamp:
+                latest.timestamp = reading.timestamp
+
+        if latest.timestamp is None:
+            continue
+        flags = alert_analyzer.get_is_dangerous_flags(sensor_data(latest))
+        for name in DANGER_FLAGS:
+            setattr(latest, name, flags[name])
+        latest.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0001_initial'),
+        ('sensors', '0002_auto_20260322_1750'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationLatest',
+            fields=[
+                ('station', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest', serialize=False, to='stations.station')),
+                ('timestamp', models.DateTimeField(blank=True, help_text='Timestamp of the newest snapshot merged in', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('temperature', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('pressure', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('uv_index', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('lux', models.DecimalField(blank=True, decimal_places=1, max_digits=8, null=True)),
+                ('soil_temperature', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('moisture_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('co2_ppm', models.IntegerField(blank=True, null=True)),
+                ('tvoc_ppb', models.IntegerField(blank=True, null=True)),
+                ('aqi', models.IntegerField(blank=True, null=True)),
+                ('is_raining', models.BooleanField(blank=True, null=True)),
+                ('rain_detected_last_hour', models.BooleanField(blank=True, null=True)),
+                ('motion_count', models.IntegerField(blank=True, null=True)),
+                ('period_minutes', models.IntegerField(blank=True, null=True)),
+                ('battery_percentage', models.IntegerField(blank=True, null=True)),
+                ('battery_voltage_mv', models.IntegerField(blank=True, null=True)),
+                ('battery_is_charging', models.BooleanField(blank=True, null=True)),
+                ('temperature_is_dangerous', models.BooleanField(default=False)),
+                ('humidity_is_dangerous', models.BooleanField(default=False)),
+                ('pressure_is_dangerous', models.BooleanField(default=False)),
+                ('uv_index_is_dangerous', models.BooleanField(default=False)),
+                ('lux_is_dangerous', models.BooleanField(default=False)),
+                ('co2_ppm_is_dangerous', models.BooleanField(default=False)),
+                ('moisture_percent_is_dangerous', models.BooleanField(default=False)),
+                ('is_raining_is_dangerous', models.BooleanField(default=False)),
+                ('rain_detected_last_hour_is_dangerous', models.BooleanField(default=False)),
+                ('motion_count_is_dangerous', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Station Latest Snapshot',
+                'verbose_name_plural': 'Station Latest Snapshots',
+                'db_table': 'station_latest',
+            },
+        ),
+        migrations.RunPython(backfill_station_latest, migrations.RunPython.noop),
+    ]
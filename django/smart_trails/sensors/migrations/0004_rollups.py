@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0001_initial'),
+        ('sensors', '0003_stationlatest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (UTC aligned)')),
+                ('sensor', models.CharField(help_text='Reading table, e.g. atmospheric', max_length=20)),
+                ('metric', models.CharField(help_text='Reading field, e.g. temperature', max_length=30)),
+                ('count', models.IntegerField(default=0, help_text='Readings with a value')),
+                ('sum', models.FloatField(blank=True, null=True)),
+                ('min', models.FloatField(blank=True, null=True)),
+                ('max', models.FloatField(blank=True, null=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourlyrollups', to='stations.station')),
+            ],
+            options={
+                'verbose_name': 'Hourly Rollup',
+                'verbose_name_plural': 'Hourly Rollups',
+                'db_table': 'hourly_rollups',
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'unique_together': {('station', 'sensor', 'metric', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (UTC aligned)')),
+                ('sensor', models.CharField(help_text='Reading table, e.g. atmospheric', max_length=20)),
+                ('metric', models.CharField(help_text='Reading field, e.g. temperature', max_length=30)),
+                ('count', models.IntegerField(default=0, help_text='Readings with a value')),
+                ('sum', models.FloatField(blank=True, null=True)),
+                ('min', models.FloatField(blank=True, null=True)),
+                ('max', models.FloatField(blank=True, null=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dailyrollups', to='stations.station')),
+            ],
+            options={
+                'verbose_name': 'Daily Rollup',
+                'verbose_name_plural': 'Daily Rollups',
+                'db_table': 'daily_rollups',
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'unique_together': {('station', 'sensor', 'metric', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0004_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airqualityreading',
+            index=models.Index(fields=['station', 'id'], name='air_quality_station_bdea52_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atmosphericreading',
+            index=models.Index(fields=['station', 'id'], name='atmospheric_station_046e76_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lightreading',
+            index=models.Index(fields=['station', 'id'], name='light_readi_station_a2e986_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='powerreading',
+            index=models.Index(fields=['station', 'id'], name='power_readi_station_a3a0bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='precipitationreading',
+            index=models.Index(fields=['station', 'id'], name='precipitati_station_2b6ee1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soilreading',
+            index=models.Index(fields=['station', 'id'], name='soil_readin_station_673206_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trailactivityreading',
+            index=models.Index(fields=['station', 'id'], name='trail_activ_station_083398_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.utils import timezone
+
+from sensors.partitions import is_partitioned, partition_table
+
+
+READING_TABLES = [
+    'atmospheric_readings',
+    'light_readings',
+    'soil_readings',
+    'air_quality_readings',
+    'precipitation_readings',
+    'trail_activity_readings',
+    'power_readings',
+]
+
+
+def partition_readings(apps, schema_editor):
+    connection = schema_editor.connection
+    # Plain tables elsewhere, SQLite has no partitioning
+    if connection.vendor != 'postgresql':
+        return
+    now = timezone.now()
+    for table in READING_TABLES:
+        if not is_partitioned(connection, table):
+            partition_table(connection, table, now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0005_reading_insertion_order_indexes'),
+    ]
+
+    operations = [
+        # Not reversed: the partitioned tables match the models as well
+        migrations.RunPython(partition_readings, migrations.RunPython.noop),
+    ]
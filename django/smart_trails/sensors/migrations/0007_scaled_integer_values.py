@@ -0,0 +1,58 @@
+from django.db import migrations
+import sensors.fields
+
+
+# (model, table, column, max_digits, decimal_places, help_text)
+SCALED_COLUMNS = [
+    ('atmosphericreading', 'atmospheric_readings', 'temperature', 5, 2, 'Temperature in Celsius'),
+    ('atmosphericreading', 'atmospheric_readings', 'humidity', 5, 2, 'Relative humidity percentage (0-100)'),
+    ('atmosphericreading', 'atmospheric_readings', 'pressure', 6, 2, 'Atmospheric pressure in hPa'),
+    ('lightreading', 'light_readings', 'uv_index', 4, 2, 'UV index (0-15+)'),
+    ('lightreading', 'light_readings', 'lux', 8, 1, 'Light intensity in lux'),
+    ('soilreading', 'soil_readings', 'temperature', 5, 2, 'Soil temperature in Celsius (DS18B20)'),
+    ('soilreading', 'soil_readings', 'moisture_percent', 5, 2, 'Soil moisture percentage (0-100)'),
+    ('stationlatest', 'station_latest', 'temperature', 5, 2, ''),
+    ('stationlatest', 'station_latest', 'humidity', 5, 2, ''),
+    ('stationlatest', 'station_latest', 'pressure', 6, 2, ''),
+    ('stationlatest', 'station_latest', 'uv_index', 4, 2, ''),
+    ('stationlatest', 'station_latest', 'lux', 8, 1, ''),
+    ('stationlatest', 'station_latest', 'soil_temperature', 5, 2, ''),
+    ('stationlatest', 'station_latest', 'moisture_percent', 5, 2, ''),
+]
+
+
+def scale_column(model_name, table, column, max_digits, decimal_places, help_text):
+    """
+    Replace a decimal column by a scaled integer one: add it, convert the
+    rows in one UPDATE, drop the decimal column and take over its name.
+    """
+    scaled = f'{column}_scaled'
+    scale = 10 ** decimal_places
+    return [
+        migrations.AddField(
+            model_name=model_name,
+            name=scaled,
+            field=sensors.fields.ScaledIntegerField(
+                blank=True, null=True, max_digits=max_digits, decimal_places=decimal_places,
+                help_text=help_text),
+        ),
+        migrations.RunSQL(
+            f'UPDATE {table} SET {scaled} = CAST(ROUND({column} * {scale}) AS INTEGER)',
+            f'UPDATE {table} SET {column} = {scaled} / {scale}.0',
+        ),
+        migrations.RemoveField(model_name=model_name, name=column),
+        migrations.RenameField(model_name=model_name, old_name=scaled, new_name=column),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0006_partition_readings'),
+    ]
+
+    operations = [
+        operation
+        for spec in SCALED_COLUMNS
+        for operation in scale_column(*spec)
+    ]
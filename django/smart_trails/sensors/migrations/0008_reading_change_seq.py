@@ -0,0 +1,133 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:58
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+READING_MODELS = [
+    'AtmosphericReading', 'LightReading', 'SoilReading', 'AirQualityReading',
+    'PrecipitationReading', 'TrailActivityReading', 'PowerReading',
+]
+
+
+def number_existing_rows(apps, schema_editor):
+    """
+    Give stored rows their id as change sequence, one row per step in
+    insertion order like the old id cursor, and start each station's
+    sequence after them.
+    """
+    Station = apps.get_model('stations', 'Station')
+
+    last = {}
+    for name in READING_MODELS:
+        model = apps.get_model('sensors', name)
+        model.objects.update(change_seq=F('id'))
+        for station_id, last_id in model.objects.values('station').annotate(
+                last_id=Max('id')).order_by().values_list('station', 'last_id'):
+            last[station_id] = max(last.get(station_id, 0), last_id)
+
+    for station_id, change_seq in last.items():
+        Station.objects.filter(pk=station_id).update(change_seq=change_seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0002_station_change_seq'),
+        ('sensors', '0007_scaled_integer_values'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='airqualityreading',
+            name='air_quality_station_bdea52_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='atmosphericreading',
+            name='atmospheric_station_046e76_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lightreading',
+            name='light_readi_station_a2e986_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='powerreading',
+            name='power_readi_station_a3a0bc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='precipitationreading',
+            name='precipitati_station_2b6ee1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='soilreading',
+            name='soil_readin_station_673206_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trailactivityreading',
+            name='trail_activ_station_083398_idx',
+        ),
+        migrations.AddField(
+            model_name='airqualityreading',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, help_text='Station change sequence of the batch that last wrote this row'),
+        ),
+        migrations.AddField(
+            model_name='atmosphericreading',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, help_text='Station change sequence of the batch that last wrote this row'),
+        ),
+        migrations.AddField(
+            model_name='lightreading',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, help_text='Station change sequence of the batch that last wrote this row'),
+        ),
+        migrations.AddField(
+            model_name='powerreading',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, help_text='Station change sequence of the batch that last wrote this row'),
+        ),
+        migrations.AddField(
+            model_name='precipitationreading',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, help_text='Station change sequence of the batch that last wrote this row'),
+        ),
+        migrations.AddField(
+            model_name='soilreading',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, help_text='Station change sequence of the batch that last wrote this row'),
+        ),
+        migrations.AddField(
+            model_name='trailactivityreading',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, help_text='Station change sequence of the batch that last wrote this row'),
+        ),
+        migrations.RunPython(number_existing_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='airqualityreading',
+            index=models.Index(fields=['station', 'change_seq', 'timestamp'], name='air_quality_station_38242f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atmosphericreading',
+            index=models.Index(fields=['station', 'change_seq', 'timestamp'], name='atmospheric_station_cd7d43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lightreading',
+            index=models.Index(fields=['station', 'change_seq', 'timestamp'], name='light_readi_station_434733_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='powerreading',
+            index=models.Index(fields=['station', 'change_seq', 'timestamp'], name='power_readi_station_5c1fd0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='precipitationreading',
+            index=models.Index(fields=['station', 'change_seq', 'timestamp'], name='precipitati_station_f58b2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soilreading',
+            index=models.Index(fields=['station', 'change_seq', 'timestamp'], name='soil_readin_station_35cda8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trailactivityreading',
+            index=models.Index(fields=['station', 'change_seq', 'timestamp'], name='trail_activ_station_2cb24c_idx'),
+        ),
+    ]
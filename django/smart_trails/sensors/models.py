@@ -1,5 +1,7 @@
 from django.db import models
 
+from .fields import ScaledIntegerField
+
 # Create your models here.
 
 class AtmosphericReading(models.Model):
@@ -16,23 +18,27 @@ class AtmosphericReading(models.Model):
         db_index=True,
         help_text="When this reading was taken"
     )
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Station change sequence of the batch that last wrote this row"
+    )
     
     # Sensor values
-    temperature = models.DecimalField(
+    temperature = ScaledIntegerField(
         max_digits=5,
         decimal_places=2,
         null=True,
         blank=True,
         help_text="Temperature in Celsius"
     )
-    humidity = models.DecimalField(
+    humidity = ScaledIntegerField(
         max_digits=5,
         decimal_places=2,
         null=True,
         blank=True,
         help_text="Relative humidity percentage (0-100)"
     )
-    pressure = models.DecimalField(
+    pressure = ScaledIntegerField(
         max_digits=6,
         decimal_places=2,
         null=True,
@@ -45,6 +51,8 @@ class AtmosphericReading(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['station', '-timestamp']),
+            # Commit order, for the delta sync cursor
+            models.Index(fields=['station', 'change_seq', 'timestamp']),
         ]
         unique_together = [['station', 'timestamp']]
         verbose_name = 'Atmospheric Reading'
@@ -67,16 +75,20 @@ class LightReading(models.Model):
         db_index=True,
         help_text="When this reading was taken"
     )
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Station change sequence of the batch that last wrote this row"
+    )
     
     # Sensor values
-    uv_index = models.DecimalField(
+    uv_index = ScaledIntegerField(
         max_digits=4,
         decimal_places=2,
         null=True,
         blank=True,
         help_text="UV index (0-15+)"
     )
-    lux = models.DecimalField(
+    lux = ScaledIntegerField(
         max_digits=8,
         decimal_places=1,
         null=True,
@@ -89,6 +101,8 @@ class LightReading(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['station', '-timestamp']),
+            # Commit order, for the delta sync cursor
+            models.Index(fields=['station', 'change_seq', 'timestamp']),
         ]
         unique_together = [['station', 'timestamp']]
         verbose_name = 'Light Reading'
@@ -108,16 +122,20 @@ class SoilReading(models.Model):
         db_index=True,
         help_text="When this reading was taken"
     )
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Station change sequence of the batch that last wrote this row"
+    )
     
     # Sensor values
-    temperature = models.DecimalField(
+    temperature = ScaledIntegerField(
         max_digits=5,
         decimal_places=2,
         null=True,
         blank=True,
         help_text="Soil temperature in Celsius (DS18B20)"
     )
-    moisture_percent = models.DecimalField(
+    moisture_percent = ScaledIntegerField(
         max_digits=5,
         decimal_places=2,
         null=True,
@@ -130,6 +148,8 @@ class SoilReading(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['station', '-timestamp']),
+            # Commit order, for the delta sync cursor
+            models.Index(fields=['station', 'change_seq', 'timestamp']),
         ]
         unique_together = [['station', 'timestamp']]
         verbose_name = 'Soil Reading'
@@ -149,6 +169,10 @@ class AirQualityReading(models.Model):
         db_index=True,
         help_text="When this reading was taken"
     )
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Station change sequence of the batch that last wrote this row"
+    )
     
     # Sensor values
     co2_ppm = models.IntegerField(
@@ -172,6 +196,8 @@ class AirQualityReading(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['station', '-timestamp']),
+            # Commit order, for the delta sync cursor
+            models.Index(fields=['station', 'change_seq', 'timestamp']),
         ]
         unique_together = [['station', 'timestamp']]
         verbose_name = 'Air Quality Reading'
@@ -194,6 +220,10 @@ class PrecipitationReading(models.Model):
         db_index=True,
         help_text="When this reading was taken"
     )
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Station change sequence of the batch that last wrote this row"
+    )
     
     # Sensor values
     is_raining = models.BooleanField(
@@ -212,6 +242,8 @@ class PrecipitationReading(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['station', '-timestamp']),
+            # Commit order, for the delta sync cursor
+            models.Index(fields=['station', 'change_seq', 'timestamp']),
         ]
         unique_together = [['station', 'timestamp']]
         verbose_name = 'Precipitation Reading'
@@ -234,6 +266,10 @@ class TrailActivityReading(models.Model):
         db_index=True,
         help_text="When this reading was taken"
     )
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Station change sequence of the batch that last wrote this row"
+    )
     
     # Sensor values
     motion_count = models.IntegerField(
@@ -252,6 +288,8 @@ class TrailActivityReading(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['station', '-timestamp']),
+            # Commit order, for the delta sync cursor
+            models.Index(fields=['station', 'change_seq', 'timestamp']),
         ]
         unique_together = [['station', 'timestamp']]
         verbose_name = 'Trail Activity Reading'
@@ -272,6 +310,10 @@ class PowerReading(models.Model):
         db_index=True,
         help_text="When this reading was taken"
     )
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Station change sequence of the batch that last wrote this row"
+    )
 
     percentage = models.IntegerField(
         null=True,
@@ -294,6 +336,8 @@ class PowerReading(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['station', '-timestamp']),
+            # Commit order, for the delta sync cursor
+            models.Index(fields=['station', 'change_seq', 'timestamp']),
         ]
         unique_together = [['station', 'timestamp']]
         verbose_name = 'Power Reading'
@@ -301,3 +345,142 @@ class PowerReading(models.Model):
 
     def __str__(self):
         return f"{self.station.station_id} - {self.timestamp} - {self.percentage}%"
+
+
+# Payload section -> reading model. Every section lives under "sensors" in the
+# Arduino payload except "power", which is sent at the top level.
+READING_MODELS = {
+    'atmospheric': AtmosphericReading,
+    'light': LightReading,
+    'soil': SoilReading,
+    'air_quality': AirQualityReading,
+    'precipitation': PrecipitationReading,
+    'trail_activity': TrailActivityReading,
+    'power': PowerReading,
+}
+
+
+def reading_fields(model):
+    """Names of the sensor value columns of a reading model (no id/station/timestamp/change_seq)."""
+    return [
+        f.name for f in model._meta.concrete_fields
+        if f.name not in ('id', 'station', 'timestamp', 'change_seq')
+    ]
+
+
+class StationLatest(models.Model):
+    """
+    Current value of every sensor of a station, with precomputed danger flags.
+
+    Denormalized copy of the newest reading of each table. It is upserted in
+    the ingest transaction (see sensors.latest), so the station endpoint the
+    apps poll is a single primary-key lookup.
+    """
+    station = models.OneToOneField(
+        'stations.Station',
+        primary_key=True,
+        related_name='latest',
+        on_delete=models.CASCADE
+    )
+    timestamp = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Timestamp of the newest snapshot merged in"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Atmospheric
+    temperature = ScaledIntegerField(max_digits=5, decimal_places=2, null=True, blank=True)
+    humidity = ScaledIntegerField(max_digits=5, decimal_places=2, null=True, blank=True)
+    pressure = ScaledIntegerField(max_digits=6, decimal_places=2, null=True, blank=True)
+    # Light
+    uv_index = ScaledIntegerField(max_digits=4, decimal_places=2, null=True, blank=True)
+    lux = ScaledIntegerField(max_digits=8, decimal_places=1, null=True, blank=True)
+    # Soil
+    soil_temperature = ScaledIntegerField(max_digits=5, decimal_places=2, null=True, blank=True)
+    moisture_percent = ScaledIntegerField(max_digits=5, decimal_places=2, null=True, blank=True)
+    # Air quality
+    co2_ppm = models.IntegerField(null=True, blank=True)
+    tvoc_ppb = models.IntegerField(null=True, blank=True)
+    aqi = models.IntegerField(null=True, blank=True)
+    # Precipitation
+    is_raining = models.BooleanField(null=True, blank=True)
+    rain_detected_last_hour = models.BooleanField(null=True, blank=True)
+    # Trail activity
+    motion_count = models.IntegerField(null=True, blank=True)
+    period_minutes = models.IntegerField(null=True, blank=True)
+    # Power
+    battery_percentage = models.IntegerField(null=True, blank=True)
+    battery_voltage_mv = models.IntegerField(null=True, blank=True)
+    battery_is_charging = models.BooleanField(null=True, blank=True)
+
+    # Danger flags from AlertAnalyzer.get_is_dangerous_flags
+    temperature_is_dangerous = models.BooleanField(default=False)
+    humidity_is_dangerous = models.BooleanField(default=False)
+    pressure_is_dangerous = models.BooleanField(default=False)
+    uv_index_is_dangerous = models.BooleanField(default=False)
+    lux_is_dangerous = models.BooleanField(default=False)
+    co2_ppm_is_dangerous = models.BooleanField(default=False)
+    moisture_percent_is_dangerous = models.BooleanField(default=False)
+    is_raining_is_dangerous = models.BooleanField(default=False)
+    rain_detected_last_hour_is_dangerous = models.BooleanField(default=False)
+    motion_count_is_dangerous = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'station_latest'
+        verbose_name = 'Station Latest Snapshot'
+        verbose_name_plural = 'Station Latest Snapshots'
+
+    def __str__(self):
+        return f"{self.station_id} - {self.timestamp}"
+
+
+class ReadingRollup(models.Model):
+    """
+    Aggregate of one metric of a station over a fixed time bucket.
+
+    Kept up to date by the ingest transaction (see sensors.rollups), so long
+    range charts and dashboards read a few rows per bucket instead of the raw
+    reading tables. Booleans are rolled up as 0/1.
+    """
+    station = models.ForeignKey(
+        'stations.Station',
+        related_name='%(class)ss',
+        on_delete=models.CASCADE
+    )
+    bucket = models.DateTimeField(help_text="Start of the bucket (UTC aligned)")
+    sensor = models.CharField(max_length=20, help_text="Reading table, e.g. atmospheric")
+    metric = models.CharField(max_length=30, help_text="Reading field, e.g. temperature")
+
+    count = models.IntegerField(default=0, help_text="Readings with a value")
+    sum = models.FloatField(null=True, blank=True)
+    min = models.FloatField(null=True, blank=True)
+    max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-bucket']
+        unique_together = [['station', 'sensor', 'metric', 'bucket']]
+
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else None
+
+    def __str__(self):
+        return f"{self.station_id} - {self.sensor}.{self.metric} - {self.bucket}"
+
+
+class HourlyRollup(ReadingRollup):
+
+    class Meta(ReadingRollup.Meta):
+        db_table = 'hourly_rollups'
+        verbose_name = 'Hourly Rollup'
+        verbose_name_plural = 'Hourly Rollups'
+
+
+class DailyRollup(ReadingRollup):
+
+    class Meta(ReadingRollup.Meta):
+        db_table = 'daily_rollups'
+        verbose_name = 'Daily Rollup'
+        verbose_name_plural = 'Daily Rollups'
@@ -0,0 +1,222 @@
+"""
+Monthly range partitioning of the reading tables on PostgreSQL.
+
+Migration 0006 turns every reading table into a table partitioned by
+RANGE ("timestamp") with one partition per UTC month:
+
+    <table>_pYYYY_MM     rows of that month
+    <table>_default      rows of months without a partition yet
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes (id, timestamp); ids still come from the table's
+sequence and stay unique. The (station, timestamp) unique constraint ingest
+upserts on already contains it.
+
+Queries bounded on timestamp only touch the partitions of their range,
+and the newest-first history scan stops in the newest partitions once its
+LIMIT is filled. The `manage_partitions` command creates partitions ahead
+of time, adds BRIN indexes to the older, append-only ones, and can detach
+partitions past retention. `prune_readings` drops whole expired partitions
+instead of deleting their rows (see sensors.retention).
+
+On other databases (SQLite in development) the tables stay plain and
+everything here is a no-op.
+"""
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+
+
+# Months of empty partitions kept ahead of the current one
+PARTITIONS_AHEAD = 3
+
+# Partitions at least this many months old get a BRIN index on timestamp
+BRIN_AFTER_MONTHS = 1
+
+DEFAULT_SUFFIX = '_default'
+
+
+def month_start(value):
+    """First instant of the UTC month of a datetime."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def month_range(start, end):
+    """Month starts from the month of `start` through the month of `end`."""
+    month = month_start(start)
+    months = []
+    while month <= end:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def _partition_month(table, name):
+    match = re.fullmatch(re.escape(table) + r'_p(\d{4})_(\d{2})', name)
+    if match is None:
+        return None
+    return datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+
+
+def is_partitioned(connection, table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)', [table])
+        return cursor.fetchone() is not None
+
+
+def partitions(connection, table):
+    """Return {month: partition name} of the attached monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass', [table])
+        names = [row[0] for row in cursor.fetchall()]
+
+    months = {}
+    for name in names:
+        month = _partition_month(table, name)
+        if month is not None:
+            months[month] = name
+    return dict(sorted(months.items()))
+
+
+def _bounds(month):
+    return f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def create_partition(connection, table, month):
+    """
+    Create the partition of one month, returns False if it already exists.
+
+    Rows of that month already stored in the default partition are moved
+    into the new one; the default partition is detached meanwhile.
+    """
+    qn = connection.ops.quote_name
+    name = partition_name(table, month)
+    default = table + DEFAULT_SUFFIX
+    end = add_months(month, 1)
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [month, end])
+        stray = cursor.fetchone()[0]
+        if stray:
+            cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}')
+
+        cursor.execute(f'CREATE TABLE {qn(name)} PARTITION OF {qn(table)} FOR VALUES {_bounds(month)}')
+
+        if stray:
+            cursor.execute(
+                f'INSERT INTO {qn(table)} SELECT * FROM {qn(default)} '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s', [month, end])
+            cursor.execute(
+                f'DELETE FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s', [month, end])
+            # Check the deferred station foreign keys now, ALTER TABLE refuses pending ones
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT')
+    return True
+
+
+def add_brin_index(connection, table, month):
+    """
+    Index a partition's timestamps with BRIN, a few pages that let month
+    range scans (exports, archiving) skip blocks on append-only partitions.
+    """
+    qn = connection.ops.quote_name
+    name = partition_name(table, month)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {qn(name + "_timestamp_brin")} '
+            f'ON {qn(name)} USING brin ("timestamp")')
+
+
+def detach_partition(connection, table, month, drop=False):
+    """Detach a month's partition, leaving it as a standalone table unless `drop`."""
+    qn = connection.ops.quote_name
+    name = partition_name(table, month)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+        if drop:
+            cursor.execute(f'DROP TABLE {qn(name)}')
+
+
+def partition_table(connection, table, now, ahead=PARTITIONS_AHEAD):
+    """
+    Convert a plain reading table into a monthly partitioned one, in place.
+
+    The table is renamed aside, recreated partitioned with the same
+    columns, constraint and index names, refilled and dropped. Partitions
+    cover the months of the existing rows through `ahead` months after
+    `now`. Run inside a transaction (a migration), ingest is blocked
+    meanwhile.
+    """
+    qn = connection.ops.quote_name
+    old = table + '_unpartitioned'
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')", [table])
+        constraints = cursor.fetchall()
+        constraint_names = {name for name, _, _ in constraints}
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s', [table])
+        indexes = [(name, definition) for name, definition in cursor.fetchall()
+                   if name not in constraint_names]
+        cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM {qn(table)}')
+        first, last = cursor.fetchone()
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+        sequence = cursor.fetchone()[0]
+
+        # Free the constraint and index names for the partitioned table
+        cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(old)}')
+        for name, _, _ in constraints:
+            cursor.execute(f'ALTER TABLE {qn(old)} DROP CONSTRAINT {qn(name)}')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {qn(name)}')
+
+        cursor.execute(
+            f'CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")')
+        if sequence is not None:
+            # Otherwise dropping the old table would drop the id sequence
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id')
+
+        for month in month_range(first or now, add_months(month_start(now), ahead)):
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(table, month))} '
+                f'PARTITION OF {qn(table)} FOR VALUES {_bounds(month)}')
+        cursor.execute(f'CREATE TABLE {qn(table + DEFAULT_SUFFIX)} PARTITION OF {qn(table)} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(old)}')
+        cursor.execute(f'DROP TABLE {qn(old)}')
+
+        for name, kind, definition in constraints:
+            if kind == 'p':
+                definition = 'PRIMARY KEY (id, "timestamp")'
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+        for name, definition in indexes:
+            # Still names the table, now the partitioned one
+            cursor.execute(definition)
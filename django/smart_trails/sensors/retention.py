@@ -0,0 +1,156 @@
+"""
+Retention of raw sensor readings.
+
+settings.READING_RETENTION_DAYS keeps the raw rows of each reading table
+for a number of days. Older rows live on in the hourly and daily rollups
+and in gzip NDJSON archive files, one per table and month:
+
+    <READING_ARCHIVE_DIR>/<table>/<table>-<YYYY-MM>.ndjson.gz
+
+The `prune_readings` command moves expired rows there in small batches:
+each batch is appended to the archives and flushed to disk before it is
+deleted in its own short transaction, so ingest is never locked out for
+long. A crash between the two steps archives the batch again on the next
+run, never loses it.
+
+On PostgreSQL, where the reading tables are partitioned by month (see
+sensors.partitions), months entirely past retention are archived and
+then dropped as whole partitions; only the month straddling the cutoff
+is deleted row by row.
+"""
+
+import gzip
+import json
+import os
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .fields import text_formatters
+from .models import READING_MODELS, reading_fields
+from .partitions import add_months, detach_partition, is_partitioned, partitions
+
+
+def retention_cutoff(section, now=None):
+    """Oldest timestamp kept raw for a reading table, or None to keep everything."""
+    days = settings.READING_RETENTION_DAYS.get(section)
+    if days is None:
+        return None
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archive_path(archive_dir, model, month):
+    table = model._meta.db_table
+    return os.path.join(archive_dir, table, f'{table}-{month}.ndjson.gz')
+
+
+def _archive(archive_dir, model, columns, rows):
+    """Append rows to their monthly archive files and flush them to disk."""
+    by_month = {}
+    for row in rows:
+        month = row[2].astimezone(dt_timezone.utc).strftime('%Y-%m')
+        by_month.setdefault(month, []).append(row)
+
+    # Scaled values keep the decimal text of the archives written before
+    formatters = [formatter or (lambda value: value) for formatter in text_formatters(model, columns)]
+
+    for month, month_rows in by_month.items():
+        path = archive_path(archive_dir, model, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lines = ''.join(
+            json.dumps({name: formatter(value) for name, formatter, value in zip(columns, formatters, row)},
+                       cls=DjangoJSONEncoder) + '\n'
+            for row in month_rows
+        )
+        # Each append is a gzip member of its own, readers see one stream
+        with open(path, 'ab') as f:
+            with gzip.GzipFile(fileobj=f, mode='ab') as archive:
+                archive.write(lines.encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _drop_expired_partitions(model, columns, cutoff, archive_dir, batch_size):
+    """Archive and drop the partitions ending before the cutoff, returns their row count."""
+    table = model._meta.db_table
+    dropped = 0
+
+    for month, name in partitions(connection, table).items():
+        end = add_months(month, 1)
+        if end > cutoff:
+            break
+
+        readings = model.objects.filter(timestamp__gte=month, timestamp__lt=end)
+        if archive_dir is None:
+            dropped += readings.count()
+        else:
+            batch = []
+            for row in readings.order_by('timestamp').values_list(*columns).iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    _archive(archive_dir, model, columns, batch)
+                    dropped += len(batch)
+                    batch = []
+            if batch:
+                _archive(archive_dir, model, columns, batch)
+                dropped += len(batch)
+
+        detach_partition(connection, table, month, drop=True)
+
+    return dropped
+
+
+def prune_expired(section, archive_dir=None, batch_size=None, pause=0, now=None):
+    """
+    Archive and delete the raw rows of a reading table past its retention.
+
+    Args:
+        section: Key of sensors.models.READING_MODELS
+        archive_dir: Directory of the archives, None deletes without archiving
+        batch_size: Rows per batch, defaults to settings.READING_PRUNE_BATCH_SIZE
+        pause: Seconds to sleep between batches, leaving room for ingest
+
+    Returns the number of rows deleted.
+    """
+    cutoff = retention_cutoff(section, now)
+    if cutoff is None:
+        return 0
+
+    model = READING_MODELS[section]
+    columns = ['id', 'station_id', 'timestamp'] + reading_fields(model)
+    batch_size = batch_size or settings.READING_PRUNE_BATCH_SIZE
+    deleted = 0
+
+    if is_partitioned(connection, model._meta.db_table):
+        deleted += _drop_expired_partitions(model, columns, cutoff, archive_dir, batch_size)
+
+    while True:
+        # Oldest first, through the timestamp index
+        rows = list(
+            model.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp')
+            .values_list(*columns)[:batch_size]
+        )
+        if not rows:
+            return deleted
+
+        if archive_dir is not None:
+            _archive(archive_dir, model, columns, rows)
+
+        with transaction.atomic():
+            count, _ = model.objects.filter(id__in=[row[0] for row in rows]).delete()
+        deleted += count
+
+        if pause:
+            time.sleep(pause)
+
+
+def count_expired(section, now=None):
+    cutoff = retention_cutoff(section, now)
+    if cutoff is None:
+        return 0
+    return READING_MODELS[section].objects.filter(timestamp__lt=cutoff).count()
@@ -0,0 +1,283 @@
+"""
+Hourly and daily rollups of the reading tables.
+
+Ingest refreshes the rollup rows of the hours and days its snapshots fall
+into, in the same transaction as the readings (see api.ingest.store_batch).
+Touched hours are recomputed from the raw rows rather than incremented,
+so replayed or overwritten snapshots never count twice, and touched days
+are merged from their hourly rollups. Long-range series and dashboards
+then read at most one row per metric and bucket, however much raw history
+has piled up.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .models import READING_MODELS, DailyRollup, HourlyRollup
+from .retention import retention_cutoff
+from .series import INTERVALS, EpochBucket, bucket_series, numeric_fields, numeric_value
+from .upsert import upsert_rows
+
+
+ROLLUP_MODELS = {
+    '1h': HourlyRollup,
+    '1d': DailyRollup,
+}
+ROLLUP_KEY = ['station', 'sensor', 'metric', 'bucket']
+
+HOUR = INTERVALS['1h']
+DAY = INTERVALS['1d']
+
+# Raw history recomputed per query by rebuild_rollups
+REBUILD_WINDOW = timedelta(days=31)
+
+
+def _floor(timestamp, seconds):
+    return datetime.fromtimestamp(int(timestamp.timestamp()) // seconds * seconds, tz=dt_timezone.utc)
+
+
+def _retained_since(section):
+    """Start of the first UTC day whose raw rows are all retained, or None."""
+    cutoff = retention_cutoff(section)
+    if cutoff is None:
+        return None
+    return _floor(cutoff, DAY) + timedelta(days=1)
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _hourly_aggregates(model, station_id, start, end):
+    """
+    Aggregate the raw rows of [start, end) per hour with one GROUP BY.
+
+    Yields (hour, metric, count, sum, min, max).
+    """
+    fields = numeric_fields(model)
+    aggregates = {}
+    for name in fields:
+        value = numeric_value(model, name)
+        aggregates[f'{name}__count'] = Count(value)
+        aggregates[f'{name}__sum'] = Sum(value)
+        aggregates[f'{name}__min'] = Min(value)
+        aggregates[f'{name}__max'] = Max(value)
+
+    rows = (
+        model.objects
+        .filter(station_id=station_id, timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=EpochBucket('timestamp', HOUR))
+        .values('bucket')
+        .annotate(**aggregates)
+        .order_by('bucket')
+    )
+    for row in rows.iterator():
+        hour = datetime.fromtimestamp(int(row['bucket']) * HOUR, tz=dt_timezone.utc)
+        for name in fields:
+            yield (hour, name, row[f'{name}__count'], _float(row[f'{name}__sum']),
+                   _float(row[f'{name}__min']), _float(row[f'{name}__max']))
+
+
+def _hour_runs(hours):
+    """Merge hours into [start, end) runs of consecutive hours, oldest first."""
+    runs = []
+    for hour in sorted(hours):
+        if runs and runs[-1][1] == hour:
+            runs[-1][1] = hour + timedelta(seconds=HOUR)
+        else:
+            runs.append([hour, hour + timedelta(seconds=HOUR)])
+    return runs
+
+
+def _daily_from_hourly(station_id, days):
+    """
+    Merge the stored hourly rollups of the touched days with one GROUP BY.
+
+    Args:
+        days: {section: set of UTC day starts}
+
+    Returns unsaved DailyRollup instances.
+    """
+    first = min(min(section_days) for section_days in days.values())
+    last = max(max(section_days) for section_days in days.values())
+    rows = (
+        HourlyRollup.objects
+        .filter(station_id=station_id, sensor__in=list(days),
+                bucket__gte=first, bucket__lt=last + timedelta(seconds=DAY))
+        .annotate(day=EpochBucket('bucket', DAY))
+        .values('sensor', 'metric', 'day')
+        .annotate(total_count=Sum('count'), total_sum=Sum('sum'),
+                  lowest=Min('min'), highest=Max('max'))
+        .order_by()
+    )
+
+    daily = []
+    for row in rows:
+        day = datetime.fromtimestamp(int(row['day']) * DAY, tz=dt_timezone.utc)
+        if day in days[row['sensor']]:
+            daily.append(DailyRollup(station_id=station_id, sensor=row['sensor'],
+                                     metric=row['metric'], bucket=day, count=row['total_count'],
+                                     sum=row['total_sum'], min=row['lowest'], max=row['highest']))
+    return daily
+
+
+def _rollups(station_id, section, start, end):
+    """
+    Compute the rollups of one reading table over whole UTC days [start, end).
+
+    Daily rollups are merged from the hourly aggregates.
+    Returns (hourly, daily) unsaved instances.
+    """
+    hourly = []
+    merged = {}
+    for hour, metric, count, total, low, high in _hourly_aggregates(
+            READING_MODELS[section], station_id, start, end):
+        hourly.append(HourlyRollup(station_id=station_id, sensor=section, metric=metric,
+                                   bucket=hour, count=count, sum=total, min=low, max=high))
+
+        day = merged.setdefault((_floor(hour, DAY), metric), [0, None, None, None])
+        if count:
+            day[0] += count
+            day[1] = total if day[1] is None else day[1] + total
+            day[2] = low if day[2] is None else min(day[2], low)
+            day[3] = high if day[3] is None else max(day[3], high)
+
+    daily = [
+        DailyRollup(station_id=station_id, sensor=section, metric=metric,
+                    bucket=day, count=count, sum=total, min=low, max=high)
+        for (day, metric), (count, total, low, high) in merged.items()
+    ]
+    return hourly, daily
+
+
+def update_rollups(station, snapshots):
+    """
+    Refresh the rollups of the buckets touched by stored snapshots.
+
+    Args:
+        station: Station the snapshots belong to
+        snapshots: List of (timestamp, {section: {field: value}}) tuples
+
+    Call inside the ingest transaction, after the readings are written.
+    Costs one aggregate query per reading table present and run of
+    consecutive touched hours, one over the hourly rollups of the touched
+    days, plus one upsert per rollup table.
+    """
+    kept_since = {section: _retained_since(section) for section in READING_MODELS}
+    touched = {}
+    for timestamp, readings in snapshots:
+        for section in readings:
+            # Days whose raw rows were partly pruned keep their rollups
+            if kept_since[section] is not None and timestamp < kept_since[section]:
+                continue
+            touched.setdefault(section, []).append(timestamp)
+
+    if not touched:
+        return
+
+    hourly = []
+    for section, timestamps in touched.items():
+        for start, end in _hour_runs({_floor(ts, HOUR) for ts in timestamps}):
+            hourly += [
+                HourlyRollup(station_id=station.pk, sensor=section, metric=metric,
+                             bucket=hour, count=count, sum=total, min=low, max=high)
+                for hour, metric, count, total, low, high in _hourly_aggregates(
+                    READING_MODELS[section], station.pk, start, end)
+            ]
+    upsert_rows(HourlyRollup, hourly, ROLLUP_KEY)
+
+    days = {section: {_floor(ts, DAY) for ts in timestamps} for section, timestamps in touched.items()}
+    upsert_rows(DailyRollup, _daily_from_hourly(station.pk, days), ROLLUP_KEY)
+
+
+def rebuild_rollups(station, since=None):
+    """
+    Recompute a station's rollups from its raw readings, for backfills.
+
+    Rollups from the start of the UTC day of `since` on (default: all) are
+    deleted and rebuilt, REBUILD_WINDOW of raw history at a time. Days
+    whose raw rows are past retention are left alone.
+    Returns the number of hourly rollups written.
+    """
+    written = 0
+    requested = _floor(since, DAY) if since is not None else None
+
+    for section, model in READING_MODELS.items():
+        since = max(filter(None, [requested, _retained_since(section)]), default=None)
+        readings = model.objects.filter(station=station)
+        if since is not None:
+            readings = readings.filter(timestamp__gte=since)
+        first = readings.order_by('timestamp').values_list('timestamp', flat=True).first()
+        last = readings.order_by('-timestamp').values_list('timestamp', flat=True).first()
+
+        with transaction.atomic():
+            for rollup_model in ROLLUP_MODELS.values():
+                stale = rollup_model.objects.filter(station=station, sensor=section)
+                if since is not None:
+                    stale = stale.filter(bucket__gte=since)
+                stale.delete()
+
+            if first is None:
+                continue
+
+            start = _floor(first, DAY)
+            end = _floor(last, DAY) + timedelta(days=1)
+            while start < end:
+                window_end = min(start + REBUILD_WINDOW, end)
+                hourly, daily = _rollups(station.pk, section, start, window_end)
+                written += upsert_rows(HourlyRollup, hourly, ROLLUP_KEY)
+                upsert_rows(DailyRollup, daily, ROLLUP_KEY)
+                start = window_end
+
+    return written
+
+
+def rollup_series(station_id, sensor, fields, interval, start, end):
+    """
+    Read an hourly or daily series from the rollups.
+
+    Same result as sensors.series.bucket_series for the buckets overlapping
+    [start, end); a bucket's count is the largest count of its metrics.
+    Readings older than the station's first rollup were stored before
+    rollups existed and never rebuilt, so when the range starts before the
+    rollups, that part is aggregated from the raw rows with bucket_series.
+    """
+    seconds = INTERVALS[interval]
+    series = _stored_series(station_id, sensor, fields, interval, start, end)
+
+    first = series[0]['start'] if series else end
+    if first > _floor(start, seconds) and not ROLLUP_MODELS[interval].objects.filter(
+            station_id=station_id, sensor=sensor, bucket__lt=first).exists():
+        series = bucket_series(READING_MODELS[sensor], station_id, fields, seconds,
+                               start, first) + series
+    return series
+
+
+def _stored_series(station_id, sensor, fields, interval, start, end):
+    seconds = INTERVALS[interval]
+    rows = (
+        ROLLUP_MODELS[interval].objects
+        .filter(station_id=station_id, sensor=sensor, metric__in=fields,
+                bucket__gte=_floor(start, seconds), bucket__lt=end)
+        .order_by('bucket')
+        .values_list('bucket', 'metric', 'count', 'sum', 'min', 'max')
+    )
+
+    buckets = {}
+    for bucket, metric, count, total, low, high in rows:
+        entry = buckets.setdefault(bucket, {'start': bucket, 'count': 0})
+        entry['count'] = max(entry['count'], count)
+        entry[metric] = {
+            'avg': round(total / count, 3) if count else None,
+            'min': round(low, 3) if low is not None else None,
+            'max': round(high, 3) if high is not None else None,
+        }
+
+    series = []
+    for entry in buckets.values():
+        for name in fields:
+            entry.setdefault(name, {'avg': None, 'min': None, 'max': None})
+        series.append(entry)
+    return series
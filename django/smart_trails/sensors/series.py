@@ -0,0 +1,104 @@
+"""
+Time-bucket aggregation of sensor readings.
+
+Charts of long ranges are computed in the database: readings of a station
+are grouped into fixed-width buckets with one GROUP BY over the
+(station, -timestamp) index and only avg/min/max/count per bucket leave
+the database.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import models
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Cast
+
+from .models import reading_fields
+
+
+# Supported bucket widths in seconds
+INTERVALS = {
+    '15m': 15 * 60,
+    '1h': 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+
+class EpochBucket(models.Func):
+    """
+    Index of the fixed-width bucket a timestamp falls into: floor(epoch / seconds).
+
+    Buckets are aligned on the Unix epoch, so daily buckets are UTC days.
+    """
+    template = 'FLOOR(EXTRACT(EPOCH FROM %(expressions)s) / %(seconds)d)'
+    output_field = models.BigIntegerField()
+
+    def __init__(self, expression, seconds, **extra):
+        super().__init__(expression, seconds=int(seconds), **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Timestamps are stored as UTC text, strftime('%s') gives the epoch
+        return self.as_sql(
+            compiler, connection,
+            template="(CAST(strftime('%%%%s', %(expressions)s) AS INTEGER) / %(seconds)d)",
+            **extra_context
+        )
+
+
+def numeric_fields(model):
+    """Value columns of a reading model that can be aggregated, booleans included."""
+    return [
+        name for name in reading_fields(model)
+        if isinstance(model._meta.get_field(name),
+                      (models.DecimalField, models.FloatField, models.IntegerField, models.BooleanField))
+    ]
+
+
+def numeric_value(model, name):
+    # Booleans aggregate as 0/1: avg is the share of true readings
+    if isinstance(model._meta.get_field(name), models.BooleanField):
+        return Cast(name, models.IntegerField())
+    return models.F(name)
+
+
+def _number(value):
+    return round(float(value), 3) if value is not None else None
+
+
+def bucket_series(model, station_id, fields, seconds, start, end):
+    """
+    Aggregate a station's readings in [start, end) into buckets of `seconds`.
+
+    Returns one dict per non-empty bucket, oldest first:
+    {'start': datetime, 'count': n, <field>: {'avg', 'min', 'max'}, ...}
+    """
+    aggregates = {'count': Count('pk')}
+    for name in fields:
+        value = numeric_value(model, name)
+        aggregates[f'{name}__avg'] = Avg(value)
+        aggregates[f'{name}__min'] = Min(value)
+        aggregates[f'{name}__max'] = Max(value)
+
+    rows = (
+        model.objects
+        .filter(station_id=station_id, timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=EpochBucket('timestamp', seconds))
+        .values('bucket')
+        .annotate(**aggregates)
+        .order_by('bucket')
+    )
+
+    buckets = []
+    for row in rows:
+        bucket = {
+            'start': datetime.fromtimestamp(int(row['bucket']) * seconds, tz=dt_timezone.utc),
+            'count': row['count'],
+        }
+        for name in fields:
+            bucket[name] = {
+                'avg': _number(row[f'{name}__avg']),
+                'min': _number(row[f'{name}__min']),
+                'max': _number(row[f'{name}__max']),
+            }
+        buckets.append(bucket)
+    return buckets
@@ -1,3 +1,326 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+import gzip
+import json
+import tempfile
+
+import unittest
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Avg, Max, Min, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from stations.models import Station
+from api.ingest import store_batch
+from sensors.downsample import lttb
+from sensors.models import AtmosphericReading, DailyRollup, HourlyRollup, PrecipitationReading
+from sensors.partitions import (
+    add_months, create_partition, is_partitioned, month_range, month_start, partition_name, partitions,
+)
+from sensors.retention import archive_path, prune_expired
+from sensors.rollups import rebuild_rollups
+from sensors.upsert import upsert_readings
+
+
+def make_station(station_id='test-station'):
+    return Station.objects.create(
+        station_id=station_id, name=station_id,
+        latitude=45.5615, longitude=8.0573, altitude=1250,
+    )
+
+
+class ScaledIntegerFieldTests(TestCase):
+
+    def setUp(self):
+        self.station = make_station()
+        self.timestamp = timezone.now()
+
+    def test_values_are_stored_as_scaled_integers(self):
+        AtmosphericReading.objects.create(station=self.station, timestamp=self.timestamp,
+                                          temperature=12.34, humidity=-3.05, pressure=875.3)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT temperature, humidity, pressure FROM atmospheric_readings')
+            self.assertEqual(cursor.fetchone(), (1234, -305, 87530))
+        self.assertEqual(AtmosphericReading.objects.values_list('temperature', 'humidity', 'pressure').get(),
+                         (12.34, -3.05, 875.3))
+        self.assertTrue(AtmosphericReading.objects.filter(temperature__gt=12.33, temperature__lt=12.35).exists())
+
+    def test_read_values_match_the_decimal_ones(self):
+        for scaled in range(-2000, 5000, 7):
+            self.assertEqual(scaled / 100, float(Decimal(scaled).scaleb(-2)))
+
+    def test_aggregates_are_scaled_back(self):
+        for minutes, temperature in enumerate([10.25, 11.5, 12.75]):
+            AtmosphericReading.objects.create(station=self.station, temperature=temperature,
+                                              timestamp=self.timestamp - timedelta(minutes=minutes))
+
+        self.assertEqual(
+            AtmosphericReading.objects.aggregate(avg=Avg('temperature'), sum=Sum('temperature'),
+                                                 min=Min('temperature'), max=Max('temperature')),
+            {'avg': 11.5, 'sum': 34.5, 'min': 10.25, 'max': 12.75},
+        )
+
+    def test_range_follows_the_decimal_digits(self):
+        reading = AtmosphericReading(station=self.station, timestamp=self.timestamp, temperature=1000)
+        with self.assertRaises(ValidationError) as raised:
+            reading.full_clean()
+        self.assertIn('temperature', raised.exception.message_dict)
+
+        reading.temperature = -999.99
+        reading.full_clean()
+
+    def test_writes_refuse_values_beyond_the_digits(self):
+        for temperature in (1e9, 123456.7, 999.996):
+            with self.assertRaises(ValueError):
+                upsert_readings(AtmosphericReading, [
+                    AtmosphericReading(station=self.station, timestamp=self.timestamp,
+                                       temperature=temperature),
+                ])
+        self.assertFalse(AtmosphericReading.objects.exists())
+
+
+class UpsertReadingsTests(TestCase):
+
+    def setUp(self):
+        self.station = make_station()
+        self.timestamp = timezone.now()
+
+    def test_upsert_inserts_then_overwrites_in_one_statement(self):
+        upsert_readings(AtmosphericReading, [
+            AtmosphericReading(station=self.station, timestamp=self.timestamp,
+                               temperature=12.5, humidity=65.0, pressure=875.3),
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            upsert_readings(AtmosphericReading, [
+                AtmosphericReading(station=self.station, timestamp=self.timestamp,
+                                   temperature=11.0, humidity=70.0, pressure=None),
+            ])
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        reading = AtmosphericReading.objects.get()
+        self.assertEqual(reading.temperature, 11.0)
+        self.assertEqual(reading.humidity, 70.0)
+        self.assertIsNone(reading.pressure)
+
+    def test_upsert_keeps_last_duplicate_in_batch(self):
+        written = upsert_readings(PrecipitationReading, [
+            PrecipitationReading(station=self.station, timestamp=self.timestamp,
+                                 is_raining=False, rain_detected_last_hour=False),
+            PrecipitationReading(station=self.station, timestamp=self.timestamp,
+                                 is_raining=True, rain_detected_last_hour=True),
+        ])
+
+        self.assertEqual(written, 1)
+        self.assertTrue(PrecipitationReading.objects.get().is_raining)
+
+
+# The fixtures are older than the default raw retention
+@override_settings(READING_RETENTION_DAYS={})
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.station = make_station()
+        self.base = datetime(2026, 1, 1, 23, 0, tzinfo=dt_timezone.utc)
+
+    def store(self, minutes, temperature):
+        store_batch(self.station, [
+            (self.base + timedelta(minutes=minutes),
+             {'sensors': {'atmospheric': {'temperature': temperature}}}),
+        ])
+
+    def rollup(self, model, hours=0):
+        return model.objects.get(station=self.station, metric='temperature',
+                                 bucket=self.base.replace(hour=0) + timedelta(hours=hours))
+
+    def test_ingest_updates_touched_hour_and_day(self):
+        self.store(0, 10.0)
+        self.store(30, 14.0)
+        self.store(70, 3.0)
+
+        hour = self.rollup(HourlyRollup, hours=23)
+        self.assertEqual((hour.count, hour.avg, hour.min, hour.max), (2, 12.0, 10.0, 14.0))
+        day = self.rollup(DailyRollup)
+        self.assertEqual((day.count, day.min, day.max), (2, 10.0, 14.0))
+        next_day = self.rollup(DailyRollup, hours=24)
+        self.assertEqual((next_day.count, next_day.avg), (1, 3.0))
+        # Untouched metrics are rolled up too, as empty buckets
+        self.assertEqual(HourlyRollup.objects.get(bucket=hour.bucket, metric='humidity').count, 0)
+
+    def test_ingest_reaggregates_only_touched_hours(self):
+        self.store(-60, 8.0)
+        AtmosphericReading.objects.filter(station=self.station).delete()
+
+        self.store(0, 10.0)
+
+        # The other hour keeps its rollup and still counts in the day
+        self.assertEqual(self.rollup(HourlyRollup, hours=22).count, 1)
+        day = self.rollup(DailyRollup)
+        self.assertEqual((day.count, day.sum, day.min, day.max), (2, 18.0, 8.0, 10.0))
+
+    def test_replayed_snapshot_is_not_counted_twice(self):
+        self.store(0, 10.0)
+        self.store(0, 12.0)
+
+        hour = self.rollup(HourlyRollup, hours=23)
+        self.assertEqual((hour.count, hour.sum), (1, 12.0))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for minutes, temperature in [(0, 10.0), (30, 14.0), (70, 3.0)]:
+            self.store(minutes, temperature)
+        incremental = sorted(DailyRollup.objects.values_list('bucket', 'metric', 'count', 'sum'))
+
+        DailyRollup.objects.all().delete()
+        HourlyRollup.objects.all().delete()
+        self.assertEqual(rebuild_rollups(self.station), 2 * 3)
+
+        rebuilt = sorted(DailyRollup.objects.values_list('bucket', 'metric', 'count', 'sum'))
+        self.assertEqual(rebuilt, incremental)
+
+
+class LttbTests(TestCase):
+
+    def test_keeps_endpoints_and_spikes(self):
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        y[437] = -25.0
+
+        keep = lttb(x, y, 50)
+
+        self.assertEqual(len(keep), 50)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertIn(437, keep)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_short_series_is_returned_whole(self):
+        x = np.arange(10, dtype=float)
+        self.assertEqual(list(lttb(x, x, 20)), list(range(10)))
+
+
+@override_settings(READING_RETENTION_DAYS={'atmospheric': 30})
+class RetentionTests(TestCase):
+
+    def setUp(self):
+        self.station = make_station()
+        self.now = timezone.now()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.archive_dir = tmp.name
+
+    def store(self, days_ago, temperature):
+        store_batch(self.station, [
+            (self.now - timedelta(days=days_ago),
+             {'sensors': {'atmospheric': {'temperature': temperature}}}),
+        ])
+
+    def test_expired_rows_are_archived_then_deleted_in_batches(self):
+        for days_ago in (45, 44, 40, 5):
+            self.store(days_ago, float(days_ago))
+
+        deleted = prune_expired('atmospheric', self.archive_dir, batch_size=2)
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(list(AtmosphericReading.objects.values_list('temperature', flat=True)),
+                         [5.0])
+        archived = []
+        for days_ago in (45, 44, 40):
+            month = (self.now - timedelta(days=days_ago)).astimezone(dt_timezone.utc).strftime('%Y-%m')
+            path = archive_path(self.archive_dir, AtmosphericReading, month)
+            with gzip.open(path, 'rt') as f:
+                archived += [json.loads(line) for line in f]
+        temperatures = {row['temperature'] for row in archived}
+        self.assertEqual(temperatures, {'45.00', '44.00', '40.00'})
+        self.assertEqual(prune_expired('atmospheric', self.archive_dir), 0)
+        self.assertEqual(prune_expired('light', self.archive_dir), 0)
+
+    def test_rollups_outlive_pruned_rows(self):
+        self.store(5, 12.0)
+        with override_settings(READING_RETENTION_DAYS={'atmospheric': 1}):
+            prune_expired('atmospheric')
+            # A late snapshot of the pruned day does not shrink its rollup
+            store_batch(self.station, [
+                (self.now - timedelta(days=5, minutes=1),
+                 {'sensors': {'atmospheric': {'temperature': 20.0}}}),
+            ])
+            rebuild_rollups(self.station)
+
+        day = DailyRollup.objects.get(metric='temperature')
+        self.assertEqual((day.count, day.max), (1, 12.0))
+
+
+class PartitionMonthTests(TestCase):
+
+    def test_months_are_utc_and_roll_over_years(self):
+        month = month_start(datetime(2026, 12, 31, 23, 30, tzinfo=dt_timezone(timedelta(hours=-2))))
+        self.assertEqual(month, datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_months(month, -1), datetime(2026, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_months(month, 14), datetime(2028, 3, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            [f'{m:%Y-%m}' for m in month_range(datetime(2026, 11, 15, tzinfo=dt_timezone.utc), month)],
+            ['2026-11', '2026-12', '2027-01'])
+        self.assertEqual(partition_name('light_readings', month), 'light_readings_p2027_01')
+
+    def test_tables_stay_plain_without_postgresql(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('partitioned on PostgreSQL')
+        self.assertFalse(is_partitioned(connection, 'atmospheric_readings'))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'partitioning needs PostgreSQL')
+class PartitionTests(TransactionTestCase):
+    # DETACH/ATTACH PARTITION cannot run with the test case transaction's
+    # deferred foreign key checks pending
+
+    def setUp(self):
+        self.station = make_station()
+        self.now = timezone.now()
+        self.table = AtmosphericReading._meta.db_table
+
+    def store(self, timestamp, temperature):
+        upsert_readings(AtmosphericReading, [
+            AtmosphericReading(station=self.station, timestamp=timestamp, temperature=temperature),
+        ])
+
+    def test_reading_tables_are_partitioned_ahead(self):
+        self.assertTrue(is_partitioned(connection, self.table))
+        self.assertIn(add_months(month_start(self.now), 1), partitions(connection, self.table))
+
+    def test_new_partition_takes_its_rows_from_the_default_partition(self):
+        month = add_months(month_start(self.now), 24)
+        self.store(month + timedelta(days=3), 7.0)
+
+        self.assertTrue(create_partition(connection, self.table, month))
+        self.assertFalse(create_partition(connection, self.table, month))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {partition_name(self.table, month)}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(AtmosphericReading.objects.count(), 1)
+
+    def test_station_range_queries_prune_partitions(self):
+        start = self.now - timedelta(days=1)
+        query = AtmosphericReading.objects.filter(
+            station=self.station, timestamp__gte=start, timestamp__lt=self.now)
+        plan = query.explain()
+        scanned = {name for name in partitions(connection, self.table).values() if name in plan}
+        self.assertLessEqual(len(scanned), 2)
+
+    def test_expired_months_are_dropped_as_partitions(self):
+        old_month = add_months(month_start(self.now), -6)
+        create_partition(connection, self.table, old_month)
+        self.store(old_month + timedelta(days=1), 1.0)
+        self.store(self.now - timedelta(days=1), 2.0)
+
+        with override_settings(READING_RETENTION_DAYS={'atmospheric': 30}):
+            deleted = prune_expired('atmospheric')
+
+        self.assertEqual(deleted, 1)
+        self.assertNotIn(old_month, partitions(connection, self.table))
+        self.assertEqual(list(AtmosphericReading.objects.values_list('temperature', flat=True)),
+                         [2.0])
@@ -0,0 +1,101 @@
+"""
+Single-statement upserts for the reading tables.
+
+Every reading model has unique_together (station, timestamp). Instead of
+update_or_create (SELECT, then INSERT or UPDATE, racing other workers on the
+unique constraint) rows are written with a native
+INSERT ... ON CONFLICT (station_id, timestamp) DO UPDATE, supported by both
+SQLite (3.24+) and PostgreSQL. upsert_rows does the same for other tables
+with a natural key, such as the rollups, optionally keeping the stored
+row when it is newer than the incoming one.
+"""
+
+from django.db import connection
+
+
+def upsert_readings(model, objs):
+    """
+    Insert reading instances, overwriting the values of existing rows that
+    have the same station and timestamp.
+
+    Args:
+        model: One of the reading models in sensors.models
+        objs: Unsaved instances of that model
+
+    Rows are sent in as few statements as the backend's parameter limit
+    allows. Returns the number of rows written.
+    """
+    return upsert_rows(model, objs, ['station', 'timestamp'])
+
+
+def upsert_rows(model, objs, unique_fields, newer_field=None):
+    """
+    Insert instances of any model, overwriting the other columns of rows
+    that collide on `unique_fields` (which must be a unique constraint).
+
+    With `newer_field` a colliding row is only overwritten when the
+    incoming value of that field is at least the stored one, so a late
+    writer cannot replace newer data.
+    """
+    if not objs:
+        return 0
+
+    opts = model._meta
+    keys = [opts.get_field(name) for name in unique_fields]
+    values = [f for f in opts.concrete_fields if not f.primary_key and f not in keys]
+
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        for obj in objs:
+            lookup = {f.attname: getattr(obj, f.attname) for f in keys}
+            if newer_field is not None:
+                stored = model.objects.filter(**lookup).values_list(newer_field, flat=True).first()
+                if stored is not None and stored > getattr(obj, newer_field):
+                    continue
+            model.objects.update_or_create(
+                **lookup,
+                defaults={f.attname: getattr(obj, f.attname) for f in values},
+            )
+        return len(objs)
+
+    # PostgreSQL refuses to update the same row twice in one statement,
+    # so later duplicates win like they would with update_or_create.
+    unique = {}
+    for obj in objs:
+        key = tuple(getattr(obj, f.attname) for f in keys)
+        if (newer_field is not None and key in unique
+                and getattr(unique[key], newer_field) > getattr(obj, newer_field)):
+            continue
+        unique[key] = obj
+    objs = list(unique.values())
+
+    fields = keys + values
+
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(f.column) for f in fields)
+    conflict = ', '.join(qn(f.column) for f in keys)
+    updates = ', '.join(f'{qn(f.column)} = excluded.{qn(f.column)}' for f in values)
+    if newer_field is not None:
+        newer = qn(opts.get_field(newer_field).column)
+        updates += f' WHERE excluded.{newer} >= {qn(opts.db_table)}.{newer}'
+    row_sql = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    written = 0
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            params = [
+                f.get_db_prep_save(getattr(obj, f.attname), connection=connection)
+                for obj in batch
+                for f in fields
+            ]
+            cursor.execute(
+                f'INSERT INTO {qn(opts.db_table)} ({columns}) '
+                f'VALUES {", ".join([row_sql] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params,
+            )
+            written += len(batch)
+
+    return written
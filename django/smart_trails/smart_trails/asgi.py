@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_trails.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Serves the long-lived
+# /api/v1/stations/<id>/stream/ SSE connections, everything else is Django.
+from api.stream import route_streams  # noqa: E402
+
+application = route_streams(django_application)
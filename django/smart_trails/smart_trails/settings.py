@@ -80,6 +80,8 @@ DATABASES = {
 }
 
 
+# On PostgreSQL the reading tables are partitioned by month, see
+# sensors/partitions.py and the manage_partitions command.
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.postgresql_psycopg2',
@@ -134,10 +136,44 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
+    # Sensor values are rendered as JSON numbers, like in the station endpoint
+    'COERCE_DECIMAL_TO_STRING': False,
 }
 
+# Ingest mode: 'sync' stores readings and sends alerts inside the request,
+# 'spool' queues payloads on disk for the drain_spool worker and answers 202
+INGEST_MODE = os.environ.get('INGEST_MODE', 'sync')
+INGEST_SPOOL_PATH = BASE_DIR / 'ingest_spool.sqlite3'
+INGEST_SPOOL_BATCH_SIZE = 200
+
+# Days raw readings are kept per reading table (None: forever). Older
+# rows are archived and deleted by the prune_readings command, charts keep
+# using the hourly and daily rollups.
+READING_RETENTION_DAYS = {
+    'atmospheric': 90,
+    'light': 90,
+    'soil': 90,
+    'air_quality': 90,
+    'precipitation': 90,
+    'trail_activity': 90,
+    'power': 30,
+}
+READING_ARCHIVE_DIR = BASE_DIR / 'archive'
+READING_PRUNE_BATCH_SIZE = 1000
+
+# Where recent pressure readings for the rate-of-change alerts are kept:
+# 'database' (shared by all workers), 'file' (WAL-mode SQLite file shared by
+# the workers of one host), 'memory' (per process) or the dotted path of a
+# notifications.pressure_history.PressureHistory subclass
+PRESSURE_HISTORY_BACKEND = os.environ.get('PRESSURE_HISTORY_BACKEND', 'database')
+PRESSURE_HISTORY_PATH = BASE_DIR / 'pressure_history.sqlite3'
+# Stations whose pressure history a 'memory' backend keeps per process
+PRESSURE_HISTORY_MAX_STATIONS = 1000
+
 # APNs Configuration
 APNS_KEY_PATH = BASE_DIR / 'AuthKey_C4W667JPTB.p8'
 APNS_KEY_ID = 'C4W667JPTB'
 APNS_TEAM_ID = 'E6S8B2D4E8'
 APNS_USE_SANDBOX = True
+APNS_MAX_CONNECTIONS = 10   # pooled HTTP/2 connections to APNs
+APNS_CONCURRENCY = 200      # requests in flight during a fan-out
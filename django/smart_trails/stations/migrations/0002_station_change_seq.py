@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='station',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Change sequence number of the last batch of readings stored'),
+        ),
+    ]
@@ -75,6 +75,13 @@ class Station(models.Model):
         help_text="Has PIR motion sensor for trail traffic"
     )
     
+    # Delta sync, see api.ingest.store_batch
+    change_seq = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Change sequence number of the last batch of readings stored"
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)